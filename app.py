@@ -22,16 +22,24 @@ from werkzeug.utils import secure_filename
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf.csrf import CSRFProtect
 from dotenv import load_dotenv
-from apscheduler.schedulers.background import BackgroundScheduler
-import atexit
+import threading
 
 # Import application components
 from database.models import db, User, Document, CreditRequest, ScanLog, DocumentMatch
+from database.engine import configure_engines, register_sqlite_pragmas
 from backend.api.auth import auth_bp
 from backend.api.user import user_bp
-from backend.api.document import document_bp
+from backend.api.document import document_bp, prewarm_scan_dependencies
 from backend.api.admin import admin_bp
 from backend.api.credit import credit_bp
+from backend.api.metrics import metrics_bp
+from backend.services.credit_service import CreditService
+from backend.utils.user_cache import load_cached_user, register_user_cache
+from backend.utils.metrics import server_timing_header
+from backend.utils.profiler import init_profiler
+from backend.utils.memory import init_memory_diagnostics
+from backend.utils.sql_profiler import register_sql_profiler
+from backend.utils.scheduler import init_scheduler
 
 # Load environment variables from .env file
 load_dotenv()
@@ -52,6 +60,8 @@ def create_app(test_config=None):
     # Load configuration
     from config import Config
     app.config.from_object(Config)
+    if test_config:
+        app.config.update(test_config)
     
     # Initialize CSRF protection
     csrf = CSRFProtect()
@@ -68,19 +78,34 @@ def create_app(test_config=None):
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
     # Initialize database and migration support
+    configure_engines(app)
     db.init_app(app)
-    from flask_migrate import Migrate
-    migrate = Migrate(app, db)
+    register_sqlite_pragmas(app)
+    
+    # Flask-Migrate (and Alembic) are only needed by the `flask db` commands,
+    # so skip loading them in web workers and standalone scripts
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        from flask_migrate import Migrate
+        migrate = Migrate(app, db)
     
     # Set up user authentication
     login_manager = LoginManager()
     login_manager.login_view = 'auth.login'  # Redirect unauthorized users to login page
     login_manager.init_app(app)
     
+    register_user_cache()
+    
     @login_manager.user_loader
     def load_user(user_id):
-        """Load user by ID for Flask-Login."""
-        return User.query.get(int(user_id))
+        """
+        Load user by ID for Flask-Login, applying a due daily credit reset.
+        
+        Served from the short-lived user snapshot cache when possible.
+        """
+        user = load_cached_user(int(user_id))
+        if user:
+            CreditService.apply_daily_reset(user)
+        return user
     
     # Register API blueprints
     app.register_blueprint(auth_bp)      # Authentication routes
@@ -88,6 +113,20 @@ def create_app(test_config=None):
     app.register_blueprint(document_bp)  # Document management
     app.register_blueprint(admin_bp)     # Admin dashboard
     app.register_blueprint(credit_bp)    # Credit system
+    app.register_blueprint(metrics_bp)   # Prometheus metrics
+    
+    # Report per-stage timings collected during a request (e.g. uploads)
+    app.after_request(server_timing_header)
+    
+    # Sample requests selected from the admin profiling page
+    init_profiler(app)
+    
+    # Record peak RSS (and tracemalloc growth when tracing) for uploads and exports
+    init_memory_diagnostics(app)
+    
+    # Count and time SQL per request; log slow statements and likely N+1 patterns
+    with app.app_context():
+        register_sql_profiler(app, db.engines.values())
     
     # Define main route
     @app.route('/')
@@ -95,35 +134,35 @@ def create_app(test_config=None):
         """Render the application's home page."""
         return render_template('index.html')
     
-    # Set up automated credit reset system
-    with app.app_context():
-        scheduler = BackgroundScheduler()
+    # Scan workers can import scikit-learn and the parsers in the background
+    # at startup, so the first upload does not pay for them
+    if app.config.get('SCAN_PREWARM'):
+        threading.Thread(target=prewarm_scan_dependencies, name='scan-prewarm', daemon=True).start()
+    
+    # Set up automated credit reset system. Every process elects one leader
+    # through a lease, and only the leader runs the periodic jobs; scripts
+    # that build the app pass SCHEDULER_ENABLED=False to stay out of it.
+    if app.config.get('SCHEDULER_ENABLED', True):
+        scheduler = init_scheduler(app)
         
         def reset_daily_credits():
             """
-            Reset user credits to 20 at midnight.
-            Only resets if the user hasn't had a reset in the last 24 hours.
+            Reset credits for users whose last reset is over 24 hours old.
+            
+            Credits are also reset lazily when a user is loaded, so this sweep
+            only keeps balances of inactive users current for admin reports.
+            It runs as a single UPDATE.
             """
-            with app.app_context():
-                users = User.query.all()
-                now = datetime.datetime.now()
-                
-                for user in users:
-                    # Check if it's been 24 hours since last reset
-                    if user.last_credit_reset and (now - user.last_credit_reset).days >= 1:
-                        user.credits = 20  # Reset to daily free limit
-                        user.last_credit_reset = now
-                        print(f"Reset credits for user {user.username} at {now}")
-                
-                db.session.commit()
-                print(f"Daily credit reset completed at {now}")
+            reset_count = CreditService.reset_due_credits()
+            print(f"Daily credit reset completed at {datetime.datetime.now()} ({reset_count} users)")
         
-        # Run credit reset job every hour to handle different timezones
-        scheduler.add_job(reset_daily_credits, 'interval', hours=1)
-        scheduler.start()
+        # Run credit reset sweep periodically to handle different timezones
+        sweep_hours = app.config.get('CREDIT_RESET_SWEEP_HOURS', 1)
+        if sweep_hours > 0:
+            scheduler.add_job('credit_reset', reset_daily_credits, sweep_hours * 3600)
         
-        # Ensure scheduler is properly shut down when app exits
-        atexit.register(lambda: scheduler.shutdown())
+        # Starts the election only if there are jobs; stopped (and the lease released) at exit
+        scheduler.start()
     
     return app
 
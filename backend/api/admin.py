@@ -16,19 +16,40 @@ Date: March 2025
 
 from flask import (
     Blueprint, request, jsonify, render_template, redirect,
-    url_for, flash, current_app as app, send_file
+    url_for, flash, current_app as app, Response, stream_with_context, send_from_directory
 )
+from werkzeug.utils import secure_filename
 from flask_login import login_required, current_user
-from database.models import db, User, Document, ScanLog, CreditRequest, DocumentMatch
-from sqlalchemy import func, desc, and_
+from database.models import (
+    db, User, Document, ScanLog, CreditRequest, DocumentMatch, DailyStat, GlobalCounter
+)
+from database.engine import reporting_session
+from backend.utils.cache import get_view_cache
+from backend.services.credit_service import CreditService
+from backend.services.provider_router import get_provider_router
+from backend.utils.scheduler import get_scheduler
+from backend.utils.profiler import (
+    PROFILE_SUFFIX, enable_profiling, disable_profiling, get_profiling_state,
+    list_profiles, profile_directory
+)
+from backend.utils.memory import start_tracing, stop_tracing, take_baseline, memory_report
+from backend.utils.metrics import (
+    SCAN_TOTAL_SECONDS, AI_REQUEST_SECONDS, SCAN_PARSE_SECONDS, SCAN_HASH_SECONDS,
+    SCAN_CANDIDATES_SECONDS, SCAN_TFIDF_SECONDS, SCAN_DB_COMMIT_SECONDS
+)
+from backend.utils.export import (
+    EXPORT_FORMATS, iter_result_rows, stream_export, export_response_headers
+)
+from sqlalchemy import func, desc, and_, case, select
+from sqlalchemy.orm import aliased
 from datetime import datetime, timedelta
-import pandas as pd
 import json
-import io
-import csv
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
+# Longest date range the analytics endpoint accepts
+MAX_ANALYTICS_DAYS = 365
+
 # Template context processors
 @admin_bp.context_processor
 def inject_now():
@@ -69,38 +90,20 @@ def dashboard():
         JSON response for API requests
         HTML template for web requests
     """
-    # Time range for statistics
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=30)
-    prev_month_start = start_date - timedelta(days=30)
-    
-    # Basic statistics
-    stats = {
-        'user_count': User.query.filter_by(role='user').count(),
-        'document_count': db.session.query(func.count(Document.id)).scalar(),
-        'scan_count': ScanLog.query.count(),
-        'pending_requests': CreditRequest.query.filter_by(status='pending').count(),
-        'match_count': DocumentMatch.query.count()
-    }
-    
-    # Calculate month-over-month changes
-    changes = {}
-    for metric in ['user', 'document', 'scan', 'request']:
-        prev_count = _get_count_for_period(metric, prev_month_start, start_date)
-        curr_count = _get_count_for_period(metric, start_date, end_date)
-        changes[f'{metric}_change'] = (
-            ((curr_count - prev_count) / max(prev_count, 1)) * 100 if prev_count else 0
-        )
-    
-    # Get top users by scan activity
-    top_users = {
-        'by_scans': _get_top_users_by_scans(),
-        'by_credits': _get_top_users_by_credits()
-    }
+    # Aggregates are cached until the TTL expires or a scan, user or credit
+    # request write bumps their version
+    dashboard_cache = get_view_cache('dashboard')
+    aggregates = dashboard_cache.get_or_build(
+        ('dashboard', datetime.now().date()), ('scans', 'users', 'credit_requests'),
+        _get_dashboard_aggregates
+    )
+    stats = aggregates['stats']
+    changes = aggregates['changes']
+    top_users = aggregates['top_users']
+    scan_activity = aggregates['scan_activity']
     
-    # Get recent scan activity
+    # Recent scans are a small indexed query and are always read live
     recent_scans = _get_recent_scans()
-    scan_activity = _get_scan_activity_last_7_days()
     
     if request.content_type == 'application/json':
         return jsonify({
@@ -127,23 +130,101 @@ def dashboard():
         top_users_by_credits=top_users['by_credits'],
         recent_scans=recent_scans,
         scan_activity=json.dumps(scan_activity),
+        cache_stats=dashboard_cache.stats(),
         system_status="online"
     )
 
-def _get_count_for_period(metric, start_date, end_date):
-    """Helper function to get count of items for a given time period."""
-    model_map = {
-        'user': User,
-        'document': Document,
-        'scan': ScanLog,
-        'request': CreditRequest
+def _get_dashboard_aggregates():
+    """Compute the cacheable part of the dashboard as plain data."""
+    # Time range for statistics
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=30)
+    prev_month_start = start_date - timedelta(days=30)
+    
+    # Basic statistics from the running counters
+    counters = GlobalCounter.get_all()
+    stats = {
+        'user_count': counters['users'],
+        'document_count': counters['documents'],
+        'scan_count': counters['scans'],
+        'pending_requests': counters['pending_requests'],
+        'match_count': counters['matches']
     }
-    return model_map[metric].query.filter(
-        and_(
-            model_map[metric].created_at >= start_date,
-            model_map[metric].created_at <= end_date
+    
+    return {
+        'stats': stats,
+        # Calculate month-over-month changes from the daily rollup
+        'changes': _get_period_changes(prev_month_start.date(), start_date.date(), end_date.date()),
+        # Get top users by scan activity
+        'top_users': {
+            'by_scans': [tuple(row) for row in _get_top_users_by_scans()],
+            'by_credits': [tuple(row) for row in _get_top_users_by_credits()]
+        },
+        'scan_activity': _get_scan_activity(days=7)
+    }
+
+# Daily rollup counter behind each month-over-month metric
+PERIOD_COUNTERS = {
+    'user': 'registrations',
+    'document': 'uploads',
+    'scan': 'scans',
+    'request': 'credit_requests'
+}
+
+def _get_period_changes(prev_start, start_day, end_day):
+    """
+    Percentage change between the previous and current period for each metric.
+    
+    Reads both periods from the daily rollup with a single query.
+    """
+    columns = []
+    for counter in PERIOD_COUNTERS.values():
+        column = getattr(DailyStat, counter)
+        columns.append(func.sum(case((DailyStat.day < start_day, column), else_=0)))
+        columns.append(func.sum(case((DailyStat.day >= start_day, column), else_=0)))
+    
+    row = db.session.query(*columns).filter(
+        and_(DailyStat.day >= prev_start, DailyStat.day <= end_day)
+    ).one()
+    
+    changes = {}
+    for index, metric in enumerate(PERIOD_COUNTERS):
+        prev_count, curr_count = row[2 * index] or 0, row[2 * index + 1] or 0
+        changes[f'{metric}_change'] = (
+            ((curr_count - prev_count) / max(prev_count, 1)) * 100 if prev_count else 0
         )
-    ).count()
+    return changes
+
+def _day_range(start_day, end_day):
+    """List the days from end_day back to start_day (newest first) as YYYY-MM-DD."""
+    return [
+        (end_day - timedelta(days=offset)).strftime('%Y-%m-%d')
+        for offset in range((end_day - start_day).days + 1)
+    ]
+
+def _count_by_day(session, model, start_day, end_day, *filters):
+    """
+    Count rows of a model per day with a single GROUP BY query.
+    
+    Args:
+        session: Session to run the query on
+        model: Model with a created_at column
+        start_day (date): First day of the range (inclusive)
+        end_day (date): Last day of the range (inclusive)
+        *filters: Extra filter expressions
+        
+    Returns:
+        list: {'date', 'count'} dicts for every day in the range, newest first
+    """
+    day = func.date(model.created_at)
+    rows = session.query(day, func.count(model.id)).filter(
+        model.created_at >= datetime.combine(start_day, datetime.min.time()),
+        model.created_at < datetime.combine(end_day + timedelta(days=1), datetime.min.time()),
+        *filters
+    ).group_by(day).all()
+    
+    counts = {str(row_day): count for row_day, count in rows}
+    return [{'date': d, 'count': counts.get(d, 0)} for d in _day_range(start_day, end_day)]
 
 def _get_top_users_by_scans(limit=5):
     """Get users with the most scans."""
@@ -175,31 +256,23 @@ def _get_recent_scans(limit=10):
         DocumentMatch, ScanLog.id == DocumentMatch.scan_id
     ).order_by(ScanLog.created_at.desc()).limit(limit).all()
 
-def _get_scan_activity_last_7_days():
-    """Get daily scan activity metrics for the last 7 days."""
-    today = datetime.now().date()
+def _get_scan_activity(days=7):
+    """Get daily scan activity metrics for the last N days from the daily rollup."""
+    end_day = datetime.now().date()
+    start_day = end_day - timedelta(days=days - 1)
+    
+    rollups = {
+        stat.day.strftime('%Y-%m-%d'): stat
+        for stat in DailyStat.query.filter(DailyStat.day >= start_day).all()
+    }
     activity = []
-    
-    for i in range(7):
-        day = today - timedelta(days=i)
-        day_start = datetime.combine(day, datetime.min.time())
-        day_end = datetime.combine(day, datetime.max.time())
-        
-        stats = db.session.query(
-            func.count(ScanLog.id).label('total_scans'),
-            func.count(DocumentMatch.id).label('matches_found'),
-            func.avg(DocumentMatch.ai_similarity_score).label('avg_similarity')
-        ).outerjoin(
-            DocumentMatch, ScanLog.id == DocumentMatch.scan_id
-        ).filter(
-            ScanLog.created_at.between(day_start, day_end)
-        ).first()
-        
+    for date in _day_range(start_day, end_day):
+        stat = rollups.get(date)
         activity.append({
-            'date': day.strftime('%Y-%m-%d'),
-            'total_scans': stats.total_scans,
-            'matches_found': stats.matches_found or 0,
-            'avg_similarity': float(stats.avg_similarity or 0)
+            'date': date,
+            'total_scans': stat.scans if stat else 0,
+            'matches_found': stat.matches if stat else 0,
+            'avg_similarity': stat.avg_similarity if stat else 0.0
         })
     
     return activity
@@ -284,8 +357,8 @@ def credit_requests():
                 **req.to_dict(),
                 'username': user.username,
                 'status': req.status,
-                'approved_by': req.approved_by,
-                'approved_at': req.approved_at.isoformat() if req.approved_at else None
+                'approved_by': req.admin_id,
+                'approved_at': req.updated_at.isoformat() if req.status != 'pending' else None
             } for req, user in requests]
         }), 200
     
@@ -324,13 +397,10 @@ def approve_credit_request(request_id):
         if not user:
             return jsonify({'error': 'Associated user not found'}), 404
             
-        # Update credit request
-        credit_request.status = 'approved'
-        credit_request.approved_by = current_user.id
-        credit_request.approved_at = datetime.utcnow()
-        
-        # Update user's credit balance
-        user.credits += credit_request.amount
+        # Approve and grant the credits; fails if another admin got there first
+        if not CreditService.resolve_request(request_id, current_user.id, 'approved'):
+            db.session.rollback()
+            return jsonify({'error': 'Request is already processed'}), 400
         
         # Commit changes
         db.session.commit()
@@ -370,9 +440,9 @@ def reject_credit_request(request_id):
             }), 400
             
         # Update credit request
-        credit_request.status = 'rejected'
-        credit_request.approved_by = current_user.id
-        credit_request.approved_at = datetime.utcnow()
+        if not CreditService.resolve_request(request_id, current_user.id, 'rejected'):
+            db.session.rollback()
+            return jsonify({'error': 'Request is already processed'}), 400
         
         # Commit changes
         db.session.commit()
@@ -393,65 +463,46 @@ def analytics():
     """
     Show system analytics and reporting.
     
+    Query parameters:
+    - days: Length of the date range (default 30, max 365)
+    
     Includes:
-    - Scan count by day (last 30 days)
-    - User registration by day (last 30 days)
-    - Credit usage by day (last 30 days)
-    - System performance metrics (mocked)
+    - Scan count by day
+    - User registration by day
+    - Credit usage by day
+    - Scan pipeline latency percentiles (from this worker's metrics)
     - Database size
     
     Returns:
         JSON response for API requests
         HTML template for web requests
     """
-    # Get scan count by day (last 30 days)
-    today = datetime.now().date()
-    scan_by_day = []
-    for i in range(30):
-        day = today - timedelta(days=i)
-        day_start = datetime.combine(day, datetime.min.time())
-        day_end = datetime.combine(day, datetime.max.time())
-        count = ScanLog.query.filter(ScanLog.created_at.between(day_start, day_end)).count()
-        scan_by_day.append({
-            'date': day.strftime('%Y-%m-%d'),
-            'count': count
-        })
-    
-    # Get user registration by day (last 30 days)
-    user_by_day = []
-    for i in range(30):
-        day = today - timedelta(days=i)
-        day_start = datetime.combine(day, datetime.min.time())
-        day_end = datetime.combine(day, datetime.max.time())
-        count = User.query.filter(User.created_at.between(day_start, day_end)).count()
-        user_by_day.append({
-            'date': day.strftime('%Y-%m-%d'),
-            'count': count
-        })
+    # Date range: last N days, up to a year
+    days = min(max(request.args.get('days', 30, type=int), 1), MAX_ANALYTICS_DAYS)
+    end_day = datetime.now().date()
+    start_day = end_day - timedelta(days=days - 1)
+    
+    # One grouped query per series, independent of the range length. Results
+    # are cached until the TTL expires or a scan or user write bumps a version.
+    analytics_cache = get_view_cache('analytics')
+    series = analytics_cache.get_or_build(
+        ('analytics', days, end_day), ('scans', 'users'),
+        lambda: _get_analytics_series(start_day, end_day)
+    )
+    scan_by_day = series['scan_by_day']
+    user_by_day = series['user_by_day']
+    credit_by_day = series['credit_by_day']
     
-    # Get credit usage by day (last 30 days)
-    credit_by_day = []
-    for i in range(30):
-        day = today - timedelta(days=i)
-        day_start = datetime.combine(day, datetime.min.time())
-        day_end = datetime.combine(day, datetime.max.time())
-        count = ScanLog.query.filter(ScanLog.created_at.between(day_start, day_end)).count()
-        credit_by_day.append({
-            'date': day.strftime('%Y-%m-%d'),
-            'count': count  # Each scan uses 1 credit
-        })
+    performance = _get_performance_percentiles()
     
     if request.content_type == 'application/json':
         return jsonify({
             'scan_by_day': scan_by_day,
             'user_by_day': user_by_day,
-            'credit_by_day': credit_by_day
+            'credit_by_day': credit_by_day,
+            'performance': performance
         }), 200
     
-    # Calculate or mock system performance metrics
-    avg_scan_time = 0.75  # Mock value in seconds
-    avg_api_time = 0.32   # Mock value in seconds
-    
     # Calculate database size
     import os
     db_path = app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '')
@@ -469,10 +520,44 @@ def analytics():
                           scan_by_day=json.dumps(scan_by_day),
                           user_by_day=json.dumps(user_by_day),
                           credit_by_day=json.dumps(credit_by_day),
-                          avg_scan_time=avg_scan_time,
-                          avg_api_time=avg_api_time,
+                          days=days,
+                          cache_stats=analytics_cache.stats(),
+                          performance=performance,
                           db_size=db_size)
 
+def _get_performance_percentiles():
+    """p50/p95/p99 latencies in seconds from the scan pipeline histograms, plus AI provider and scheduler health."""
+    scheduler = get_scheduler()
+    return {
+        'scan_total': SCAN_TOTAL_SECONDS.percentiles(),
+        'ai_request': AI_REQUEST_SECONDS.percentiles(outcome='ok'),
+        'stages': {
+            'parse': SCAN_PARSE_SECONDS.percentiles(),
+            'hash': SCAN_HASH_SECONDS.percentiles(),
+            'candidates': SCAN_CANDIDATES_SECONDS.percentiles(),
+            'tfidf': SCAN_TFIDF_SECONDS.percentiles(),
+            'db_commit': SCAN_DB_COMMIT_SECONDS.percentiles()
+        },
+        'providers': dict(
+            get_provider_router().snapshot(),
+            **{f'{name} (batch)': health for name, health in get_provider_router('batch').snapshot().items()}
+        ),
+        'scheduler': scheduler.lease.state() if scheduler and scheduler.jobs else None
+    }
+
+def _get_analytics_series(start_day, end_day):
+    """Compute the daily analytics series for a date range."""
+    with reporting_session() as reporting:
+        scan_by_day = _count_by_day(reporting, ScanLog, start_day, end_day)
+        user_by_day = _count_by_day(reporting, User, start_day, end_day)
+    
+    return {
+        'scan_by_day': scan_by_day,
+        'user_by_day': user_by_day,
+        # Each scan uses 1 credit
+        'credit_by_day': [dict(day) for day in scan_by_day]
+    }
+
 @admin_bp.route('/system-settings', methods=['GET', 'POST'])
 @login_required
 @admin_required
@@ -492,100 +577,298 @@ def system_settings():
     # For now, just render a placeholder template
     return render_template('admin/system_settings.html')
 
-@admin_bp.route('/export/<data_type>', methods=['GET'])
-@login_required
-@admin_required
-def export_data(data_type):
+def _export_statement(data_type, start_date, end_date):
     """
-    Export data in CSV format.
-    
-    Supports:
-    - Scans
-    - Users
-    - Documents
-    - Matches
+    Build the SELECT and column headers for an export.
     
     Returns:
-        CSV file
+        tuple: (columns, statement)
     """
-    if data_type not in ['scans', 'users', 'documents', 'matches']:
-        return jsonify({'error': 'Invalid data type'}), 400
-        
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=30)
-    
     if data_type == 'scans':
-        data = db.session.query(
-            ScanLog.id, ScanLog.user_id, User.username, 
+        columns = [
+            'Scan ID', 'User ID', 'Username', 'Document Title',
+            'Scan Date', 'AI Similarity', 'Traditional Similarity'
+        ]
+        statement = select(
+            ScanLog.id, ScanLog.user_id, User.username,
             Document.title, ScanLog.created_at,
             DocumentMatch.ai_similarity_score, DocumentMatch.traditional_similarity_score
-        ).join(User).join(Document).outerjoin(DocumentMatch).filter(
+        ).join(
+            User, ScanLog.user_id == User.id
+        ).join(
+            Document, ScanLog.document_id == Document.id
+        ).outerjoin(
+            DocumentMatch, ScanLog.id == DocumentMatch.scan_id
+        ).where(
             ScanLog.created_at.between(start_date, end_date)
-        ).all()
-        
-        df = pd.DataFrame(data, columns=[
-            'Scan ID', 'User ID', 'Username', 'Document Title', 
-            'Scan Date', 'AI Similarity', 'Traditional Similarity'
-        ])
+        ).order_by(ScanLog.id)
         
     elif data_type == 'users':
-        data = db.session.query(
+        columns = [
+            'User ID', 'Username', 'Email', 'Role',
+            'Credits', 'Created At', 'Last Login'
+        ]
+        statement = select(
             User.id, User.username, User.email, User.role,
             User.credits, User.created_at, User.last_login
-        ).filter(User.role == 'user').all()
-        
-        df = pd.DataFrame(data, columns=[
-            'User ID', 'Username', 'Email', 'Role', 
-            'Credits', 'Created At', 'Last Login'
-        ])
+        ).where(User.role == 'user').order_by(User.id)
+        # Users are only filtered by registration date when a range is given
+        if start_date is not None:
+            statement = statement.where(User.created_at.between(start_date, end_date))
         
     elif data_type == 'documents':
-        data = db.session.query(
+        columns = [
+            'Document ID', 'Title', 'File Type', 'File Size',
+            'Word Count', 'Language', 'Owner', 'Created At'
+        ]
+        statement = select(
             Document.id, Document.title, Document.file_type,
             Document.file_size, Document.word_count, Document.language,
             User.username, Document.created_at
-        ).join(User).filter(
+        ).join(
+            User, Document.user_id == User.id
+        ).where(
             Document.created_at.between(start_date, end_date)
-        ).all()
-        
-        df = pd.DataFrame(data, columns=[
-            'Document ID', 'Title', 'File Type', 'File Size',
-            'Word Count', 'Language', 'Owner', 'Created At'
-        ])
+        ).order_by(Document.id)
         
     else:  # matches
-        data = db.session.query(
+        columns = [
+            'Match ID', 'Scan ID', 'Source Document',
+            'Matched Document', 'AI Similarity', 'Traditional Similarity',
+            'Match Type', 'Match Date'
+        ]
+        source_doc = aliased(Document)
+        matched_doc = aliased(Document)
+        statement = select(
             DocumentMatch.id, DocumentMatch.scan_id,
-            Document.title.label('source_doc'),
-            Document.title.label('matched_doc'),
+            source_doc.title, matched_doc.title,
             DocumentMatch.ai_similarity_score,
             DocumentMatch.traditional_similarity_score,
             DocumentMatch.match_type,
             DocumentMatch.created_at
         ).join(
-            Document, DocumentMatch.document_id == Document.id
-        ).filter(
+            source_doc, DocumentMatch.source_document_id == source_doc.id
+        ).join(
+            matched_doc, DocumentMatch.matched_document_id == matched_doc.id
+        ).where(
             DocumentMatch.created_at.between(start_date, end_date)
-        ).all()
+        ).order_by(DocumentMatch.id)
+    
+    return columns, statement
+
+def _parse_export_range():
+    """
+    Read the export date range from ?start= and ?end= (YYYY-MM-DD, inclusive).
+    
+    Defaults to the last 30 days.
+    
+    Raises:
+        ValueError: If a date is malformed or the range is reversed
+    """
+    end = request.args.get('end')
+    start = request.args.get('start')
+    
+    end_date = (
+        datetime.combine(datetime.strptime(end, '%Y-%m-%d').date(), datetime.max.time())
+        if end else datetime.now()
+    )
+    start_date = (
+        datetime.strptime(start, '%Y-%m-%d') if start else end_date - timedelta(days=30)
+    )
+    if start_date > end_date:
+        raise ValueError('start must not be after end')
+    return start_date, end_date
+
+@admin_bp.route('/export/<data_type>', methods=['GET'])
+@login_required
+@admin_required
+def export_data(data_type):
+    """
+    Stream an export of system data.
+    
+    Supports:
+    - Scans
+    - Users
+    - Documents
+    - Matches
+    
+    Query parameters:
+    - format: csv (default) or ndjson
+    - gzip: 1 to gzip the download
+    - start, end: Date range as YYYY-MM-DD (default: last 30 days)
+    
+    Rows are fetched in batches on the read-only reporting connection and
+    encoded as they are sent, so memory use does not grow with the export.
+    
+    Returns:
+        Streaming CSV or NDJSON file
+    """
+    if data_type not in ['scans', 'users', 'documents', 'matches']:
+        return jsonify({'error': 'Invalid data type'}), 400
+    
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'Invalid format'}), 400
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    
+    try:
+        start_date, end_date = _parse_export_range()
+    except ValueError:
+        return jsonify({'error': 'Invalid date range, use YYYY-MM-DD'}), 400
+    
+    if data_type == 'users' and not (request.args.get('start') or request.args.get('end')):
+        start_date = None
+    
+    columns, statement = _export_statement(data_type, start_date, end_date)
+    batch_size = app.config.get('EXPORT_BATCH_SIZE', 1000)
+    
+    def generate():
+        with reporting_session() as reporting:
+            batches = iter_result_rows(reporting, statement, batch_size)
+            yield from stream_export(columns, batches, fmt, compress)
+    
+    mimetype, headers = export_response_headers(
+        f'{data_type}_export_{datetime.now().strftime("%Y%m%d")}', fmt, compress
+    )
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers=headers)
+
+@admin_bp.route('/profiling', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def profiling():
+    """
+    Enable or disable the request profiler and list saved profiles.
+    
+    POST form/JSON fields:
+    - action: 'enable' or 'disable'
+    - requests: Number of requests to profile (1-1000)
+    - endpoint: Only profile this endpoint (optional)
+    - username: Only profile this user's requests (optional)
+    
+    Returns:
+        JSON response for API requests
+        HTML template for web requests
+    """
+    is_json = request.content_type == 'application/json'
+    
+    if request.method == 'POST':
+        data = request.get_json() if is_json else request.form
         
-        df = pd.DataFrame(data, columns=[
-            'Match ID', 'Scan ID', 'Source Document',
-            'Matched Document', 'AI Similarity', 'Traditional Similarity',
-            'Match Type', 'Match Date'
-        ])
-    
-    # Create CSV in memory
-    output = io.StringIO()
-    df.to_csv(output, index=False)
-    output.seek(0)
-    
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'{data_type}_export_{datetime.now().strftime("%Y%m%d")}.csv'
+        if data.get('action') == 'disable':
+            disable_profiling()
+            message = 'Profiling disabled'
+        else:
+            try:
+                count = int(data.get('requests', 10))
+                if not 1 <= count <= 1000:
+                    raise ValueError("Request count out of range")
+            except (ValueError, TypeError):
+                if is_json:
+                    return jsonify({'error': 'requests must be between 1 and 1000'}), 400
+                flash('Number of requests must be between 1 and 1000', 'error')
+                return redirect(url_for('admin.profiling'))
+            
+            endpoint = data.get('endpoint') or None
+            if endpoint and endpoint not in app.view_functions:
+                if is_json:
+                    return jsonify({'error': 'Unknown endpoint'}), 400
+                flash('Unknown endpoint', 'error')
+                return redirect(url_for('admin.profiling'))
+            
+            user_id = None
+            if data.get('username'):
+                user = User.query.filter_by(username=data.get('username')).first()
+                if not user:
+                    if is_json:
+                        return jsonify({'error': 'User not found'}), 404
+                    flash('User not found', 'error')
+                    return redirect(url_for('admin.profiling'))
+                user_id = user.id
+            
+            enable_profiling(count, endpoint=endpoint, user_id=user_id, enabled_by=current_user.id)
+            message = f'Profiling enabled for the next {count} matching requests'
+        
+        if is_json:
+            return jsonify({'message': message, 'state': get_profiling_state(force=True)}), 200
+        flash(message, 'success')
+        return redirect(url_for('admin.profiling'))
+    
+    state = get_profiling_state(force=True)
+    profiles = list_profiles()
+    
+    if is_json:
+        return jsonify({'state': state, 'profiles': profiles}), 200
+    
+    return render_template(
+        'admin/profiling.html',
+        state=state,
+        profiles=profiles,
+        endpoints=sorted(name for name in app.view_functions if name != 'static')
     )
 
+@admin_bp.route('/profiling/<path:filename>', methods=['GET'])
+@login_required
+@admin_required
+def download_profile(filename):
+    """Download a saved profile in collapsed-stack format."""
+    if not filename.endswith(PROFILE_SUFFIX) or filename != secure_filename(filename):
+        return jsonify({'error': 'Invalid profile name'}), 400
+    return send_from_directory(profile_directory(), filename, as_attachment=True, mimetype='text/plain')
+
+@admin_bp.route('/memory', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def memory():
+    """
+    Memory diagnostics for the worker serving the request.
+    
+    POST form/JSON field action:
+    - start: Start tracemalloc
+    - baseline: Take the snapshot later reports are diffed against
+    - stop: Stop tracemalloc
+    
+    The report lists RSS, the top allocation sites, growth since the
+    baseline and recent upload/export requests with their peak RSS.
+    
+    Returns:
+        JSON response for API requests
+        HTML template for web requests
+    """
+    is_json = request.content_type == 'application/json'
+    
+    if request.method == 'POST':
+        action = (request.get_json() if is_json else request.form).get('action')
+        if action == 'start':
+            start_tracing()
+            message = 'Memory tracing started'
+        elif action == 'baseline':
+            try:
+                take_baseline()
+            except RuntimeError:
+                if is_json:
+                    return jsonify({'error': 'Start tracing first'}), 400
+                flash('Start tracing before taking a baseline snapshot', 'error')
+                return redirect(url_for('admin.memory'))
+            message = 'Baseline snapshot taken'
+        elif action == 'stop':
+            stop_tracing()
+            message = 'Memory tracing stopped'
+        else:
+            if is_json:
+                return jsonify({'error': 'Invalid action'}), 400
+            flash('Invalid action', 'error')
+            return redirect(url_for('admin.memory'))
+        
+        if is_json:
+            return jsonify({'message': message}), 200
+        flash(message, 'success')
+        return redirect(url_for('admin.memory'))
+    
+    report = memory_report()
+    if is_json:
+        return jsonify(report), 200
+    return render_template('admin/memory.html', report=report)
+
 @admin_bp.route('/help', methods=['GET'])
 @login_required
 @admin_required
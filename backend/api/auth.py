@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash, session
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from database.models import db, User
+from database.models import db, User, DailyStat, GlobalCounter
+from backend.utils.cache import bump_versions
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -46,6 +47,9 @@ def register():
         new_user.set_password(password)
         
         db.session.add(new_user)
+        DailyStat.record(registrations=1)
+        GlobalCounter.increment(users=1)
+        bump_versions('users')
         db.session.commit()
         
         if request.content_type == 'application/json':
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash
 from flask_login import login_required, current_user
-from database.models import db, User, CreditRequest
+from database.models import db, User, CreditRequest, DailyStat, GlobalCounter
+from backend.utils.cache import bump_versions
+from backend.services.credit_service import CreditService
 
 credit_bp = Blueprint('credit', __name__, url_prefix='/credit')
 
@@ -35,6 +37,9 @@ def request_credits():
             status='pending'
         )
         db.session.add(credit_request)
+        DailyStat.record(credit_requests=1)
+        GlobalCounter.increment(pending_requests=1)
+        bump_versions('credit_requests')
         db.session.commit()
         
         if request.content_type == 'application/json':
@@ -65,14 +70,14 @@ def approve_request(request_id):
         flash('Request already processed', 'error')
         return redirect(url_for('admin.credit_requests'))
     
-    # Update request status
-    credit_request.status = 'approved'
-    credit_request.admin_id = current_user.id
-    
-    # Add credits to user
-    user = User.query.get(credit_request.user_id)
-    user.credits += credit_request.amount
-    
+    # Mark the request approved and grant its credits, unless another
+    # admin resolved it in the meantime
+    if not CreditService.resolve_request(request_id, current_user.id, 'approved'):
+        db.session.rollback()
+        if request.content_type == 'application/json':
+            return jsonify({'error': 'Request already processed'}), 400
+        flash('Request already processed', 'error')
+        return redirect(url_for('admin.credit_requests'))
     db.session.commit()
     
     if request.content_type == 'application/json':
@@ -102,9 +107,12 @@ def deny_request(request_id):
         return redirect(url_for('admin.credit_requests'))
     
     # Update request status
-    credit_request.status = 'denied'
-    credit_request.admin_id = current_user.id
-    
+    if not CreditService.resolve_request(request_id, current_user.id, 'denied'):
+        db.session.rollback()
+        if request.content_type == 'application/json':
+            return jsonify({'error': 'Request already processed'}), 400
+        flash('Request already processed', 'error')
+        return redirect(url_for('admin.credit_requests'))
     db.session.commit()
     
     if request.content_type == 'application/json':
@@ -143,7 +151,7 @@ def adjust_credits(user_id):
         return redirect(url_for('admin.user_detail', user_id=user_id))
     
     # Update user credits
-    user.credits = amount
+    CreditService.set_balance(user.id, amount)
     db.session.commit()
     
     if request.content_type == 'application/json':
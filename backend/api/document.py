@@ -1,106 +1,135 @@
 import os
 import json
-import requests
 from flask import Blueprint, request, jsonify, render_template, current_app, flash, redirect, url_for
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
-from database.models import db, Document, ScanLog, DocumentMatch, User
+from database.models import db, Document, ScanLog, DocumentMatch, User, DailyStat, GlobalCounter
 import re
 import math
+import time
 from collections import Counter
 
 document_bp = Blueprint('document', __name__, url_prefix='/document')
 
 from ..utils.document_parser import DocumentParser
+from ..utils.cache import bump_versions
+from ..utils.metrics import (
+    timed, observe_since, SCAN_PARSE_SECONDS, SCAN_HASH_SECONDS, SCAN_CANDIDATES_SECONDS,
+    SCAN_TFIDF_SECONDS, SCAN_PREFILTER_SECONDS, AI_REQUEST_SECONDS, SCAN_DB_COMMIT_SECONDS, SCAN_TOTAL_SECONDS
+)
+from ..services.credit_service import CreditService
+from ..services.provider_router import get_provider_router, mark_rate_limited
+from ..utils.memory import current_probe_summary
+from ..utils.rate_limiter import get_rate_limiter, estimate_tokens
 
 # Helper function to check if file is allowed
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in DocumentParser.get_allowed_extensions()
 
-# Helper function to get text similarity using OpenRouter API
-def get_openrouter_similarity(text1, text2):
-    try:
-        headers = {
-            "Authorization": f"Bearer {current_app.config['OPENROUTER_API_KEY']}",
-            "HTTP-Referer": "http://localhost:5001",
-            "Content-Type": "application/json"
-        }
-        
-        # Create a clear prompt for similarity comparison
-        prompt = f"""Compare the semantic similarity between these two texts and return a similarity score between 0 and 1.
-- Score 1.0 means the texts are semantically identical or extremely similar
+# Instructions shared by the pairwise and batched similarity prompts
+SIMILARITY_SYSTEM_PROMPT = "You are an expert at semantic text comparison. Always return only a number between 0 and 1."
+SCORE_GUIDE = """- Score 1.0 means the texts are semantically identical or extremely similar
 - Score 0.0 means the texts are completely different
 - Score 0.7-0.9 means high similarity (same topic, similar content)
 - Score 0.4-0.6 means moderate similarity (related topics)
-- Score 0.1-0.3 means low similarity (few common elements)
-
-Return ONLY the similarity score as a number between 0 and 1, no other text.
+- Score 0.1-0.3 means low similarity (few common elements)"""
 
-Text 1:
-{text1[:1500]}
-
-Text 2:
-{text2[:1500]}
-
-Similarity score:"""
+# Helper function to send one request to a Mistral or OpenRouter endpoint,
+# waiting for rate-limit capacity and retrying after 429s.
+# Returns extract(response JSON), or None if the call failed or extract raised ValueError.
+def _provider_request(provider, endpoint, payload, estimated_tokens, extract, label):
+    started, outcome = None, 'exception'
+    try:
+        import requests  # Deferred so that importing the app does not load it
         
-        payload = {
-            "model": current_app.config['OPENROUTER_MODEL'],
-            "messages": [
-                {"role": "system", "content": "You are an expert at semantic text comparison. Always return only a number between 0 and 1."},
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": 0.1,
-            "max_tokens": 10  # We only need a number
-        }
+        config = current_app.config
+        if provider == 'mistral':
+            url = f"{config['MISTRAL_BASE_URL']}/{endpoint}"
+            headers = {"Authorization": f"Bearer {config['MISTRAL_API_KEY']}"}
+        else:
+            url = f"{config['OPENROUTER_BASE_URL']}/{endpoint}"
+            headers = {
+                "Authorization": f"Bearer {config['OPENROUTER_API_KEY']}",
+                "HTTP-Referer": "http://localhost:5001"
+            }
+        headers["Content-Type"] = "application/json"
         
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=30
-        )
+        # Wait for quota (and any Retry-After pause) instead of failing on a 429
+        limiter = get_rate_limiter()
+        deadline = time.monotonic() + config.get('AI_RATE_LIMIT_MAX_WAIT', 30)
+        while True:
+            if not limiter.acquire(provider, estimated_tokens, deadline):
+                outcome = 'rate_limited'
+                mark_rate_limited()
+                current_app.logger.warning(f"{provider} has no rate-limit capacity in time; skipping the call")
+                return None
+            
+            started = time.perf_counter()
+            response = requests.post(url, headers=headers, json=payload, timeout=30)
+            if response.status_code != 429:
+                break
+            
+            observe_since(AI_REQUEST_SECONDS, started, f'ai_{label}', provider=label, outcome='rate_limited')
+            started = None
+            paused = limiter.block(provider, response.headers.get('Retry-After'))
+            current_app.logger.warning(f"{provider} returned 429; pausing calls to it for {paused:g}s")
         
         if response.status_code == 200:
             result = response.json()
-            similarity_text = result['choices'][0]['message']['content'].strip()
+            used_tokens = (result.get('usage') or {}).get('total_tokens')
+            if used_tokens:
+                limiter.adjust(provider, used_tokens - estimated_tokens)
             try:
-                similarity = float(similarity_text)
-                return min(max(similarity, 0), 1)  # Ensure it's between 0 and 1
-            except ValueError:
-                current_app.logger.error(f"OpenRouter returned non-numeric response: {similarity_text}")
+                extracted = extract(result)
+                outcome = 'ok'
+                return extracted
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                outcome = 'bad_response'
+                current_app.logger.error(f"{provider} returned an unusable response: {str(e)[:200]}")
                 return None
+        outcome = 'http_error'
         return None
     except Exception as e:
-        current_app.logger.error(f"OpenRouter API error: {str(e)}")
+        current_app.logger.error(f"{provider} API error: {str(e)}")
         return None
+    finally:
+        if started is not None:
+            observe_since(AI_REQUEST_SECONDS, started, f'ai_{label}', provider=label, outcome=outcome)
 
-# Helper function to get text similarity using Mistral API
-def get_mistral_similarity(text1, text2):
-    try:
-        # First check if texts are identical or nearly identical
-        if text1 == text2:
-            return 1.0
-            
-        # Check if one text is completely contained in the other
-        if text1 in text2 or text2 in text1:
-            longer = max(len(text1), len(text2))
-            shorter = min(len(text1), len(text2))
-            if shorter / longer > 0.9:  # If the shorter text is >90% of the longer text
-                return 0.95
-        
-        headers = {
-            "Authorization": f"Bearer {current_app.config['MISTRAL_API_KEY']}",
-            "Content-Type": "application/json"
-        }
-        
-        # Create a clear prompt for similarity comparison
-        prompt = f"""Compare the semantic similarity between these two texts and return a similarity score between 0 and 1.
-- Score 1.0 means the texts are semantically identical or extremely similar
-- Score 0.0 means the texts are completely different
-- Score 0.7-0.9 means high similarity (same topic, similar content)
-- Score 0.4-0.6 means moderate similarity (related topics)
-- Score 0.1-0.3 means low similarity (few common elements)
+# Helper function to send a chat completion to Mistral or OpenRouter.
+# Returns parse(reply text), or None if the call failed or parse raised ValueError.
+def _chat_completion(provider, messages, max_tokens, parse, label=None):
+    if provider == 'mistral':
+        model = "mistral-small"  # Using a more powerful model for better similarity detection
+    else:
+        model = current_app.config['OPENROUTER_MODEL']
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": 0.1,
+        "max_tokens": max_tokens
+    }
+    
+    def extract(result):
+        reply = result['choices'][0]['message']['content'].strip()
+        try:
+            return parse(reply)
+        except ValueError:
+            raise ValueError(reply)
+    
+    return _provider_request(
+        provider, 'chat/completions', payload, estimate_tokens(messages, max_tokens), extract, label or provider
+    )
+
+# Helper function to parse a single similarity score, clamped to [0, 1]
+def _parse_score(reply):
+    return min(max(float(reply), 0), 1)
+
+# Helper function to get text similarity for one pair from a provider
+def _pair_similarity(provider, text1, text2):
+    # Create a clear prompt for similarity comparison
+    prompt = f"""Compare the semantic similarity between these two texts and return a similarity score between 0 and 1.
+{SCORE_GUIDE}
 
 Return ONLY the similarity score as a number between 0 and 1, no other text.
 
@@ -111,55 +140,306 @@ Text 2:
 {text2[:1500]}
 
 Similarity score:"""
+    
+    messages = [
+        {"role": "system", "content": SIMILARITY_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+    return _chat_completion(provider, messages, 10, _parse_score)  # We only need a number
+
+# Helper function to get text similarity using OpenRouter API
+def get_openrouter_similarity(text1, text2):
+    return _pair_similarity('openrouter', text1, text2)
+
+# Helper function to score identical or nearly identical texts without an API call.
+# Returns None when the texts need a real comparison.
+def get_containment_similarity(text1, text2):
+    if text1 == text2:
+        return 1.0
+    
+    # Check if one text is completely contained in the other
+    if text1 in text2 or text2 in text1:
+        longer = max(len(text1), len(text2))
+        shorter = min(len(text1), len(text2))
+        if shorter / longer > 0.9:  # If the shorter text is >90% of the longer text
+            return 0.95
+    return None
+
+# Helper function to get text similarity using Mistral API
+def get_mistral_similarity(text1, text2):
+    # First check if texts are identical or nearly identical
+    score = get_containment_similarity(text1, text2)
+    if score is not None:
+        return score
+    return _pair_similarity('mistral', text1, text2)
+
+# Helper function to parse a batched reply into {candidate index: score}.
+# Accepts {"scores": [{"id": 1, "score": 0.8}, ...]}, a bare list of such
+# objects, or {"1": 0.8, ...}; items with an unknown id or a score outside
+# [0, 1] are dropped. Raises ValueError if no item is usable.
+def parse_batch_scores(reply, count):
+    text = reply.strip()
+    if text.startswith('```'):
+        text = text.strip('`').split('\n', 1)[-1]
+    start = min((i for i in (text.find('{'), text.find('[')) if i >= 0), default=-1)
+    end = max(text.rfind('}'), text.rfind(']'))
+    if start < 0 or end < start:
+        raise ValueError('No JSON in batch reply')
+    data = json.loads(text[start:end + 1])  # json.JSONDecodeError is a ValueError
+    
+    if isinstance(data, dict) and isinstance(data.get('scores'), list):
+        items = data['scores']
+    elif isinstance(data, list):
+        items = data
+    elif isinstance(data, dict):
+        items = [{'id': key, 'score': value} for key, value in data.items()]
+    else:
+        raise ValueError('Unexpected batch reply shape')
+    
+    scores = {}
+    for item in items:
+        try:
+            index = int(item['id'])
+            score = float(item['score'])
+        except (TypeError, KeyError, ValueError):
+            continue
+        if 1 <= index <= count and 0.0 <= score <= 1.0 and not math.isnan(score):
+            scores.setdefault(index - 1, score)
+    if not scores:
+        raise ValueError('No valid scores in batch reply')
+    return scores
+
+# Helper function to score one text against several candidates in one call.
+# Returns {candidate index: score} (possibly partial) or None.
+def _batch_similarity(provider, text, candidates):
+    excerpt_chars = current_app.config.get('AI_BATCH_EXCERPT_CHARS', 1000)
+    listing = "\n\n".join(
+        f"[{index}]\n{candidate[:excerpt_chars]}" for index, candidate in enumerate(candidates, 1)
+    )
+    prompt = f"""Compare the semantic similarity between the new document and each numbered candidate, and give each candidate a similarity score between 0 and 1.
+{SCORE_GUIDE}
+
+Return ONLY a JSON object of the form {{"scores": [{{"id": 1, "score": 0.42}}, ...]}} with one entry per candidate, no other text.
+
+New document:
+{text[:1500]}
+
+Candidates:
+{listing}
+
+JSON:"""
+    
+    messages = [
+        {"role": "system", "content": "You are an expert at semantic text comparison. Always answer with JSON only."},
+        {"role": "user", "content": prompt}
+    ]
+    return _chat_completion(
+        provider, messages, 20 * len(candidates) + 20,
+        lambda reply: parse_batch_scores(reply, len(candidates)),
+        label=f'{provider}_batch'
+    )
+
+# Helper function to get an AI similarity score from whichever provider the
+# router picks (fastest healthy first, hedged, with circuit breaking).
+# Returns (score, provider), or (None, None) if no provider answered.
+def get_ai_similarity(text1, text2):
+    score = get_containment_similarity(text1, text2)
+    if score is not None:
+        return score, 'containment'
+    
+    providers = {'mistral': get_mistral_similarity, 'openrouter': get_openrouter_similarity}
+    return get_provider_router().similarity(text1, text2, providers)
+
+# Helper function to get AI similarity scores for several candidates at once,
+# routed like get_ai_similarity. Returns ({candidate index: score}, provider),
+# or (None, None) if no provider answered.
+def get_ai_batch_similarity(text, candidates):
+    providers = {
+        'mistral': lambda text, candidates: _batch_similarity('mistral', text, candidates),
+        'openrouter': lambda text, candidates: _batch_similarity('openrouter', text, candidates)
+    }
+    return get_provider_router('batch').call(providers, text, candidates)
+
+# Helper function to L2-normalise an embedding and pack it as float32 bytes,
+# so cosine similarity against stored vectors is a plain dot product
+def _pack_embedding(vector):
+    import numpy as np
+    array = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(array))
+    if array.ndim != 1 or not array.size or not math.isfinite(norm) or norm == 0:
+        raise ValueError('Unusable embedding vector')
+    return (array / norm).tobytes()
+
+# Helper function to embed texts with EMBEDDING_PROVIDER, EMBEDDING_BATCH_SIZE
+# texts per call. Returns one packed vector per text (None where its call failed).
+def embed_texts(texts):
+    config = current_app.config
+    provider = config.get('EMBEDDING_PROVIDER', 'mistral')
+    model = config.get('EMBEDDING_MODEL', 'mistral-embed')
+    batch_size = max(1, config.get('EMBEDDING_BATCH_SIZE', 32))
+    max_chars = config.get('EMBEDDING_MAX_CHARS', 8000)
+    
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        chunk = [text[:max_chars] for text in texts[start:start + batch_size]]
         
-        payload = {
-            "model": "mistral-small",  # Using a more powerful model for better similarity detection
-            "messages": [
-                {"role": "system", "content": "You are an expert at semantic text comparison. Always return only a number between 0 and 1."},
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": 0.1,
-            "max_tokens": 10  # We only need a number
-        }
+        def extract(result, count=len(chunk)):
+            data = sorted(result['data'], key=lambda item: item['index'])
+            if len(data) != count:
+                raise ValueError(f"Expected {count} embeddings, got {len(data)}")
+            return [_pack_embedding(item['embedding']) for item in data]
         
-        response = requests.post(
-            "https://api.mistral.ai/v1/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=30
+        packed = _provider_request(
+            provider, 'embeddings', {"model": model, "input": chunk},
+            sum(len(text) for text in chunk) // 4, extract, f'{provider}_embed'
         )
-        
-        if response.status_code == 200:
-            result = response.json()
-            similarity_text = result['choices'][0]['message']['content'].strip()
-            try:
-                similarity = float(similarity_text)
-                return min(max(similarity, 0), 1)  # Ensure it's between 0 and 1
-            except ValueError:
-                current_app.logger.error(f"Mistral returned non-numeric response: {similarity_text}")
-                return None
-        return None
-    except Exception as e:
-        current_app.logger.error(f"Mistral API error: {str(e)}")
-        return None
+        vectors.extend(packed or [None] * len(chunk))
+    return vectors
+
+# Helper function to score an upload's embedding against every document with a
+# stored embedding from the same model, as one matrix-vector product.
+# Cosines at or below EMBEDDING_SIMILARITY_FLOOR map to 0 and 1.0 stays 1.0.
+# Returns {document id: (score, 'embedding')}; documents without a usable vector are omitted.
+def score_with_embeddings(embedding, documents):
+    import numpy as np
+    config = current_app.config
+    model = config.get('EMBEDDING_MODEL', 'mistral-embed')
+    stored = [
+        doc for doc in documents
+        if doc.embedding and doc.embedding_model == model and len(doc.embedding) == len(embedding)
+    ]
+    if not stored:
+        return {}
+    
+    matrix = np.frombuffer(b''.join(doc.embedding for doc in stored), dtype=np.float32).reshape(len(stored), -1)
+    cosines = matrix @ np.frombuffer(embedding, dtype=np.float32)
+    floor = min(config.get('EMBEDDING_SIMILARITY_FLOOR', 0.0), 0.99)
+    scores = np.clip((cosines - floor) / (1 - floor), 0.0, 1.0)
+    return {doc.id: (float(score), 'embedding') for doc, score in zip(stored, scores)}
+
+# Helper function to embed existing documents that have no vector from the
+# current EMBEDDING_MODEL, batch by batch, committing after each batch.
+# Returns (documents embedded, documents whose call failed).
+def backfill_embeddings(limit=None):
+    from sqlalchemy import bindparam, or_
+    model = current_app.config.get('EMBEDDING_MODEL', 'mistral-embed')
+    query = db.session.query(Document.id).filter(
+        or_(Document.embedding.is_(None), Document.embedding_model.is_(None), Document.embedding_model != model)
+    ).order_by(Document.id)
+    if limit:
+        query = query.limit(limit)
+    ids = [row.id for row in query]
+    
+    batch_size = max(1, current_app.config.get('EMBEDDING_BATCH_SIZE', 32))
+    table = Document.__table__
+    statement = table.update().where(table.c.id == bindparam('doc_id')).values(
+        embedding=bindparam('vector'),
+        embedding_model=model,
+        updated_at=table.c.updated_at  # A derived column; the document itself did not change
+    )
+    embedded = failed = 0
+    for start in range(0, len(ids), batch_size):
+        rows = db.session.query(Document.id, Document.content).filter(
+            Document.id.in_(ids[start:start + batch_size])
+        ).all()
+        vectors = embed_texts([row.content for row in rows])
+        values = [{'doc_id': row.id, 'vector': vector} for row, vector in zip(rows, vectors) if vector is not None]
+        if values:
+            db.session.execute(statement, values)
+            db.session.commit()
+        embedded += len(values)
+        failed += len(rows) - len(values)
+    return embedded, failed
+
+# Helper function to get AI scores for every document an upload is compared with.
+# Candidates are sent AI_BATCH_SIZE at a time; any a batch reply leaves out (or
+# a failed batch) fall back to one call per document.
+# With AI_SIMILARITY_MODE=embeddings and the upload's embedding given, documents
+# with a stored embedding are scored by cosine instead and only the rest use chat calls.
+# Returns {document id: (score, provider)}; documents without a score are omitted.
+def score_with_ai(content, documents, embedding=None):
+    results, pending = {}, []
+    for doc in documents:
+        score = get_containment_similarity(content, doc.content)
+        if score is not None:
+            results[doc.id] = (score, 'containment')
+        else:
+            pending.append(doc)
+    
+    if embedding is not None and pending:
+        results.update(score_with_embeddings(embedding, pending))
+        pending = [doc for doc in pending if doc.id not in results]
+        if pending:
+            current_app.logger.info(
+                f"{len(pending)} documents have no embedding yet; scoring them with chat calls "
+                "(run `python db_management.py embed` to backfill)"
+            )
+    
+    batch_size = current_app.config.get('AI_BATCH_SIZE', 20)
+    fallback = pending
+    if batch_size > 1 and len(pending) > 1:
+        fallback = []
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            scores, provider = get_ai_batch_similarity(content, [doc.content for doc in chunk])
+            scores = scores or {}
+            for index, doc in enumerate(chunk):
+                if index in scores:
+                    results[doc.id] = (scores[index], provider)
+                else:
+                    fallback.append(doc)
+        if fallback:
+            current_app.logger.info(f"Scoring {len(fallback)} documents one by one after batched scoring")
+    
+    for doc in fallback:
+        try:
+            score, provider = get_ai_similarity(content, doc.content)
+        except Exception as e:
+            current_app.logger.error(f"Error getting AI similarity for document {doc.id}: {str(e)}")
+            continue
+        if score is not None:
+            results[doc.id] = (score, provider)
+    return results
+
+# Helper function to import what the first scan would otherwise load on demand
+# (scikit-learn, numpy, requests and the PDF/DOCX parsers). Run at startup in
+# scan workers when SCAN_PREWARM is set.
+def prewarm_scan_dependencies():
+    started = time.perf_counter()
+    import numpy
+    import requests
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+    from PyPDF2 import PdfReader
+    from docx import Document as DocxDocument
+    
+    # Fitting once also loads the modules scikit-learn imports lazily itself
+    TfidfVectorizer().fit_transform(['prewarm the vectorizer', 'and its lazy imports'])
+    return time.perf_counter() - started
+
+# Helper function to create the TF-IDF vectorizer shared by the pairwise
+# similarity and the candidate prefilter, so both rank texts the same way
+def _tfidf_vectorizer():
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    
+    return TfidfVectorizer(
+        lowercase=True,
+        strip_accents='unicode',
+        analyzer='word',
+        stop_words='english',
+        token_pattern=r'\w{2,}',  # Words of at least 2 characters
+        max_features=5000,  # Limit features to most common words
+        ngram_range=(1, 2)  # Use both unigrams and bigrams
+    )
 
 # Helper function to get text similarity using traditional methods
 def get_traditional_similarity(text1, text2):
     try:
-        from sklearn.feature_extraction.text import TfidfVectorizer
         from sklearn.metrics.pairwise import cosine_similarity
         import numpy as np
         
         # Create TF-IDF vectorizer with improved parameters
-        vectorizer = TfidfVectorizer(
-            lowercase=True,
-            strip_accents='unicode',
-            analyzer='word',
-            stop_words='english',
-            token_pattern=r'\w{2,}',  # Words of at least 2 characters
-            max_features=5000,  # Limit features to most common words
-            ngram_range=(1, 2)  # Use both unigrams and bigrams
-        )
+        vectorizer = _tfidf_vectorizer()
         
         try:
             # Fit and transform the texts
@@ -191,17 +471,114 @@ def get_traditional_similarity(text1, text2):
         current_app.logger.error(f"Traditional similarity error: {str(e)}")
         return 0.0
 
+# Helper function to get the traditional similarity of a text to several documents
+# with one TF-IDF model fitted over all of them, instead of one fit per pair.
+# Falls back to get_traditional_similarity per pair if the shared fit fails.
+# Returns {document id: score}.
+def get_traditional_similarities(text, documents):
+    if not documents:
+        return {}
+    try:
+        matrix = _tfidf_vectorizer().fit_transform([text] + [doc.content for doc in documents])
+        
+        # Rows are L2-normalised, so the dot product is the cosine similarity
+        scores = (matrix[1:] @ matrix[0].T).toarray().ravel()
+        return {doc.id: max(0.0, min(1.0, float(score))) for doc, score in zip(documents, scores)}
+    except Exception as e:
+        current_app.logger.error(f"Shared TF-IDF fit failed, scoring pairs separately: {str(e)}")
+        return {doc.id: get_traditional_similarity(text, doc.content) for doc in documents}
+
+# Helper function to narrow the documents an upload is scored against.
+# 'exhaustive' keeps them all; 'tfidf_prefilter' keeps exact hash duplicates
+# plus the SCAN_PREFILTER_TOP_K documents closest by TF-IDF cosine, scored
+# with one model fitted over the whole candidate set, so the slow per-pair
+# AI calls only run on likely matches.
+def select_candidates(content, content_hash, documents):
+    strategy = current_app.config.get('SCAN_STRATEGY', 'exhaustive')
+    top_k = current_app.config.get('SCAN_PREFILTER_TOP_K', 20)
+    if strategy == 'exhaustive' or len(documents) <= top_k:
+        return documents
+    if strategy != 'tfidf_prefilter':
+        current_app.logger.warning(f"Unknown SCAN_STRATEGY {strategy!r}; scanning exhaustively")
+        return documents
+    
+    try:
+        import numpy as np
+        
+        with timed(SCAN_PREFILTER_SECONDS, 'prefilter'):
+            exact = [doc for doc in documents if doc.content_hash and doc.content_hash == content_hash]
+            others = [doc for doc in documents if not (doc.content_hash and doc.content_hash == content_hash)]
+            
+            matrix = _tfidf_vectorizer().fit_transform([content] + [doc.content for doc in others])
+            
+            # Rows are L2-normalised, so the dot product is the cosine similarity
+            scores = (matrix[1:] @ matrix[0].T).toarray().ravel()
+            keep = np.argsort(-scores, kind='stable')[:top_k]
+        return exact + [others[index] for index in keep]
+    except Exception as e:
+        current_app.logger.error(f"Candidate prefilter failed, scanning exhaustively: {str(e)}")
+        return documents
+
+# Helper function to score a new document against existing documents.
+# embedding is the upload's packed embedding when AI_SIMILARITY_MODE=embeddings.
+# Returns a dict per document whose similarity is at or above the threshold.
+def find_matches(content, content_hash, documents, threshold=0.5, embedding=None):
+    matches = []
+    documents = select_candidates(content, content_hash, documents)
+    others = [doc for doc in documents if not (doc.content_hash and doc.content_hash == content_hash)]
+    ai_results = score_with_ai(content, others, embedding=embedding)
+    
+    # One TF-IDF fit for the whole scan rather than one per candidate
+    with timed(SCAN_TFIDF_SECONDS, 'tfidf'):
+        trad_results = get_traditional_similarities(content, others)
+    
+    for doc in documents:
+        try:
+            # Check for exact duplicates using content hash
+            if doc.content_hash and doc.content_hash == content_hash:
+                similarity = 1.0
+                ai_score = 1.0
+                trad_score = 1.0
+                match_details = {'match_method': 'hash', 'exact_duplicate': True}
+                current_app.logger.info(f"Exact duplicate found! New document matches {doc.id} by hash")
+            else:
+                # AI score from Mistral or OpenRouter, if either answered
+                ai_score, ai_provider = ai_results.get(doc.id, (None, None))
+                
+                # Traditional similarity score from the shared TF-IDF fit
+                trad_score = trad_results[doc.id]
+                
+                # Use AI score if available, otherwise use traditional score
+                similarity = ai_score if ai_score is not None else trad_score
+                
+                # Create match details
+                match_details = {
+                    'match_method': 'ai' if ai_score is not None else 'traditional',
+                    'exact_duplicate': False,
+                    'ai_method': ai_provider
+                }
+            
+            # Only consider documents with similarity above threshold (0.5 or 50%)
+            if similarity >= threshold:
+                matches.append({
+                    'document': doc,
+                    'similarity': similarity,
+                    'ai_score': ai_score,
+                    'trad_score': trad_score,
+                    'details': match_details
+                })
+        
+        except Exception as e:
+            current_app.logger.error(f"Error processing match for document {doc.id}: {str(e)}")
+            # Continue processing other documents
+            continue
+    
+    return matches
+
 @document_bp.route('/upload', methods=['GET', 'POST'])
 @login_required
 def upload():
     if request.method == 'POST':
-        # Check if user has enough credits
-        if current_user.credits <= 0:
-            if request.content_type == 'application/json':
-                return jsonify({'error': 'Not enough credits'}), 403
-            flash('You do not have enough credits to scan a document', 'error')
-            return redirect(url_for('credit.request_credits'))
-        
         # Get file from request
         if request.content_type == 'application/json':
             if 'file' not in request.files:
@@ -228,113 +605,45 @@ def upload():
             flash(f'File type not allowed. Supported file types: {supported_types}', 'error')
             return render_template('upload.html')
         
+        # Take the scan credit up front with a conditional UPDATE and commit it
+        # right away; it is refunded below if the scan fails
+        if not CreditService.debit(current_user.id):
+            db.session.rollback()
+            if request.content_type == 'application/json':
+                return jsonify({'error': 'Not enough credits'}), 403
+            flash('You do not have enough credits to scan a document', 'error')
+            return redirect(url_for('credit.request_credits'))
+        db.session.commit()
+        
         try:
+            scan_started = time.perf_counter()
+            
             # Get filename
             filename = secure_filename(file.filename)
+            file_type = filename.rsplit('.', 1)[-1].lower()
             
             # Parse file content directly from the uploaded file
             file.seek(0)  # Reset file pointer to beginning
-            content = DocumentParser.parse_file(file)
+            with timed(SCAN_PARSE_SECONDS, 'parse', file_type=file_type):
+                content = DocumentParser.parse_file(file)
             
             # Calculate content hash for duplicate detection
             import hashlib
-            content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+            with timed(SCAN_HASH_SECONDS, 'hash'):
+                content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
             current_app.logger.info(f"Calculated content hash: {content_hash}")
             
-            # Create document with content hash
-            document = Document(
-                title=filename,
-                content=content,
-                content_hash=content_hash,
-                user_id=current_user.id
-            )
-            db.session.add(document)
-            db.session.commit()
-            current_app.logger.info(f"Document created with ID {document.id} and content hash {content_hash}")
-            
-            # Find similar documents
-            all_documents = Document.query.filter(Document.id != document.id).all()
+            # Score against the existing corpus before writing anything, so the
+            # slow AI calls never run while we hold the database write lock
+            with timed(SCAN_CANDIDATES_SECONDS, 'candidates'):
+                all_documents = Document.query.all()
             current_app.logger.info(f"Found {len(all_documents)} other documents to compare with")
             
-            matches = []
-            scan_id = None  # Will be set when creating ScanLog
-            
-            for doc in all_documents:
-                try:
-                    # Check for exact duplicates using content hash
-                    if doc.content_hash and doc.content_hash == content_hash:
-                        similarity = 1.0
-                        ai_score = 1.0
-                        trad_score = 1.0
-                        match_details = {'match_method': 'hash', 'exact_duplicate': True}
-                        current_app.logger.info(f"Exact duplicate found! Document {document.id} matches {doc.id} by hash")
-                    else:
-                        # Use Mistral as primary similarity method
-                        ai_score = get_mistral_similarity(content, doc.content)
-                        
-                        # Fall back to OpenRouter if Mistral fails
-                        if ai_score is None:
-                            ai_score = get_openrouter_similarity(content, doc.content)
-                        
-                        # Calculate traditional similarity score
-                        trad_score = get_traditional_similarity(content, doc.content)
-                        
-                        # Use AI score if available, otherwise use traditional score
-                        similarity = ai_score if ai_score is not None else trad_score
-                        
-                        # Create match details
-                        match_details = {
-                            'match_method': 'ai' if ai_score is not None else 'traditional',
-                            'exact_duplicate': False,
-                            'ai_method': 'mistral' if ai_score == similarity else 'openrouter' if ai_score is not None else None
-                        }
-                    
-                    # Only consider documents with similarity above threshold (0.5 or 50%)
-                    if similarity >= 0.5:
-                        matches.append({
-                            'document': doc,
-                            'similarity': similarity,
-                            'ai_score': ai_score,
-                            'trad_score': trad_score,
-                            'details': match_details
-                        })
-                        
-                        # Create scan log if not already created
-                        if scan_id is None:
-                            scan_log = ScanLog(
-                                user_id=current_user.id,
-                                document_id=document.id,
-                                matched_documents='[]',  # Will update after processing all matches
-                                similarity_score=0  # Will update after processing all matches
-                            )
-                            db.session.add(scan_log)
-                            db.session.commit()
-                            scan_id = scan_log.id
-                        
-                        try:
-                            # Create or update match record
-                            match = DocumentMatch.create_or_update(
-                                source_id=document.id,
-                                matched_id=doc.id,
-                                similarity_score=similarity,
-                                ai_score=ai_score,
-                                traditional_score=trad_score,
-                                details=match_details
-                            )
-                            match.scan_id = scan_id  # Set the scan_id
-                            db.session.add(match)
-                            db.session.commit()
-                            current_app.logger.info(f"Created/updated match between documents {document.id} and {doc.id} with score {similarity}")
-                        except Exception as e:
-                            current_app.logger.error(f"Error creating/updating match: {str(e)}")
-                            db.session.rollback()
-                            # Continue processing other matches
-                            continue
-                
-                except Exception as e:
-                    current_app.logger.error(f"Error processing match for document {doc.id}: {str(e)}")
-                    # Continue processing other documents
-                    continue
+            # In embeddings mode the upload costs one embeddings call however large the corpus is
+            embedding = None
+            if current_app.config.get('AI_SIMILARITY_MODE', 'chat') == 'embeddings':
+                embedding = embed_texts([content])[0]
+            matches = find_matches(content, content_hash, all_documents, embedding=embedding)
             
             # Sort matches by similarity (descending)
             matches.sort(key=lambda x: x['similarity'], reverse=True)
@@ -342,43 +651,91 @@ def upload():
             # Take top 5 matches for display
             top_matches = matches[:5]
             
-            # Update scan log with match information
-            if scan_id:
-                try:
-                    scan_log = ScanLog.query.get(scan_id)
-                    matched_docs_json = json.dumps([{
+            # Write the document, scan log and matches in one transaction
+            db_started = time.perf_counter()
+            document = Document(
+                title=filename,
+                content=content,
+                content_hash=content_hash,
+                embedding=embedding,
+                embedding_model=current_app.config.get('EMBEDDING_MODEL', 'mistral-embed') if embedding else None,
+                user_id=current_user.id
+            )
+            db.session.add(document)
+            db.session.flush()
+            
+            memory = current_probe_summary()
+            if matches:
+                scan_log = ScanLog(
+                    user_id=current_user.id,
+                    document_id=document.id,
+                    matched_documents=json.dumps([{
                         'id': match['document'].id,
                         'title': match['document'].title,
                         'similarity': match['similarity']
-                    } for match in top_matches])
-                    
-                    scan_log.matched_documents = matched_docs_json
-                    scan_log.similarity_score = top_matches[0]['similarity'] if top_matches else 0
-                    db.session.commit()
-                except Exception as e:
-                    current_app.logger.error(f"Error updating scan log: {str(e)}")
+                    } for match in top_matches]),
+                    similarity_score=top_matches[0]['similarity'],
+                    match_count=len(matches),
+                    scan_metadata=json.dumps({'memory': memory}) if memory else None
+                )
+                db.session.add(scan_log)
+                db.session.flush()
+                
+                DocumentMatch.bulk_upsert(scan_log.id, document.id, [{
+                    'document_id': match['document'].id,
+                    'similarity': match['similarity'],
+                    'ai_score': match['ai_score'],
+                    'trad_score': match['trad_score'],
+                    'details': match['details']
+                } for match in matches])
             
-            # Deduct credit
-            current_user.credits -= 1
+            # Keep the dashboard rollups in step with this scan
+            ai_scores = [match['ai_score'] for match in matches if match['ai_score'] is not None]
+            DailyStat.record(
+                uploads=1,
+                credits_used=1,  # The debit above; failed scans are refunded and not counted
+                scans=1 if matches else 0,
+                matches=len(matches),
+                similarity_sum=sum(ai_scores),
+                similarity_count=len(ai_scores)
+            )
+            GlobalCounter.increment(documents=1, scans=1 if matches else 0, matches=len(matches))
+            bump_versions('scans', 'users')
             db.session.commit()
             
-            # Return success
-            if request.content_type == 'application/json':
-                return jsonify({
-                    'message': 'Document uploaded successfully', 
-                    'document_id': document.id,
-                    'matches_count': len(matches)
-                }), 200
-            
-            flash(f'Document uploaded successfully! Found {len(matches)} similar documents.', 'success')
-            return redirect(url_for('document.view', doc_id=document.id))
-            
         except Exception as e:
+            db.session.rollback()
             current_app.logger.error(f"Error processing document: {str(e)}")
+            try:
+                CreditService.refund(current_user.id)
+                db.session.commit()
+            except Exception as refund_error:
+                db.session.rollback()
+                current_app.logger.error(f"Error refunding scan credit for user {current_user.id}: {str(refund_error)}")
             if request.content_type == 'application/json':
                 return jsonify({'error': 'Error processing document'}), 500
             flash('Error processing document. Please try again.', 'error')
             return render_template('upload.html')
+        
+        # The scan is committed (and paid for) from here on, so nothing below
+        # is inside the try that refunds the credit
+        observe_since(SCAN_DB_COMMIT_SECONDS, db_started, 'db')
+        observe_since(SCAN_TOTAL_SECONDS, scan_started, 'total')
+        current_app.logger.info(
+            f"Document created with ID {document.id} and {len(matches)} matches"
+            + (f" (peak RSS {memory['peak_rss_mb']} MB)" if memory else "")
+        )
+        
+        # Return success
+        if request.content_type == 'application/json':
+            return jsonify({
+                'message': 'Document uploaded successfully', 
+                'document_id': document.id,
+                'matches_count': len(matches)
+            }), 200
+        
+        flash(f'Document uploaded successfully! Found {len(matches)} similar documents.', 'success')
+        return redirect(url_for('document.view', doc_id=document.id))
     
     return render_template('upload.html')
 
@@ -403,11 +760,18 @@ def view(doc_id):
         )
     ).order_by(DocumentMatch.similarity_score.desc()).all()
     
+    # Load the other document of every match in one query instead of one per match
+    other_ids = {
+        match.matched_document_id if match.source_document_id == doc_id else match.source_document_id
+        for match in matches
+    }
+    others = {doc.id: doc for doc in Document.query.filter(Document.id.in_(other_ids))} if other_ids else {}
+    
     # Process matches to ensure the correct document is shown
     processed_matches = []
     for match in matches:
         if match.source_document_id == doc_id:
-            match.matched_document = Document.query.get(match.matched_document_id)
+            match.matched_document = others.get(match.matched_document_id)
             processed_matches.append(match)
         else:
             # Create a temporary match object with swapped document references
@@ -422,7 +786,7 @@ def view(doc_id):
                 created_at=match.created_at,
                 updated_at=match.updated_at
             )
-            temp_match.matched_document = Document.query.get(match.source_document_id)
+            temp_match.matched_document = others.get(match.source_document_id)
             processed_matches.append(temp_match)
     
     # Sort by similarity score
@@ -433,7 +797,7 @@ def view(doc_id):
         return jsonify({
             'document': document.to_dict(),
             'matches': [{
-                'document': Document.query.get(match.matched_document_id).to_dict(),
+                'document': match.matched_document.to_dict(),
                 'similarity': match.similarity_score
             } for match in matches]
         }), 200
@@ -461,11 +825,18 @@ def matches(doc_id):
         )
     ).order_by(DocumentMatch.similarity_score.desc()).all()
     
+    # Load the other document of every match in one query instead of one per match
+    other_ids = {
+        match.matched_document_id if match.source_document_id == doc_id else match.source_document_id
+        for match in matches
+    }
+    others = {doc.id: doc for doc in Document.query.filter(Document.id.in_(other_ids))} if other_ids else {}
+    
     # Process matches to ensure the correct document is shown
     processed_matches = []
     for match in matches:
         if match.source_document_id == doc_id:
-            match.matched_document = Document.query.get(match.matched_document_id)
+            match.matched_document = others.get(match.matched_document_id)
             processed_matches.append(match)
         else:
             # Create a temporary match object with swapped document references
@@ -480,7 +851,7 @@ def matches(doc_id):
                 created_at=match.created_at,
                 updated_at=match.updated_at
             )
-            temp_match.matched_document = Document.query.get(match.source_document_id)
+            temp_match.matched_document = others.get(match.source_document_id)
             processed_matches.append(temp_match)
     
     # Sort by similarity score
@@ -490,7 +861,7 @@ def matches(doc_id):
     if request.content_type == 'application/json':
         return jsonify({
             'matches': [{
-                'document': Document.query.get(match.matched_document_id).to_dict(),
+                'document': match.matched_document.to_dict(),
                 'similarity': match.similarity_score
             } for match in matches]
         }), 200
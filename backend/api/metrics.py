@@ -0,0 +1,38 @@
+"""
+Metrics Blueprint for Document Scanner Application
+
+Exposes the in-process histograms (see backend/utils/metrics.py) in the
+Prometheus text format at /metrics. Signed-in admins can always read the
+endpoint; scrapers must send METRICS_TOKEN as a bearer token. Without a token
+configured, only admins get through.
+"""
+
+import hmac
+
+from flask import Blueprint, Response, current_app, request
+from flask_login import current_user
+
+from backend.utils.metrics import render_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+def _authorized():
+    if current_user.is_authenticated and current_user.role == 'admin':
+        return True
+    token = current_app.config.get('METRICS_TOKEN')
+    if not token:
+        return False
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        return False
+    supplied = header[len('Bearer '):].strip()
+    return hmac.compare_digest(supplied, token)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Return every metric in the Prometheus text exposition format."""
+    if not _authorized():
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
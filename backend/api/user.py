@@ -1,66 +1,156 @@
-from flask import Blueprint, request, jsonify, render_template
+from flask import (
+    Blueprint, request, jsonify, render_template, flash, redirect, url_for,
+    current_app, Response, stream_with_context
+)
 from flask_login import login_required, current_user
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
 from database.models import db, User, Document, ScanLog, CreditRequest
+from database.engine import reporting_session
+from backend.utils.pagination import keyset_page, parse_page_size
+from backend.utils.export import EXPORT_FORMATS, iter_result_rows, stream_export, export_response_headers
 
 user_bp = Blueprint('user', __name__, url_prefix='/user')
 
+# Helper function to build the current user's list queries, with the relations
+# ScanLog.to_dict and the templates read loaded up front
+def _history_queries():
+    return {
+        'documents': (Document.query.filter_by(user_id=current_user.id), Document),
+        'scan_logs': (
+            ScanLog.query.options(
+                joinedload(ScanLog.user),
+                joinedload(ScanLog.document).load_only(Document.id, Document.title)
+            ).filter_by(user_id=current_user.id),
+            ScanLog
+        ),
+        'credit_requests': (CreditRequest.query.filter_by(user_id=current_user.id), CreditRequest)
+    }
+
+# Helper function to fetch one keyset page of each list; each list takes its
+# cursor from the <name>_cursor query argument. Raises ValueError on a bad cursor.
+def _history_pages(default_limit):
+    limit = parse_page_size(request.args.get('limit'), default_limit)
+    pages, next_cursors = {}, {}
+    for name, (query, model) in _history_queries().items():
+        pages[name], next_cursors[name] = keyset_page(
+            query, model, request.args.get(f'{name}_cursor'), limit
+        )
+    return pages, next_cursors
+
 @user_bp.route('/profile', methods=['GET'])
 @login_required
 def profile():
+    try:
+        pages, next_cursors = _history_pages(default_limit=20)
+    except ValueError:
+        if request.content_type == 'application/json':
+            return jsonify({'error': 'Invalid cursor'}), 400
+        flash('Invalid page link', 'error')
+        return redirect(url_for('user.profile'))
+    
     if request.content_type == 'application/json':
         return jsonify({
             'user': current_user.to_dict(),
-            'documents': [doc.to_dict() for doc in current_user.documents],
-            'scan_logs': [log.to_dict() for log in current_user.scan_logs],
-            'credit_requests': [req.to_dict() for req in current_user.credit_requests]
+            'documents': [doc.to_dict() for doc in pages['documents']],
+            'scan_logs': [log.to_dict() for log in pages['scan_logs']],
+            'credit_requests': [req.to_dict() for req in pages['credit_requests']],
+            'next_cursors': next_cursors
         }), 200
     
+    # Totals for the stat cards; both counts use the user_id indexes
+    document_count = db.session.query(func.count(Document.id)).filter(Document.user_id == current_user.id).scalar()
+    scan_count = db.session.query(func.count(ScanLog.id)).filter(ScanLog.user_id == current_user.id).scalar()
+    
     return render_template('profile.html', 
                           user=current_user,
-                          documents=current_user.documents,
-                          scan_logs=current_user.scan_logs,
-                          credit_requests=current_user.credit_requests)
+                          documents=pages['documents'],
+                          scan_logs=pages['scan_logs'],
+                          credit_requests=pages['credit_requests'],
+                          next_cursors=next_cursors,
+                          document_count=document_count,
+                          scan_count=scan_count)
 
 @user_bp.route('/activity', methods=['GET'])
 @login_required
 def activity():
-    # Get user's recent activity
-    recent_scans = ScanLog.query.filter_by(user_id=current_user.id).order_by(ScanLog.created_at.desc()).limit(10).all()
-    recent_documents = Document.query.filter_by(user_id=current_user.id).order_by(Document.created_at.desc()).limit(10).all()
-    recent_requests = CreditRequest.query.filter_by(user_id=current_user.id).order_by(CreditRequest.created_at.desc()).limit(10).all()
+    # Get user's recent activity, one keyset page per list
+    try:
+        pages, next_cursors = _history_pages(default_limit=10)
+    except ValueError:
+        if request.content_type == 'application/json':
+            return jsonify({'error': 'Invalid cursor'}), 400
+        flash('Invalid page link', 'error')
+        return redirect(url_for('user.activity'))
     
     if request.content_type == 'application/json':
         return jsonify({
-            'recent_scans': [scan.to_dict() for scan in recent_scans],
-            'recent_documents': [doc.to_dict() for doc in recent_documents],
-            'recent_requests': [req.to_dict() for req in recent_requests]
+            'recent_scans': [scan.to_dict() for scan in pages['scan_logs']],
+            'recent_documents': [doc.to_dict() for doc in pages['documents']],
+            'recent_requests': [req.to_dict() for req in pages['credit_requests']],
+            'next_cursors': next_cursors
         }), 200
     
     return render_template('activity.html',
-                          recent_scans=recent_scans,
-                          recent_documents=recent_documents,
-                          recent_requests=recent_requests)
+                          recent_scans=pages['scan_logs'],
+                          recent_documents=pages['documents'],
+                          recent_requests=pages['credit_requests'],
+                          next_cursors=next_cursors)
+
+# Helper function to render scan history batches in the plain-text layout
+def _encode_history_text(username, batches):
+    yield f"Scan History for {username}\n" + "=" * 50 + "\n\n"
+    for rows in batches:
+        yield ''.join(
+            f"Date: {created_at}\n"
+            f"Document: {title}\n"
+            f"Similarity Score: {similarity_score}\n"
+            f"Matched Documents: {matched_documents}\n"
+            + "-" * 50 + "\n\n"
+            for created_at, title, similarity_score, matched_documents in rows
+        )
 
 @user_bp.route('/export-history', methods=['GET'])
 @login_required
 def export_history():
-    # Get user's scan history
-    scan_logs = ScanLog.query.filter_by(user_id=current_user.id).order_by(ScanLog.created_at.desc()).all()
+    """
+    Stream the current user's scan history as a download.
     
-    # Format scan history as text
-    history_text = f"Scan History for {current_user.username}\n"
-    history_text += "=" * 50 + "\n\n"
+    Query parameters:
+    - format: txt (default), csv or ndjson
     
-    for log in scan_logs:
-        document = Document.query.get(log.document_id)
-        history_text += f"Date: {log.created_at}\n"
-        history_text += f"Document: {document.title}\n"
-        history_text += f"Similarity Score: {log.similarity_score}\n"
-        history_text += f"Matched Documents: {log.matched_documents}\n"
-        history_text += "-" * 50 + "\n\n"
+    The history is read with one joined query and sent in batches, so
+    memory use does not grow with the length of the history.
+    """
+    fmt = request.args.get('format', 'txt').lower()
+    if fmt != 'txt' and fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'Invalid format'}), 400
     
-    # Return as downloadable text file
-    return history_text, 200, {
-        'Content-Type': 'text/plain',
-        'Content-Disposition': 'attachment; filename=scan_history.txt'
-    }
+    # Get user's scan history together with each scanned document's title
+    columns = ['date', 'document', 'similarity_score', 'matched_documents']
+    statement = select(
+        ScanLog.created_at, Document.title, ScanLog.similarity_score, ScanLog.matched_documents
+    ).join(
+        Document, ScanLog.document_id == Document.id
+    ).where(
+        ScanLog.user_id == current_user.id
+    ).order_by(ScanLog.created_at.desc(), ScanLog.id.desc())
+    
+    username = current_user.username
+    batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+    
+    def generate():
+        with reporting_session() as reporting:
+            batches = iter_result_rows(reporting, statement, batch_size)
+            if fmt == 'txt':
+                for text in _encode_history_text(username, batches):
+                    yield text.encode('utf-8')
+            else:
+                yield from stream_export(columns, batches, fmt)
+    
+    # Return as downloadable file
+    if fmt == 'txt':
+        mimetype, headers = 'text/plain', {'Content-Disposition': 'attachment; filename=scan_history.txt'}
+    else:
+        mimetype, headers = export_response_headers('scan_history', fmt)
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers=headers)
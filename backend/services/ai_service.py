@@ -30,7 +30,7 @@ Similarity score:"""
         
         try:
             response = requests.post(
-                "https://openrouter.ai/api/v1/chat/completions",
+                f"{current_app.config['OPENROUTER_BASE_URL']}/chat/completions",
                 headers=headers,
                 json=data,
                 timeout=10
@@ -74,7 +74,7 @@ Similarity score:"""
         
         try:
             response = requests.post(
-                "https://api.mistral.ai/v1/chat/completions",
+                f"{current_app.config['MISTRAL_BASE_URL']}/chat/completions",
                 headers=headers,
                 json=data,
                 timeout=10
@@ -0,0 +1,275 @@
+"""
+Credit Service for Document Scanner Application
+
+Keeps credit balances correct without hydrating users in Python. Every
+balance change is a single UPDATE on the user row (conditional where it must
+not overdraw or double-apply) plus one row in the append-only CreditLedger:
+
+- debit / refund: charge and return scan credits
+- grant / set_balance: admin approvals and adjustments
+- resolve_request: approve or deny a pending credit request exactly once
+- apply_daily_reset: lazily resets one user's daily credits when their
+  balance is read, with a conditional UPDATE
+- reset_due_credits: resets every due user with a single UPDATE
+
+Unless noted otherwise the methods run on the current session without
+committing, so the caller commits them together with the write they belong to.
+"""
+
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import insert, literal, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from database.models import db, User, CreditRequest, CreditLedger, GlobalCounter
+from backend.utils.cache import bump_versions
+from backend.utils.user_cache import invalidate_user, invalidate_all_users
+
+# A user is due for a reset once their last reset is at least this old
+RESET_INTERVAL = timedelta(days=1)
+
+
+class CreditService:
+    @staticmethod
+    def daily_free_credits():
+        """Number of credits a user gets back at each daily reset."""
+        return current_app.config.get('DAILY_FREE_CREDITS', 20)
+
+    @staticmethod
+    def _record(user_id, delta, reason, reference_id=None, now=None):
+        """
+        Append a ledger entry and drop the user's cached snapshot.
+
+        Shared counters are deliberately not touched here, so a scan debit only
+        writes its own user row and one ledger row; admin changes bump the
+        cached view versions themselves.
+        """
+        db.session.execute(insert(CreditLedger).values(
+            user_id=user_id,
+            delta=delta,
+            reason=reason,
+            reference_id=reference_id,
+            created_at=now or datetime.now()
+        ))
+        invalidate_user(user_id)
+
+    @staticmethod
+    def debit(user_id, amount=1, reason='scan', reference_id=None):
+        """
+        Take credits from a user if, and only if, they have enough.
+
+        The balance check and the decrement are one conditional UPDATE, so
+        concurrent debits can never overdraw the account.
+
+        Args:
+            user_id (int): User to charge
+            amount (int): Number of credits
+            reason (str): Ledger reason
+            reference_id (int, optional): Related record ID
+
+        Returns:
+            bool: True if the credits were taken
+        """
+        result = db.session.execute(
+            update(User)
+            .where(User.id == user_id, User.credits >= amount)
+            .values(credits=User.credits - amount)
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount:
+            return False
+
+        CreditService._record(user_id, -amount, reason, reference_id)
+        return True
+
+    @staticmethod
+    def refund(user_id, amount=1, reason='scan_refund', reference_id=None):
+        """Give back credits taken by debit() for work that did not complete."""
+        db.session.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(credits=User.credits + amount)
+            .execution_options(synchronize_session=False)
+        )
+        CreditService._record(user_id, amount, reason, reference_id)
+
+    @staticmethod
+    def grant(user_id, amount, reason='grant', reference_id=None):
+        """Add credits to a user's balance and to their lifetime grant total."""
+        db.session.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(
+                credits=User.credits + amount,
+                total_credits_granted=User.total_credits_granted + amount
+            )
+            .execution_options(synchronize_session=False)
+        )
+        CreditService._record(user_id, amount, reason, reference_id)
+        bump_versions('users')
+
+    @staticmethod
+    def set_balance(user_id, amount, reason='adjust'):
+        """
+        Set a user's balance to an absolute amount (admin adjustment).
+
+        Returns:
+            bool: False if the user does not exist
+        """
+        current = db.session.execute(
+            select(User.credits).where(User.id == user_id)
+        ).scalar_one_or_none()
+        if current is None:
+            return False
+
+        db.session.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(credits=amount)
+            .execution_options(synchronize_session=False)
+        )
+        CreditService._record(user_id, amount - current, reason)
+        bump_versions('users')
+        return True
+
+    @staticmethod
+    def resolve_request(request_id, admin_id, status):
+        """
+        Approve or deny a pending credit request.
+
+        The status change is a conditional UPDATE on status = 'pending', so
+        two admins acting on the same request at once cannot both apply it;
+        approved requests grant their credits in the same transaction.
+
+        Args:
+            request_id (int): Credit request ID
+            admin_id (int): Admin resolving the request
+            status (str): 'approved', or the denial status used by the caller
+
+        Returns:
+            bool: False if the request was not pending
+        """
+        result = db.session.execute(
+            update(CreditRequest)
+            .where(CreditRequest.id == request_id, CreditRequest.status == 'pending')
+            .values(status=status, admin_id=admin_id, updated_at=datetime.now())
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount:
+            return False
+
+        if status == 'approved':
+            user_id, amount = db.session.execute(
+                select(CreditRequest.user_id, CreditRequest.amount)
+                .where(CreditRequest.id == request_id)
+            ).one()
+            CreditService.grant(user_id, amount, reference_id=request_id)
+
+        GlobalCounter.increment(pending_requests=-1)
+        bump_versions('credit_requests')
+        return True
+
+    @staticmethod
+    def apply_daily_reset(user, now=None):
+        """
+        Reset a user's credits if their last reset is more than a day old.
+
+        The check is done on the already-loaded user, so the common case costs
+        nothing. When a reset is due, a conditional UPDATE applies it; the
+        condition makes concurrent requests for the same user reset it once.
+
+        Args:
+            user (User): Loaded user
+            now (datetime, optional): Current time, defaults to datetime.now()
+
+        Returns:
+            bool: True if this call reset the user's credits
+        """
+        now = now or datetime.now()
+        cutoff = now - RESET_INTERVAL
+        if not user.last_credit_reset or user.last_credit_reset > cutoff:
+            return False
+
+        credits = CreditService.daily_free_credits()
+        due = (User.id == user.id, User.last_credit_reset <= cutoff)
+
+        # In a savepoint, so losing the race below undoes only the ledger row and
+        # not whatever the request has pending (this runs in the user loader)
+        savepoint = db.session.begin_nested()
+
+        # Ledger first, computed from the stored balance rather than the loaded
+        # (possibly cached or stale) user, as reset_due_credits does
+        db.session.execute(
+            insert(CreditLedger).from_select(
+                ['user_id', 'delta', 'reason', 'created_at'],
+                select(
+                    User.id,
+                    literal(credits) - User.credits,
+                    literal('daily_reset'),
+                    literal(now)
+                ).where(*due, User.credits != credits)
+            )
+        )
+        result = db.session.execute(
+            update(User)
+            .where(*due)
+            .values(credits=credits, last_credit_reset=now)
+            .execution_options(synchronize_session=False)
+        )
+
+        if not result.rowcount:
+            # Another request reset this user first; drop any ledger row and pick up its values
+            savepoint.rollback()
+            db.session.refresh(user, ['credits', 'last_credit_reset'])
+            return False
+        savepoint.commit()
+
+        bump_versions('users')
+        invalidate_user(user.id)
+        db.session.commit()
+
+        # Reflect the new balance without marking the user dirty
+        set_committed_value(user, 'credits', credits)
+        set_committed_value(user, 'last_credit_reset', now)
+        current_app.logger.info(f"Reset credits for user {user.id} at {now}")
+        return True
+
+    @staticmethod
+    def reset_due_credits(now=None):
+        """
+        Reset every user whose last reset is more than a day old.
+
+        Runs as one set-based INSERT ... SELECT into the ledger and one
+        UPDATE, instead of loading users into the ORM. Commits.
+
+        Returns:
+            int: Number of users reset
+        """
+        now = now or datetime.now()
+        credits = CreditService.daily_free_credits()
+        due = User.last_credit_reset <= now - RESET_INTERVAL
+
+        # Ledger first, while the old balances are still in place
+        db.session.execute(
+            insert(CreditLedger).from_select(
+                ['user_id', 'delta', 'reason', 'created_at'],
+                select(
+                    User.id,
+                    literal(credits) - User.credits,
+                    literal('daily_reset'),
+                    literal(now)
+                ).where(due, User.credits != credits)
+            )
+        )
+        result = db.session.execute(
+            update(User)
+            .where(due)
+            .values(credits=credits, last_credit_reset=now)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            bump_versions('users')
+            invalidate_all_users()
+        db.session.commit()
+        return result.rowcount
@@ -0,0 +1,297 @@
+"""
+Routing of AI similarity calls between providers.
+
+The router keeps a rolling window of recent calls per provider (latency and
+whether a score came back) and uses it to:
+
+- order providers by expected time to a good answer (median latency divided
+  by success rate), so the currently fastest healthy provider goes first;
+  providers without data sort first so each one gets measured
+- open a circuit on a provider whose recent failure rate reaches
+  AI_CIRCUIT_FAILURE_RATE, skipping it for AI_CIRCUIT_COOLDOWN seconds and
+  then letting a single trial call through (half-open) before closing again
+- hedge: if the first provider has not answered within its own p95 latency,
+  send the same comparison to the next provider and take whichever scores
+  first, instead of waiting out the first provider's timeout
+
+Calls the local rate limiter skipped (see mark_rate_limited) are counted
+separately and never feed the failure rate: running out of our own quota
+says nothing about the provider's health.
+
+State is per worker process. Calls run on a small thread pool with an app
+context pushed, so provider functions can read current_app as usual.
+"""
+
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from flask import current_app
+
+from ..utils.metrics import add_server_timing
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+# Set by provider functions, in the thread running the call, when the rate limiter skipped it
+_call_state = threading.local()
+
+
+def mark_rate_limited():
+    """Flag the provider call running in this thread as skipped by the local rate limiter."""
+    _call_state.rate_limited = True
+
+
+class ProviderHealth:
+    """Rolling call window and circuit state for one provider."""
+
+    def __init__(self, window):
+        self.calls = deque(maxlen=window)  # (latency seconds, succeeded)
+        self.rate_limited = 0  # Calls skipped by the local rate limiter, not in the window
+        self.state = CLOSED
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def latencies(self):
+        return [latency for latency, _ in self.calls]
+
+    def failure_rate(self):
+        if not self.calls:
+            return 0.0
+        return sum(1 for _, ok in self.calls if not ok) / len(self.calls)
+
+    def expected_cost(self):
+        """Median latency divided by success rate; 0 when there is no data yet."""
+        if not self.calls:
+            return 0.0
+        success_rate = max(1 - self.failure_rate(), 0.05)
+        return statistics.median(self.latencies()) / success_rate
+
+    def p95(self):
+        latencies = sorted(self.latencies())
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+
+
+class ProviderRouter:
+    """Chooses, hedges and circuit-breaks AI providers. Thread-safe."""
+
+    def __init__(self, order, window=20, failure_rate=0.5, min_calls=5, cooldown=30.0,
+                 hedge=True, hedge_min_delay=0.25, hedge_default_delay=2.0, latency_routing=True,
+                 max_workers=16):
+        self.order = list(order)
+        self.failure_threshold = failure_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.latency_routing = latency_routing
+        self.max_workers = max_workers
+        self._health = {name: ProviderHealth(window) for name in self.order}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ai-provider')
+            return self._executor
+
+    def route(self, now=None):
+        """
+        Return the providers to try, best first, skipping open circuits.
+
+        A provider whose cooldown has passed is included once as a half-open trial.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            available = []
+            for name in self.order:
+                health = self._health[name]
+                if health.state == OPEN and now - health.opened_at >= self.cooldown:
+                    health.state = HALF_OPEN
+                    health.trial_in_flight = False
+                if health.state == HALF_OPEN:
+                    if health.trial_in_flight:
+                        continue
+                    health.trial_in_flight = True
+                elif health.state == OPEN:
+                    continue
+                available.append(name)
+            if self.latency_routing:
+                available.sort(key=lambda name: (self._health[name].expected_cost(), self.order.index(name)))
+            return available
+
+    def record(self, name, latency, succeeded, now=None):
+        """Add a call to the provider's window and update its circuit."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            health = self._health[name]
+            if health.state == HALF_OPEN:
+                health.trial_in_flight = False
+                if succeeded:
+                    health.state = CLOSED
+                    health.calls.clear()
+                else:
+                    health.state, health.opened_at = OPEN, now
+                    return
+            health.calls.append((latency, succeeded))
+            if (health.state == CLOSED and len(health.calls) >= self.min_calls
+                    and health.failure_rate() >= self.failure_threshold):
+                health.state, health.opened_at = OPEN, now
+                current_app.logger.warning(
+                    f"AI provider {name} circuit opened ({health.failure_rate():.0%} of the last "
+                    f"{len(health.calls)} calls failed); retrying in {self.cooldown:g}s"
+                )
+
+    def record_rate_limited(self, name):
+        """Count a call the local rate limiter skipped, leaving the window and circuit alone."""
+        with self._lock:
+            health = self._health[name]
+            health.rate_limited += 1
+            if health.state == HALF_OPEN:
+                health.trial_in_flight = False  # The trial never reached the provider
+
+    def hedge_delay(self, name):
+        """How long to wait for a provider before hedging: its p95, within sensible bounds."""
+        with self._lock:
+            health = self._health[name]
+            p95 = health.p95() if len(health.calls) >= self.min_calls else None
+        return max(self.hedge_min_delay, p95) if p95 is not None else self.hedge_default_delay
+
+    def _timed_call(self, name, func, args):
+        started = time.perf_counter()
+        result = None
+        _call_state.rate_limited = False
+        try:
+            result = func(*args)
+        finally:
+            if result is None and _call_state.rate_limited:
+                self.record_rate_limited(name)
+            else:
+                self.record(name, time.perf_counter() - started, result is not None)
+        return result
+
+    def _call_in_context(self, app, name, func, args):
+        with app.app_context():
+            return self._timed_call(name, func, args)
+
+    def similarity(self, text1, text2, providers):
+        """
+        Score a pair with the best available provider.
+
+        Args:
+            text1 (str): First text
+            text2 (str): Second text
+            providers (dict): Provider name -> function(text1, text2) returning a score or None
+
+        Returns:
+            tuple: (score, provider name), or (None, None) if no provider answered
+        """
+        return self.call(providers, text1, text2)
+
+    def call(self, providers, *args):
+        """
+        Call the best available provider with args; any result other than None counts as success.
+
+        Returns:
+            tuple: (result, provider name), or (None, None) if no provider answered
+        """
+        started = time.perf_counter()
+        routed = self.route()
+        order = [name for name in routed if name in providers]
+        launched = set()
+        try:
+            if not self.hedge or len(order) < 2:
+                for name in order:
+                    launched.add(name)
+                    result = self._timed_call(name, providers[name], args)
+                    if result is not None:
+                        return result, name
+                return None, None
+            return self._hedged(order, launched, providers, args)
+        finally:
+            self._release_trials(set(routed) - launched)
+            add_server_timing('ai', time.perf_counter() - started)
+
+    def _release_trials(self, names):
+        """Give back half-open trial slots that were routed but never called."""
+        with self._lock:
+            for name in names:
+                if self._health[name].state == HALF_OPEN:
+                    self._health[name].trial_in_flight = False
+
+    def _hedged(self, order, launched, providers, args):
+        app = current_app._get_current_object()
+        pool = self._pool()
+        queue, pending = list(order), {}
+
+        def launch():
+            name = queue.pop(0)
+            launched.add(name)
+            pending[pool.submit(self._call_in_context, app, name, providers[name], args)] = name
+            return name
+
+        latest = launch()
+        while pending:
+            timeout = self.hedge_delay(latest) if queue else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                latest = launch()  # The newest call is slower than usual: hedge
+                continue
+            for future in done:
+                name = pending.pop(future)
+                result = future.result() if future.exception() is None else None
+                if result is not None:
+                    for other, other_name in pending.items():
+                        # Calls already running finish in the background and are still recorded
+                        if other.cancel():
+                            launched.discard(other_name)
+                    return result, name
+            if queue and not pending:
+                latest = launch()
+        return None, None
+
+    def snapshot(self):
+        """Per-provider circuit state and window statistics, for display."""
+        with self._lock:
+            return {
+                name: {
+                    'state': health.state,
+                    'calls': len(health.calls),
+                    'rate_limited': health.rate_limited,
+                    'failure_rate': round(health.failure_rate(), 3),
+                    'median_ms': round(statistics.median(health.latencies()) * 1000, 1) if health.calls else None,
+                    'p95_ms': round(health.p95() * 1000, 1) if health.calls else None
+                }
+                for name, health in self._health.items()
+            }
+
+
+def get_provider_router(kind='pair'):
+    """
+    Return the current app's provider router for a kind of call, creating it from config on first use.
+
+    Pairwise and batched scoring calls have different latencies, so each
+    kind gets its own router and health windows.
+    """
+    key = 'provider_router' if kind == 'pair' else f'provider_router_{kind}'
+    router = current_app.extensions.get(key)
+    if router is None:
+        config = current_app.config
+        order = [name.strip() for name in config.get('AI_PROVIDERS', 'mistral,openrouter').split(',') if name.strip()]
+        router = current_app.extensions.setdefault(key, ProviderRouter(
+            order,
+            window=config.get('AI_PROVIDER_WINDOW', 20),
+            failure_rate=config.get('AI_CIRCUIT_FAILURE_RATE', 0.5),
+            min_calls=config.get('AI_CIRCUIT_MIN_CALLS', 5),
+            cooldown=config.get('AI_CIRCUIT_COOLDOWN', 30),
+            hedge=config.get('AI_HEDGE_ENABLED', True),
+            hedge_min_delay=config.get('AI_HEDGE_MIN_DELAY_MS', 250) / 1000,
+            hedge_default_delay=config.get('AI_HEDGE_DEFAULT_DELAY_MS', 2000) / 1000,
+            latency_routing=config.get('AI_LATENCY_ROUTING', True)
+        ))
+    return router
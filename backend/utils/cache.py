@@ -0,0 +1,151 @@
+"""
+In-process caches for expensive views.
+
+TTLCache is a thread-safe, size-bounded LRU whose entries expire after a
+fixed number of seconds. VersionedCache builds on it for admin views: every
+key also includes the current write-version counters (stored as
+GlobalCounter rows), so a write that bumps a version makes older entries
+unreachable in every worker process, while the TTL bounds how long any entry
+is kept.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from database.models import db, GlobalCounter
+
+_MISSING = object()
+
+# Write-version counters views can depend on
+VERSIONED_TABLES = ('scans', 'users', 'credit_requests')
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry and hit/miss counters."""
+
+    def __init__(self, maxsize=128, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return a cached value, or default if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entry when full."""
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Remove a single entry if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters and the current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups * 100, 1) if lookups else 0.0,
+                'size': len(self._entries)
+            }
+
+
+class VersionedCache:
+    """TTL cache whose keys include the versions of the tables a view reads."""
+
+    def __init__(self, maxsize=128, ttl=30):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get_or_build(self, key, depends_on, builder):
+        """
+        Return the cached value for key, building and storing it on a miss.
+
+        Args:
+            key (hashable): View-specific key (e.g. view arguments and format)
+            depends_on (tuple): Names from VERSIONED_TABLES the value reads
+            builder (callable): Computes the value on a miss
+
+        Returns:
+            The cached or freshly built value
+        """
+        full_key = (key, current_versions(depends_on))
+        value = self._cache.get(full_key, _MISSING)
+        if value is _MISSING:
+            value = builder()
+            self._cache.set(full_key, value)
+        return value
+
+    def stats(self):
+        return self._cache.stats()
+
+    def clear(self):
+        self._cache.clear()
+
+
+def _version_name(table):
+    return f'{table}_version'
+
+
+def current_versions(tables):
+    """Read the write-version counters for the given tables in one query."""
+    names = [_version_name(table) for table in tables]
+    rows = dict(
+        db.session.query(GlobalCounter.name, GlobalCounter.value)
+        .filter(GlobalCounter.name.in_(names)).all()
+    )
+    return tuple(rows.get(name, 0) for name in names)
+
+
+def bump_versions(*tables):
+    """
+    Invalidate cached views that depend on the given tables.
+
+    Runs on the current session without committing, so call it before the
+    commit of the write it describes.
+    """
+    unknown = set(tables) - set(VERSIONED_TABLES)
+    if unknown:
+        raise ValueError(f"Unknown cache version tables: {', '.join(sorted(unknown))}")
+    GlobalCounter.increment(**{_version_name(table): 1 for table in tables})
+
+
+def get_view_cache(name):
+    """Return the named view cache for the current app, creating it on first use."""
+    caches = current_app.extensions.setdefault('view_caches', {})
+    cache = caches.get(name)
+    if cache is None:
+        cache = caches.setdefault(name, VersionedCache(
+            maxsize=current_app.config.get('VIEW_CACHE_MAX_ENTRIES', 128),
+            ttl=current_app.config.get('VIEW_CACHE_TTL', 30)
+        ))
+    return cache
@@ -1,8 +1,9 @@
 import os
-from PyPDF2 import PdfReader
-from docx import Document as DocxDocument
 import io
 
+# PyPDF2 and python-docx are imported on first use of their format, so
+# importing the parser (and the app) does not pay for them
+
 class DocumentParser:
     @staticmethod
     def parse_file(file):
@@ -30,6 +31,8 @@ class DocumentParser:
                     
             elif filename.endswith('.pdf'):
                 try:
+                    from PyPDF2 import PdfReader
+                    
                     # Create PDF reader object
                     pdf_reader = PdfReader(file_buffer)
                     if len(pdf_reader.pages) == 0:
@@ -50,6 +53,8 @@ class DocumentParser:
                     
             elif filename.endswith(('.doc', '.docx')):
                 try:
+                    from docx import Document as DocxDocument
+                    
                     # Create DOCX document object
                     doc = DocxDocument(file_buffer)
                     
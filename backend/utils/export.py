@@ -0,0 +1,105 @@
+"""
+Streaming export helpers.
+
+Rows are fetched from the database in batches and encoded incrementally, so
+an export never holds more than one batch in memory regardless of its size.
+Supported formats are CSV and NDJSON (one JSON object per line), each
+optionally gzip-compressed on the fly.
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson')
+}
+
+
+def iter_result_rows(session, statement, batch_size=1000):
+    """
+    Execute a statement and yield its rows in batches of batch_size.
+
+    Uses a server-side cursor where the driver supports one, otherwise
+    fetchmany, so only one batch is materialized at a time.
+    """
+    result = session.execute(
+        statement.execution_options(stream_results=True, yield_per=batch_size)
+    )
+    for partition in result.partitions(batch_size):
+        yield partition
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def encode_csv(columns, batches):
+    """Encode row batches as CSV text chunks, one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+def encode_ndjson(columns, batches):
+    """Encode row batches as NDJSON text chunks, one chunk per batch."""
+    for rows in batches:
+        yield ''.join(
+            json.dumps({column: _json_value(value) for column, value in zip(columns, row)}) + '\n'
+            for row in rows
+        )
+
+
+def gzip_chunks(chunks):
+    """Compress an iterable of byte chunks into a gzip stream."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)  # gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_export(columns, batches, fmt='csv', compress=False):
+    """
+    Encode row batches in the requested format as a stream of bytes.
+
+    Args:
+        columns (list): Column headers / JSON keys
+        batches (iterable): Lists of row tuples
+        fmt (str): 'csv' or 'ndjson'
+        compress (bool): Gzip the stream
+
+    Returns:
+        generator: Byte chunks suitable for a streaming response
+    """
+    encoder = encode_ndjson if fmt == 'ndjson' else encode_csv
+    chunks = (text.encode('utf-8') for text in encoder(columns, batches))
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def export_response_headers(basename, fmt='csv', compress=False):
+    """
+    Build the mimetype and Content-Disposition for an export download.
+
+    Returns:
+        tuple: (mimetype, headers dict)
+    """
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    filename = f'{basename}.{extension}'
+    if compress:
+        mimetype = 'application/gzip'
+        filename += '.gz'
+    return mimetype, {'Content-Disposition': f'attachment; filename={filename}'}
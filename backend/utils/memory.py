@@ -0,0 +1,219 @@
+"""
+Memory diagnostics: per-request peak RSS and tracemalloc snapshots.
+
+Upload and export requests are wrapped in a MemoryProbe. The probe records
+the worker's resident set size at the start and end of the request and the
+peak in between. On Linux the kernel's RSS high-water mark is reset at the
+start of the request (via /proc/self/clear_refs) so the peak is the
+request's own; elsewhere the process-lifetime peak from getrusage is
+reported instead. Other requests running in the same process at the same
+time are counted too.
+
+When an admin starts tracing, tracemalloc snapshots are also taken around
+those requests and the top allocation sites that grew are kept with each
+request record. Tracing slows allocations noticeably, so it is off until
+started from the admin memory page, and like the records it is per worker
+process.
+"""
+
+import os
+import sys
+import threading
+import tracemalloc
+from collections import deque
+from datetime import datetime
+
+from flask import current_app, g, request
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Requests whose memory use is recorded
+WATCHED_ENDPOINTS = ('document.upload', 'admin.export_data', 'user.export_history')
+
+_baseline = {'snapshot': None, 'taken_at': None}
+_lock = threading.Lock()
+
+
+def _read_proc_status(field):
+    """Return a 'VmRSS'/'VmHWM'-style field from /proc/self/status in bytes, or None."""
+    try:
+        with open('/proc/self/status') as handle:
+            for line in handle:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _rusage_peak_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # bytes on macOS, KB elsewhere
+
+
+def current_rss_bytes():
+    """Resident set size of this process in bytes (None if unavailable)."""
+    return _read_proc_status('VmRSS') or _rusage_peak_bytes()
+
+
+def peak_rss_bytes():
+    """RSS high-water mark of this process (since the last reset) in bytes."""
+    return _read_proc_status('VmHWM') or _rusage_peak_bytes()
+
+
+def reset_peak_rss():
+    """Reset the kernel's RSS high-water mark; False where that is not supported."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as handle:
+            handle.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _mb(value):
+    return round(value / (1024 * 1024), 1) if value is not None else None
+
+
+def _top_stats(stats, limit):
+    return [{
+        'location': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+        'size_kb': round(stat.size / 1024, 1),
+        'size_diff_kb': round(getattr(stat, 'size_diff', 0) / 1024, 1),
+        'count': stat.count
+    } for stat in stats[:limit]]
+
+
+class MemoryProbe:
+    """Measures memory use between start() and finish() in the current process."""
+
+    def __init__(self):
+        self.rss_start = None
+        self.peak_is_local = False
+        self.snapshot = None
+
+    def start(self):
+        self.peak_is_local = reset_peak_rss()
+        self.rss_start = current_rss_bytes()
+        if tracemalloc.is_tracing():
+            self.snapshot = tracemalloc.take_snapshot()
+        return self
+
+    def summary(self):
+        """RSS figures so far, in MB, for logging next to a scan."""
+        return {
+            'rss_start_mb': _mb(self.rss_start),
+            'rss_mb': _mb(current_rss_bytes()),
+            'peak_rss_mb': _mb(peak_rss_bytes()),
+            'peak_is_request_local': self.peak_is_local
+        }
+
+    def finish(self, limit):
+        record = self.summary()
+        if self.snapshot is not None and tracemalloc.is_tracing():
+            diff = tracemalloc.take_snapshot().compare_to(self.snapshot, 'lineno')
+            record['top_growth'] = _top_stats([stat for stat in diff if stat.size_diff > 0], limit)
+        return record
+
+
+def start_tracing(frames=None):
+    """Start tracemalloc in this worker (no-op if it is already tracing)."""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames or current_app.config.get('MEMORY_TRACE_FRAMES', 10))
+
+
+def stop_tracing():
+    """Stop tracemalloc and drop the baseline snapshot."""
+    with _lock:
+        _baseline.update(snapshot=None, taken_at=None)
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def take_baseline():
+    """Take the snapshot later reports are diffed against. Requires tracing."""
+    if not tracemalloc.is_tracing():
+        raise RuntimeError('tracemalloc is not tracing')
+    snapshot = tracemalloc.take_snapshot()
+    with _lock:
+        _baseline.update(snapshot=snapshot, taken_at=datetime.now().isoformat())
+
+
+def _history():
+    history = current_app.extensions.get('memory_history')
+    if history is None:
+        history = current_app.extensions.setdefault(
+            'memory_history', deque(maxlen=current_app.config.get('MEMORY_HISTORY', 50))
+        )
+    return history
+
+
+def memory_report():
+    """
+    Build the admin memory report for this worker.
+
+    Returns:
+        dict: RSS figures, tracing status, top allocation sites, growth since
+        the baseline snapshot and recent per-request records
+    """
+    limit = current_app.config.get('MEMORY_TOP_N', 20)
+    report = {
+        'pid': os.getpid(),
+        'rss_mb': _mb(current_rss_bytes()),
+        'peak_rss_mb': _mb(peak_rss_bytes()),
+        'tracing': tracemalloc.is_tracing(),
+        'requests': list(reversed(_history()))
+    }
+    if report['tracing']:
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        report.update(
+            traced_mb=_mb(traced),
+            traced_peak_mb=_mb(traced_peak),
+            top_allocations=_top_stats(snapshot.statistics('lineno'), limit)
+        )
+        with _lock:
+            baseline, taken_at = _baseline['snapshot'], _baseline['taken_at']
+        if baseline is not None:
+            report['baseline_taken_at'] = taken_at
+            report['growth_since_baseline'] = _top_stats(snapshot.compare_to(baseline, 'lineno'), limit)
+    return report
+
+
+def _start_probe():
+    if request.endpoint in WATCHED_ENDPOINTS:
+        g.memory_probe = MemoryProbe().start()
+
+
+def _finish_probe(exc):
+    probe = g.pop('memory_probe', None)
+    if probe is None:
+        return
+    record = probe.finish(current_app.config.get('MEMORY_TOP_N', 20))
+    record.update(
+        endpoint=request.endpoint,
+        path=request.path,
+        finished_at=datetime.now().isoformat()
+    )
+    _history().append(record)
+    current_app.logger.info(
+        f"Memory for {request.endpoint}: RSS {record['rss_start_mb']} -> {record['rss_mb']} MB, "
+        f"peak {record['peak_rss_mb']} MB"
+    )
+
+
+def current_probe_summary():
+    """RSS summary of the current request's probe, or None if it is not watched."""
+    probe = g.get('memory_probe')
+    return probe.summary() if probe is not None else None
+
+
+def init_memory_diagnostics(app):
+    """Register the request hooks that probe watched endpoints."""
+    app.before_request(_start_probe)
+    app.teardown_request(_finish_probe)
@@ -0,0 +1,197 @@
+"""
+In-process metrics in the Prometheus text format.
+
+Histograms are kept per worker process with fixed buckets, the same way a
+Prometheus client library keeps them, and are exposed by the /metrics
+endpoint for scraping. Percentiles shown in the admin analytics are
+estimated from the buckets by linear interpolation (like PromQL's
+histogram_quantile), so they describe the process serving the page.
+
+Stages timed during a request are also collected on flask.g and sent back
+in a Server-Timing header, so browser dev tools show where an upload spent
+its time.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context
+
+# Upper bounds in seconds; scans that call an AI provider per document can run for minutes
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class Histogram:
+    """Thread-safe histogram with optional labels."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """Record one observation for the given label values."""
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def _merged(self, **label_filter):
+        """Sum the series whose labels match label_filter into one [buckets..., sum, count]."""
+        merged = [0] * (len(self.buckets) + 2)
+        with self._lock:
+            for key, series in self._series.items():
+                labels = dict(zip(self.labelnames, key))
+                if any(labels.get(name) != str(value) for name, value in label_filter.items()):
+                    continue
+                merged = [total + part for total, part in zip(merged, series)]
+        return merged
+
+    def count(self, **label_filter):
+        return self._merged(**label_filter)[-1]
+
+    def quantile(self, q, **label_filter):
+        """
+        Estimate the q-quantile (0..1) of observations matching label_filter.
+
+        Returns:
+            float or None: Estimated value in seconds, None without observations
+        """
+        merged = self._merged(**label_filter)
+        total = merged[-1]
+        if not total:
+            return None
+
+        rank = q * total
+        cumulative, lower = 0, 0.0
+        for index, bound in enumerate(self.buckets):
+            in_bucket = merged[index]
+            if in_bucket and cumulative + in_bucket >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / in_bucket
+            cumulative += in_bucket
+            lower = bound
+        # Rank falls in the +Inf bucket; the largest finite bound is the best estimate
+        return self.buckets[-1]
+
+    def percentiles(self, quantiles=(0.5, 0.95, 0.99), **label_filter):
+        """Return {'p50': ..., 'p95': ..., 'p99': ..., 'count': n} for display."""
+        result = {f'p{int(q * 100)}': self.quantile(q, **label_filter) for q in quantiles}
+        result['count'] = self.count(**label_filter)
+        return result
+
+    def render(self):
+        """Render the histogram in the Prometheus text exposition format."""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted(self._series.items())
+        for key, series in items:
+            labels = [f'{name}="{value}"' for name, value in zip(self.labelnames, key)]
+            cumulative = 0
+            for index, bound in enumerate(self.buckets):
+                cumulative += series[index]
+                bucket_labels = ','.join(labels + [f'le="{bound}"'])
+                lines.append(f'{self.name}_bucket{{{bucket_labels}}} {cumulative}')
+            inf_labels = ','.join(labels + ['le="+Inf"'])
+            lines.append(f'{self.name}_bucket{{{inf_labels}}} {series[-1]}')
+            suffix = '{' + ','.join(labels) + '}' if labels else ''
+            lines.append(f'{self.name}_sum{suffix} {series[-2]}')
+            lines.append(f'{self.name}_count{suffix} {series[-1]}')
+        return '\n'.join(lines)
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    """Return the registered histogram called name, creating it on first use."""
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = Histogram(name, documentation, labelnames, buckets)
+        return metric
+
+
+def render_metrics():
+    """Render every registered metric in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+# Scan pipeline metrics
+SCAN_PARSE_SECONDS = histogram(
+    'docscanner_scan_parse_seconds', 'Time to extract text from an upload', ('file_type',))
+SCAN_HASH_SECONDS = histogram(
+    'docscanner_scan_hash_seconds', 'Time to hash extracted text')
+SCAN_CANDIDATES_SECONDS = histogram(
+    'docscanner_scan_candidates_seconds', 'Time to load the documents a scan is compared with')
+SCAN_TFIDF_SECONDS = histogram(
+    'docscanner_scan_tfidf_seconds', 'Time for one TF-IDF similarity comparison')
+SCAN_PREFILTER_SECONDS = histogram(
+    'docscanner_scan_prefilter_seconds', 'Time to rank candidates when SCAN_STRATEGY prefilters them')
+AI_REQUEST_SECONDS = histogram(
+    'docscanner_ai_request_seconds', 'Latency of AI similarity API calls', ('provider', 'outcome'))
+SCAN_DB_COMMIT_SECONDS = histogram(
+    'docscanner_scan_db_commit_seconds', 'Time to write and commit a scan')
+SCAN_TOTAL_SECONDS = histogram(
+    'docscanner_scan_total_seconds', 'End-to-end time of a successful scan')
+
+
+def add_server_timing(stage, seconds):
+    """Add time spent in a stage to the current request's Server-Timing totals."""
+    if not has_request_context():
+        return
+    timings = g.setdefault('server_timings', {})
+    timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def observe_since(metric, started, stage=None, **labels):
+    """
+    Record the time since started (a time.perf_counter() value) in a histogram
+    and, if stage is given, in the request's Server-Timing totals.
+
+    Returns:
+        float: Elapsed seconds
+    """
+    elapsed = time.perf_counter() - started
+    metric.observe(elapsed, **labels)
+    if stage:
+        add_server_timing(stage, elapsed)
+    return elapsed
+
+
+@contextmanager
+def timed(metric, stage=None, **labels):
+    """
+    Time a block into a histogram and, if stage is given, into Server-Timing.
+
+    Example:
+        with timed(SCAN_HASH_SECONDS, 'hash'):
+            digest = hashlib.sha256(data).hexdigest()
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_since(metric, started, stage, **labels)
+
+
+def server_timing_header(response):
+    """after_request hook: send the stages timed during this request as Server-Timing."""
+    timings = g.get('server_timings')
+    if timings:
+        response.headers['Server-Timing'] = ', '.join(
+            f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in timings.items()
+        )
+    return response
@@ -0,0 +1,293 @@
+"""
+On-demand sampling profiler for live requests.
+
+An admin enables profiling for the next N requests, optionally only for one
+endpoint and/or one user. Matching requests get a background thread that
+samples the request thread's stack every PROFILER_INTERVAL_MS via
+sys._current_frames(), so the profiled code runs unmodified. When the
+request ends, the samples are written to PROFILE_DIR in the collapsed-stack
+format ("frame;frame;frame count" per line) read by flamegraph.pl,
+speedscope and inferno, with a JSON sidecar describing the request.
+
+The enable state is a small JSON file in PROFILE_DIR so every worker process
+sees it. Requests only stat that file, at most once a second per process,
+so the cost while profiling is off is a clock read per request.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import current_app, g, request
+from flask_login import current_user
+
+try:
+    import fcntl
+except ImportError:  # Windows: claims are best-effort without a file lock
+    fcntl = None
+
+STATE_FILENAME = 'profiling.json'
+PROFILE_SUFFIX = '.collapsed'
+
+# How often each process re-reads the enable state
+STATE_CHECK_INTERVAL = 1.0
+
+# Endpoints that are never profiled (the profiler's own admin pages, static files)
+EXCLUDED_ENDPOINTS = ('static', 'admin.profiling', 'admin.download_profile')
+
+_state_cache = {'checked_at': 0.0, 'mtime': None, 'state': None}
+_state_lock = threading.Lock()
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a background thread."""
+
+    def __init__(self, thread_id, interval, root_path):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.root_path = root_path
+        self.samples = Counter()
+        self.started_at = None
+        self.duration = 0.0
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[self._collapse(frame)] += 1
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            if filename.startswith(self.root_path):
+                filename = os.path.relpath(filename, self.root_path)
+            elif 'site-packages' + os.sep in filename:
+                filename = filename.split('site-packages' + os.sep, 1)[1]
+            else:
+                filename = os.path.basename(filename)
+            label = f'{code.co_name} ({filename}:{code.co_firstlineno})'.replace(';', ':')
+            self._labels[code] = label
+        return label
+
+    def _collapse(self, frame):
+        stack = []
+        while frame is not None:
+            stack.append(self._label(frame.f_code))
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+
+    def collapsed(self):
+        """Return the samples in collapsed-stack format."""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.samples.most_common())
+
+
+def profile_directory():
+    """Directory holding the enable state and saved profiles."""
+    return current_app.config.get('PROFILE_DIR') or os.path.join(current_app.instance_path, 'profiles')
+
+
+def _state_path():
+    return os.path.join(profile_directory(), STATE_FILENAME)
+
+
+@contextmanager
+def _locked_state_file():
+    """Open the state file with an exclusive lock for a read-modify-write."""
+    os.makedirs(profile_directory(), exist_ok=True)
+    with open(_state_path(), 'a+') as handle:
+        if fcntl:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            handle.seek(0)
+            raw = handle.read()
+            yield handle, (json.loads(raw) if raw.strip() else None)
+        finally:
+            if fcntl:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _write_state(handle, state):
+    handle.seek(0)
+    handle.truncate()
+    if state:
+        handle.write(json.dumps(state))
+    handle.flush()
+    with _state_lock:
+        _state_cache['checked_at'] = 0.0  # Re-read on the next request
+
+
+def get_profiling_state(force=False):
+    """
+    Return the current enable state, or None when profiling is off.
+
+    Re-reads the state file at most once per STATE_CHECK_INTERVAL unless force is set.
+    """
+    now = time.monotonic()
+    with _state_lock:
+        if not force and now - _state_cache['checked_at'] < STATE_CHECK_INTERVAL:
+            return _state_cache['state']
+        _state_cache['checked_at'] = now
+
+    try:
+        mtime = os.stat(_state_path()).st_mtime_ns
+    except OSError:
+        mtime = None
+
+    with _state_lock:
+        if mtime != _state_cache['mtime']:
+            state = None
+            if mtime is not None:
+                try:
+                    with open(_state_path()) as handle:
+                        raw = handle.read()
+                    state = json.loads(raw) if raw.strip() else None
+                except (OSError, ValueError):
+                    state = None
+            _state_cache.update(mtime=mtime, state=state)
+        return _state_cache['state']
+
+
+def enable_profiling(requests, endpoint=None, user_id=None, enabled_by=None):
+    """
+    Profile the next `requests` matching requests in every worker.
+
+    Args:
+        requests (int): Number of requests to profile
+        endpoint (str, optional): Only profile this endpoint (e.g. 'document.upload')
+        user_id (int, optional): Only profile requests from this user
+        enabled_by (int, optional): Admin user ID, kept for the record
+    """
+    state = {
+        'remaining': int(requests),
+        'endpoint': endpoint or None,
+        'user_id': user_id,
+        'enabled_by': enabled_by,
+        'enabled_at': datetime.now().isoformat()
+    }
+    with _locked_state_file() as (handle, _):
+        _write_state(handle, state)
+    return state
+
+
+def disable_profiling():
+    """Turn profiling off in every worker."""
+    with _locked_state_file() as (handle, _):
+        _write_state(handle, None)
+
+
+def _claim_request():
+    """Take one request from the remaining budget; False once it is used up."""
+    with _locked_state_file() as (handle, state):
+        if not state or state.get('remaining', 0) <= 0:
+            return False
+        state['remaining'] -= 1
+        _write_state(handle, state if state['remaining'] > 0 else None)
+        return True
+
+
+def _matches(state):
+    if request.endpoint in EXCLUDED_ENDPOINTS or request.endpoint is None:
+        return False
+    if state.get('endpoint') and request.endpoint != state['endpoint']:
+        return False
+    if state.get('user_id') is not None:
+        if not current_user.is_authenticated or current_user.id != state['user_id']:
+            return False
+    return True
+
+
+def _start_profiling():
+    state = get_profiling_state()
+    if state is None or not _matches(state) or not _claim_request():
+        return
+    interval = current_app.config.get('PROFILER_INTERVAL_MS', 5) / 1000
+    g.request_profiler = StackSampler(threading.get_ident(), interval, current_app.root_path).start()
+
+
+def _finish_profiling(exc):
+    sampler = g.pop('request_profiler', None)
+    if sampler is None:
+        return
+    sampler.stop()
+    try:
+        _save_profile(sampler, exc)
+    except OSError as e:
+        current_app.logger.error(f"Could not save request profile: {str(e)}")
+
+
+def _save_profile(sampler, exc):
+    directory = profile_directory()
+    os.makedirs(directory, exist_ok=True)
+    user_id = current_user.id if current_user.is_authenticated else None
+    name = (
+        f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{request.endpoint}"
+        f"-u{user_id or 0}-p{os.getpid()}"
+    )
+    with open(os.path.join(directory, name + PROFILE_SUFFIX), 'w') as handle:
+        handle.write(sampler.collapsed())
+    with open(os.path.join(directory, name + '.json'), 'w') as handle:
+        json.dump({
+            'name': name + PROFILE_SUFFIX,
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': request.path,
+            'user_id': user_id,
+            'duration_ms': round(sampler.duration * 1000, 1),
+            'samples': sum(sampler.samples.values()),
+            'error': repr(exc) if exc else None,
+            'created_at': datetime.now().isoformat()
+        }, handle)
+    _prune_profiles(directory)
+
+
+def _prune_profiles(directory):
+    keep = current_app.config.get('PROFILER_MAX_FILES', 50)
+    names = sorted(n for n in os.listdir(directory) if n.endswith(PROFILE_SUFFIX))
+    for old in names[:-keep] if keep > 0 else []:
+        for path in (old, old[:-len(PROFILE_SUFFIX)] + '.json'):
+            try:
+                os.remove(os.path.join(directory, path))
+            except OSError:
+                pass
+
+
+def list_profiles():
+    """Return metadata for saved profiles, newest first."""
+    directory = profile_directory()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for filename in sorted(os.listdir(directory), reverse=True):
+        if not filename.endswith('.json') or filename == STATE_FILENAME:
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as handle:
+                profiles.append(json.load(handle))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def init_profiler(app):
+    """Register the request hooks that start and stop the sampler."""
+    app.before_request(_start_profiling)
+    app.teardown_request(_finish_profiling)
@@ -0,0 +1,257 @@
+"""
+Per-provider rate limiting for AI API calls, shared across worker processes.
+
+Each provider has two token buckets: requests per minute and (estimated)
+tokens per minute. Buckets refill continuously at AI_RATE_LIMIT_HEADROOM of
+the configured quota, so steady traffic stays just under the provider's
+limit, and hold at most AI_RATE_LIMIT_BURST_SECONDS worth of refill, so a
+burst of uploads is spread out rather than sent at once. A limit of 0
+disables that bucket.
+
+A 429 from a provider pauses it for its Retry-After (or
+AI_RETRY_AFTER_DEFAULT seconds) in every process. Callers wait in acquire()
+until both buckets have room and the pause is over, up to a deadline,
+instead of failing straight away.
+
+The bucket state lives in a small SQLite file (AI_RATE_LIMIT_STATE_PATH)
+separate from the application database; each acquire is one short
+BEGIN IMMEDIATE transaction, which serialises the processes.
+"""
+
+import os
+import random
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from flask import current_app
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+    provider TEXT PRIMARY KEY,
+    request_tokens REAL NOT NULL,
+    token_tokens REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    blocked_until REAL NOT NULL DEFAULT 0
+)
+"""
+
+# Longest single sleep while waiting, so a lifted pause is noticed promptly
+MAX_POLL_SECONDS = 0.5
+
+
+class Bucket:
+    """Refill rate (per second) and capacity of one token bucket; rate 0 means unlimited."""
+
+    def __init__(self, per_minute, headroom, burst_seconds):
+        self.rate = per_minute * headroom / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds) if self.rate else 0.0
+
+    def refill(self, level, elapsed):
+        return min(self.capacity, level + elapsed * self.rate)
+
+    def wait_for(self, level, amount):
+        """Seconds until the bucket holds amount (capped at capacity)."""
+        if not self.rate:
+            return 0.0
+        missing = min(amount, self.capacity) - level
+        return max(0.0, missing / self.rate)
+
+
+def parse_retry_after(value, default):
+    """Retry-After header (seconds or an HTTP date) as seconds from now."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class RateLimiter:
+    """Token buckets per provider, stored in a SQLite file shared by every process."""
+
+    def __init__(self, path, limits, headroom=0.9, burst_seconds=10, default_retry_after=5):
+        """
+        Args:
+            path (str): SQLite file holding the bucket state
+            limits (dict): Provider -> (requests per minute, tokens per minute); 0 is unlimited
+            headroom (float): Share of each quota to use
+            burst_seconds (float): Seconds of refill a bucket can hold
+            default_retry_after (float): Pause after a 429 without a usable Retry-After
+        """
+        self.path = path
+        self.default_retry_after = default_retry_after
+        self.buckets = {
+            provider: (Bucket(rpm, headroom, burst_seconds), Bucket(tpm, headroom, burst_seconds))
+            for provider, (rpm, tpm) in limits.items()
+        }
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _buckets(self, provider):
+        return self.buckets.get(provider) or (Bucket(0, 1, 1), Bucket(0, 1, 1))
+
+    def _try_take(self, provider, tokens, now):
+        """
+        Take one request and tokens from the provider's buckets if they have room.
+
+        Returns:
+            float: 0 if taken, otherwise seconds to wait before trying again
+        """
+        requests_bucket, tokens_bucket = self._buckets(provider)
+        conn = self._connection()
+        if not requests_bucket.rate and not tokens_bucket.rate:
+            # No quota configured: only a Retry-After pause can hold the call, and reading it needs no lock
+            row = conn.execute(
+                'SELECT blocked_until FROM rate_limit_buckets WHERE provider = ?', (provider,)
+            ).fetchone()
+            return max(0.0, row[0] - now) if row else 0.0
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT request_tokens, token_tokens, updated_at, blocked_until '
+                'FROM rate_limit_buckets WHERE provider = ?', (provider,)
+            ).fetchone()
+            if row is None:
+                request_level, token_level, blocked_until = requests_bucket.capacity, tokens_bucket.capacity, 0.0
+            else:
+                elapsed = max(0.0, now - row[2])
+                request_level = requests_bucket.refill(row[0], elapsed)
+                token_level = tokens_bucket.refill(row[1], elapsed)
+                blocked_until = row[3]
+
+            if blocked_until > now:
+                wait = blocked_until - now
+            else:
+                wait = max(requests_bucket.wait_for(request_level, 1), tokens_bucket.wait_for(token_level, tokens))
+                if wait == 0.0:
+                    if requests_bucket.rate:
+                        request_level -= 1
+                    if tokens_bucket.rate:
+                        token_level -= min(tokens, tokens_bucket.capacity)
+
+            conn.execute(
+                'INSERT INTO rate_limit_buckets (provider, request_tokens, token_tokens, updated_at, blocked_until) '
+                'VALUES (?, ?, ?, ?, ?) ON CONFLICT(provider) DO UPDATE SET '
+                'request_tokens = excluded.request_tokens, token_tokens = excluded.token_tokens, '
+                'updated_at = excluded.updated_at',
+                (provider, request_level, token_level, now, blocked_until)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def acquire(self, provider, tokens, deadline):
+        """
+        Wait until the provider has room for one request of `tokens` tokens.
+
+        Args:
+            provider (str): Provider name
+            tokens (int): Estimated tokens for the request
+            deadline (float): time.monotonic() value to give up at
+
+        Returns:
+            bool: True once capacity was taken, False if it would not be available before deadline
+        """
+        while True:
+            wait = self._try_take(provider, tokens, time.time())
+            if wait == 0.0:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            # A little jitter so waiting processes do not all retry at the same instant
+            time.sleep(min(wait, MAX_POLL_SECONDS) + random.uniform(0, 0.05))
+
+    def block(self, provider, retry_after=None):
+        """
+        Pause a provider in every process after a 429.
+
+        Args:
+            provider (str): Provider name
+            retry_after (str, optional): The response's Retry-After header
+
+        Returns:
+            float: Seconds the provider is paused for
+        """
+        seconds = parse_retry_after(retry_after, self.default_retry_after)
+        now = time.time()
+        requests_bucket, tokens_bucket = self._buckets(provider)
+        conn = self._connection()
+        conn.execute(
+            'INSERT INTO rate_limit_buckets (provider, request_tokens, token_tokens, updated_at, blocked_until) '
+            'VALUES (?, 0, 0, ?, ?) ON CONFLICT(provider) DO UPDATE SET '
+            'blocked_until = MAX(blocked_until, excluded.blocked_until)',
+            (provider, now, now + seconds)
+        )
+        return seconds
+
+    def adjust(self, provider, token_delta):
+        """Charge (or refund, if negative) the difference between estimated and actual tokens used."""
+        _, tokens_bucket = self._buckets(provider)
+        if not tokens_bucket.rate or not token_delta:
+            return
+        self._connection().execute(
+            'UPDATE rate_limit_buckets SET token_tokens = MIN(?, token_tokens - ?) WHERE provider = ?',
+            (tokens_bucket.capacity, token_delta, provider)
+        )
+
+    def state(self):
+        """Stored bucket levels per provider (before refill), for display."""
+        rows = self._connection().execute(
+            'SELECT provider, request_tokens, token_tokens, updated_at, blocked_until FROM rate_limit_buckets'
+        ).fetchall()
+        now = time.time()
+        return {
+            provider: {
+                'requests_available': round(requests_level, 1),
+                'tokens_available': round(tokens_level),
+                'paused_for_s': round(max(0.0, blocked_until - now), 1)
+            }
+            for provider, requests_level, tokens_level, _, blocked_until in rows
+        }
+
+
+def estimate_tokens(messages, max_tokens):
+    """Rough token count of a chat request: about four characters per token, plus the reply."""
+    return sum(len(message.get('content', '')) for message in messages) // 4 + max_tokens
+
+
+def get_rate_limiter():
+    """Return the rate limiter for the current app, creating it from config on first use."""
+    limiter = current_app.extensions.get('rate_limiter')
+    if limiter is None:
+        config = current_app.config
+        path = config.get('AI_RATE_LIMIT_STATE_PATH') or os.path.join(current_app.instance_path, 'rate_limits.sqlite')
+        limiter = current_app.extensions.setdefault('rate_limiter', RateLimiter(
+            path,
+            {
+                'mistral': (config.get('MISTRAL_REQUESTS_PER_MINUTE', 0), config.get('MISTRAL_TOKENS_PER_MINUTE', 0)),
+                'openrouter': (
+                    config.get('OPENROUTER_REQUESTS_PER_MINUTE', 0), config.get('OPENROUTER_TOKENS_PER_MINUTE', 0)
+                )
+            },
+            headroom=config.get('AI_RATE_LIMIT_HEADROOM', 0.9),
+            burst_seconds=config.get('AI_RATE_LIMIT_BURST_SECONDS', 10),
+            default_retry_after=config.get('AI_RETRY_AFTER_DEFAULT', 5)
+        ))
+    return limiter
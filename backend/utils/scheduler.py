@@ -0,0 +1,223 @@
+"""
+Periodic jobs that run in exactly one process.
+
+Every process that builds the app (each server worker, and any script that
+does not pass SCHEDULER_ENABLED=False) runs a small election thread. The
+processes compete for a lease row in a SQLite file (SCHEDULER_LEASE_PATH)
+with a short BEGIN IMMEDIATE transaction: a process that finds no row, an
+expired lease or its own lease writes itself in as holder until
+now + SCHEDULER_LEASE_SECONDS. The holder renews the lease every
+SCHEDULER_RENEW_SECONDS and is the only process that starts an APScheduler
+BackgroundScheduler with the registered jobs.
+
+A leader that exits cleanly deletes its lease, so a follower takes over on
+its next poll. A leader that dies stops renewing, and a follower takes over
+within SCHEDULER_LEASE_SECONDS. A leader that cannot renew in time (e.g. the
+lease file is locked) stops its scheduler before its lease can expire, and
+each job checks it still holds the lease before it runs.
+"""
+
+import atexit
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from flask import current_app
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scheduler_leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL
+)
+"""
+
+
+class Lease:
+    """A named lease in a SQLite file, held by at most one process at a time."""
+
+    def __init__(self, path, name, holder, ttl):
+        """
+        Args:
+            path (str): SQLite file holding the lease
+            name (str): Lease name; processes competing for the same name elect one holder
+            holder (str): This process's identity
+            ttl (float): Seconds a lease stays valid without renewal
+        """
+        self.path = path
+        self.name = name
+        self.holder = holder
+        self.ttl = ttl
+        self.expires_at = 0.0  # Our own lease expiry, 0 when not held
+        self._conn = None
+
+    def _connection(self):
+        # Only the election thread uses the lease, so one connection is enough
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._conn.execute(SCHEMA)
+        return self._conn
+
+    def acquire(self, now=None):
+        """
+        Take or renew the lease if it is free, expired or already ours.
+
+        Returns:
+            bool: True if this process holds the lease until now + ttl
+        """
+        now = time.time() if now is None else now
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT holder, expires_at FROM scheduler_leases WHERE name = ?', (self.name,)
+            ).fetchone()
+            acquired = row is None or row[0] == self.holder or row[1] <= now
+            if acquired:
+                conn.execute(
+                    'INSERT INTO scheduler_leases (name, holder, expires_at) VALUES (?, ?, ?) '
+                    'ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at',
+                    (self.name, self.holder, now + self.ttl)
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self.expires_at = now + self.ttl if acquired else 0.0
+        return acquired
+
+    def held(self, now=None):
+        """Whether our last acquire is still valid, without touching the file."""
+        now = time.time() if now is None else now
+        return self.expires_at > now
+
+    def release(self):
+        """Give the lease up so another process can take it straight away."""
+        self.expires_at = 0.0
+        self._connection().execute(
+            'DELETE FROM scheduler_leases WHERE name = ? AND holder = ?', (self.name, self.holder)
+        )
+
+    def state(self):
+        """Current holder and seconds until its lease expires, for display."""
+        conn = sqlite3.connect(self.path, timeout=5)  # Not the election thread's connection
+        try:
+            conn.execute(SCHEMA)
+            row = conn.execute(
+                'SELECT holder, expires_at FROM scheduler_leases WHERE name = ?', (self.name,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return {'holder': None, 'expires_in_s': None, 'is_leader': False}
+        return {
+            'holder': row[0],
+            'expires_in_s': round(row[1] - time.time(), 1),
+            'is_leader': row[0] == self.holder and self.held()
+        }
+
+
+class LeaderScheduler:
+    """Runs registered interval jobs only while this process holds the scheduler lease."""
+
+    def __init__(self, app, lease, renew_seconds):
+        self.app = app
+        self.lease = lease
+        self.renew_seconds = renew_seconds
+        self.jobs = []  # (job id, function, interval seconds)
+        self._scheduler = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def is_leader(self):
+        return self._scheduler is not None and self.lease.held()
+
+    def add_job(self, job_id, func, seconds):
+        """Register func to run every `seconds` seconds in the leader, inside an app context."""
+        self.jobs.append((job_id, func, seconds))
+
+    def start(self):
+        """Start the election thread (no-op without jobs)."""
+        if not self.jobs or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='scheduler-election', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the election thread, stop any running scheduler and give up the lease."""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._stop_scheduler()
+        try:
+            self.lease.release()
+        except sqlite3.Error:
+            pass  # The lease expires on its own
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                leader = self.lease.acquire()
+            except sqlite3.Error as e:
+                # Keep leading only while the lease outlives the next renewal attempt,
+                # so jobs stop before another process can take the lease over
+                leader = self.lease.held(time.time() + self.renew_seconds)
+                self.app.logger.warning(f"Scheduler lease renewal failed: {str(e)}")
+            if leader and self._scheduler is None:
+                self._start_scheduler()
+            elif not leader and self._scheduler is not None:
+                self.app.logger.warning(f"Scheduler lease lost by {self.lease.holder}; stopping periodic jobs")
+                self._stop_scheduler()
+            self._stop.wait(self.renew_seconds)
+
+    def _start_scheduler(self):
+        from apscheduler.schedulers.background import BackgroundScheduler
+
+        scheduler = BackgroundScheduler()
+        for job_id, func, seconds in self.jobs:
+            scheduler.add_job(self._guarded, 'interval', seconds=seconds, id=job_id, args=(job_id, func),
+                              max_instances=1, coalesce=True)
+        scheduler.start()
+        self._scheduler = scheduler
+        self.app.logger.info(f"Scheduler leader elected: {self.lease.holder} runs {len(self.jobs)} periodic jobs")
+
+    def _stop_scheduler(self):
+        scheduler, self._scheduler = self._scheduler, None
+        if scheduler is not None:
+            scheduler.shutdown(wait=False)
+
+    def _guarded(self, job_id, func):
+        # Fencing: a job that fires after the lease lapsed does not run
+        if not self.lease.held():
+            self.app.logger.warning(f"Skipping job {job_id}: this process no longer holds the scheduler lease")
+            return
+        with self.app.app_context():
+            func()
+
+
+def init_scheduler(app):
+    """
+    Create the app's leader-elected scheduler from config and keep it in app.extensions.
+
+    Register jobs with add_job() and then call start().
+    """
+    config = app.config
+    path = config.get('SCHEDULER_LEASE_PATH') or os.path.join(app.instance_path, 'scheduler.sqlite')
+    holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    lease = Lease(path, 'scheduler', holder, config.get('SCHEDULER_LEASE_SECONDS', 30))
+    scheduler = LeaderScheduler(app, lease, config.get('SCHEDULER_RENEW_SECONDS', 10))
+    app.extensions['scheduler'] = scheduler
+    return scheduler
+
+
+def get_scheduler():
+    """Return the current app's scheduler, or None when SCHEDULER_ENABLED is off."""
+    return current_app.extensions.get('scheduler')
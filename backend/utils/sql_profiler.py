@@ -0,0 +1,159 @@
+"""
+SQL query profiler.
+
+Cursor-execute hooks on every engine record, per request, how many
+statements ran and how long they took. Each request gets:
+
+- X-Query-Count / X-Query-Time-Ms response headers and an 'sql' entry in
+  Server-Timing (counts up to the moment the response is created)
+- a warning in the log for any statement slower than SQL_SLOW_QUERY_MS,
+  with its parameters
+- a warning when the same SQL text ran SQL_NPLUS1_THRESHOLD or more times,
+  the usual sign of a per-row lazy load (N+1)
+- an observation in the docscanner_sql_queries_per_request histogram
+
+query_budget() gives tests the same counts without a request. The
+cursor hooks that feed it are attached even when SQL_PROFILER_ENABLED is
+off; the flag only turns off the per-request reporting above.
+"""
+
+import threading
+import time
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from .metrics import add_server_timing, histogram
+
+SQL_QUERIES_PER_REQUEST = histogram(
+    'docscanner_sql_queries_per_request', 'SQL statements executed per request', ('endpoint',),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+)
+
+# Parameters longer than this are truncated in the slow-query log
+MAX_LOGGED_PARAMS = 500
+
+_budgets = threading.local()
+
+# Engines with the cursor hooks attached; query_budget refuses to run without any
+_instrumented = weakref.WeakSet()
+
+
+class QueryStats:
+    """Statement count, total time and per-statement repeat counts."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+
+    def repeated(self, threshold):
+        """Statements that ran at least threshold times, most frequent first."""
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+
+@contextmanager
+def query_budget(max_queries):
+    """
+    Fail if the block runs more than max_queries SQL statements.
+
+    Intended for tests that pin an endpoint's query count, e.g.:
+
+        with query_budget(5):
+            client.get('/user/profile', content_type='application/json')
+
+    Raises:
+        AssertionError: Listing the statements when the budget is exceeded,
+            or if no engine has the counting hooks (nothing would be counted)
+    """
+    if not _instrumented:
+        raise AssertionError('query_budget needs register_sql_profiler to have instrumented an engine')
+    stats = QueryStats()
+    active = _budgets.__dict__.setdefault('active', [])
+    active.append(stats)
+    try:
+        yield stats
+    finally:
+        active.remove(stats)
+    if stats.count > max_queries:
+        listing = '\n'.join(f'  {n}x {sql}' for sql, n in stats.statements.most_common())
+        raise AssertionError(f'Expected at most {max_queries} queries, ran {stats.count}:\n{listing}')
+
+
+def _format_params(parameters):
+    text = repr(parameters)
+    return text if len(text) <= MAX_LOGGED_PARAMS else text[:MAX_LOGGED_PARAMS] + '...'
+
+
+def register_sql_profiler(app, engines):
+    """
+    Attach the cursor-execute hooks to engines and the request hooks to app.
+
+    The cursor hooks always count statements for query_budget; the
+    per-request reporting is only set up when SQL_PROFILER_ENABLED is on.
+
+    Args:
+        app (Flask): Application whose requests are profiled
+        engines (iterable): SQLAlchemy engines to instrument
+    """
+    enabled = app.config.get('SQL_PROFILER_ENABLED', True)
+    slow_seconds = app.config.get('SQL_SLOW_QUERY_MS', 100) / 1000
+    nplus1_threshold = app.config.get('SQL_NPLUS1_THRESHOLD', 10)
+    logger = app.logger
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+
+        for stats in getattr(_budgets, 'active', ()):
+            stats.record(statement, elapsed)
+        if not enabled:
+            return
+        if has_request_context():
+            g.setdefault('sql_stats', QueryStats()).record(statement, elapsed)
+
+        if elapsed >= slow_seconds:
+            where = f" in {request.method} {request.path}" if has_request_context() else ""
+            logger.warning(
+                f"Slow query ({elapsed * 1000:.1f} ms){where}: {statement} -- params {_format_params(parameters)}"
+            )
+
+    for engine in engines:
+        if not event.contains(engine, 'before_cursor_execute', before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+        _instrumented.add(engine)
+
+    if not enabled:
+        return
+
+    @app.after_request
+    def add_query_headers(response):
+        stats = g.get('sql_stats')
+        if stats is not None:
+            response.headers['X-Query-Count'] = str(stats.count)
+            response.headers['X-Query-Time-Ms'] = f'{stats.seconds * 1000:.1f}'
+            add_server_timing('sql', stats.seconds)
+        return response
+
+    @app.teardown_request
+    def report_queries(exc):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return
+        SQL_QUERIES_PER_REQUEST.observe(stats.count, endpoint=request.endpoint or 'unknown')
+        for statement, repeats in stats.repeated(nplus1_threshold):
+            logger.warning(
+                f"Possible N+1 in {request.endpoint}: statement ran {repeats} times "
+                f"({stats.count} queries in request): {statement}"
+            )
@@ -0,0 +1,113 @@
+"""
+Cached user loading for Flask-Login.
+
+Every authenticated request loads its user before the view runs. Instead of
+a SELECT per request, load_cached_user keeps a detached snapshot of each
+recently seen user in a small TTL cache (see TTLCache) and attaches a copy
+to the request's session with merge(load=False), which does not query.
+Relationships and expired attributes still load from the database on
+first access.
+
+Snapshots are dropped after the commit of any change to a user: ORM changes
+are picked up by a flush hook, and Core UPDATEs (credit debits, grants and
+resets) call invalidate_user / invalidate_all_users. The invalidation is
+local to the process, so other worker processes may serve a snapshot up to
+USER_CACHE_TTL seconds old; credit debits stay correct regardless because
+they are conditional UPDATEs against the database.
+"""
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from database.models import db, User
+from backend.utils.cache import TTLCache
+
+# Session.info key collecting user IDs to invalidate once the transaction commits
+_PENDING_KEY = 'invalidated_user_ids'
+_ALL = '*'
+
+
+def get_user_cache():
+    """Return the user snapshot cache for the current app, creating it on first use."""
+    cache = current_app.extensions.get('user_cache')
+    if cache is None:
+        cache = current_app.extensions.setdefault('user_cache', TTLCache(
+            maxsize=current_app.config.get('USER_CACHE_MAX_ENTRIES', 1024),
+            ttl=current_app.config.get('USER_CACHE_TTL', 5)
+        ))
+    return cache
+
+
+def _snapshot(user):
+    """Copy a loaded user's column values into a detached instance."""
+    state = inspect(user)
+    values = {attr.key: getattr(user, attr.key) for attr in state.mapper.column_attrs}
+    snapshot = User(**values)
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+
+def load_cached_user(user_id):
+    """
+    Load a user for the current request, from the snapshot cache if possible.
+
+    Args:
+        user_id (int): User ID from the session cookie
+
+    Returns:
+        User: Instance attached to db.session, or None if the user does not exist
+    """
+    cache = get_user_cache()
+    snapshot = cache.get(user_id)
+    if snapshot is not None:
+        return db.session.merge(snapshot, load=False)
+
+    user = db.session.get(User, user_id)
+    if user is not None:
+        cache.set(user_id, _snapshot(user))
+    return user
+
+
+def invalidate_user(*user_ids):
+    """Drop the users' snapshots when the current transaction commits."""
+    db.session.info.setdefault(_PENDING_KEY, set()).update(user_ids)
+
+
+def invalidate_all_users():
+    """Drop every snapshot when the current transaction commits (bulk updates)."""
+    invalidate_user(_ALL)
+
+
+def _on_flush(session, flush_context):
+    changed = [
+        obj.id for obj in list(session.dirty) + list(session.deleted)
+        if isinstance(obj, User) and session.is_modified(obj)
+    ]
+    if changed:
+        session.info.setdefault(_PENDING_KEY, set()).update(changed)
+
+
+def _on_commit(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending or not has_app_context():
+        return
+    cache = get_user_cache()
+    if _ALL in pending:
+        cache.clear()
+        return
+    for user_id in pending:
+        cache.delete(user_id)
+
+
+def _on_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def register_user_cache():
+    """Attach the invalidation hooks to the shared session (once per process)."""
+    if event.contains(db.session, 'after_commit', _on_commit):
+        return
+    event.listen(db.session, 'after_flush', _on_flush)
+    event.listen(db.session, 'after_commit', _on_commit)
+    event.listen(db.session, 'after_rollback', _on_rollback)
@@ -0,0 +1,6 @@
+"""
+Benchmarks for the Document Scanner application.
+
+Each module is runnable from the project root, e.g.
+``python -m benchmarks.sqlite_concurrency``.
+"""
@@ -0,0 +1,214 @@
+"""
+Deterministic synthetic corpus for benchmarks.
+
+Documents are drawn from a generated vocabulary with a Zipf-like word
+distribution, so TF-IDF sees realistic term frequencies. A configurable
+fraction of documents are near-duplicates: copies of an earlier document
+with a small share of their words replaced. The same seed always produces
+the same corpus.
+
+Fixtures in the formats the upload accepts (TXT, DOCX, PDF) can be written
+from any generated text. PDFs are written directly in a minimal form that
+PyPDF2 can extract text from, so no PDF library beyond the app's own
+dependencies is needed.
+
+Usage:
+    python -m benchmarks.corpus --docs 100 --out /tmp/corpus --formats txt,pdf,docx
+"""
+
+import argparse
+import io
+import itertools
+import os
+import random
+from dataclasses import dataclass, field
+
+SYLLABLES = [
+    'ka', 'lo', 'mi', 'ra', 'te', 'su', 'no', 'vi', 'de', 'po',
+    'an', 'el', 'or', 'is', 'un', 'ba', 'ce', 'fu', 'go', 'hy'
+]
+
+FORMATS = ('txt', 'pdf', 'docx')
+
+
+@dataclass
+class Corpus:
+    """Generated documents plus which ones are near-duplicates of which."""
+    texts: list
+    duplicate_of: dict = field(default_factory=dict)  # index -> index of the original
+    seed: int = 42
+
+    def __len__(self):
+        return len(self.texts)
+
+
+def generate_vocabulary(size, seed=42):
+    """Return size distinct pseudo-words, the same for the same seed."""
+    rng = random.Random(seed)
+    words, seen = [], set()
+    for length in itertools.count(2):
+        candidates = [''.join(parts) for parts in itertools.product(SYLLABLES, repeat=length)]
+        rng.shuffle(candidates)
+        for word in candidates:
+            if word not in seen:
+                seen.add(word)
+                words.append(word)
+                if len(words) == size:
+                    return words
+
+
+def _mutate(words, rate, vocabulary, rng):
+    mutated = list(words)
+    for index in rng.sample(range(len(mutated)), max(1, int(len(mutated) * rate))):
+        mutated[index] = rng.choice(vocabulary)
+    return mutated
+
+
+def generate_corpus(docs, vocabulary_size=5000, words_per_doc=(100, 300),
+                    near_duplicate_fraction=0.1, mutation_rate=0.05, seed=42):
+    """
+    Generate a corpus of synthetic documents.
+
+    Args:
+        docs (int): Number of documents
+        vocabulary_size (int): Distinct words available
+        words_per_doc (tuple): Inclusive (min, max) words per document
+        near_duplicate_fraction (float): Share of documents that are mutated
+            copies of an earlier document
+        mutation_rate (float): Share of words replaced in a near-duplicate
+        seed (int): Random seed
+
+    Returns:
+        Corpus: Texts and the near-duplicate mapping
+    """
+    rng = random.Random(seed)
+    vocabulary = generate_vocabulary(vocabulary_size, seed)
+    # Zipf-like weights: the word at rank r is drawn with weight 1 / r
+    cumulative = list(itertools.accumulate(1.0 / rank for rank in range(1, vocabulary_size + 1)))
+
+    tokens, duplicate_of = [], {}
+    for index in range(docs):
+        if index and rng.random() < near_duplicate_fraction:
+            original = rng.randrange(index)
+            tokens.append(_mutate(tokens[original], mutation_rate, vocabulary, rng))
+            duplicate_of[index] = original
+        else:
+            length = rng.randint(*words_per_doc)
+            tokens.append(rng.choices(vocabulary, cum_weights=cumulative, k=length))
+
+    texts = [_to_text(words) for words in tokens]
+    return Corpus(texts=texts, duplicate_of=duplicate_of, seed=seed)
+
+
+def _to_text(words, sentence_length=12):
+    sentences = [
+        ' '.join(words[start:start + sentence_length]).capitalize() + '.'
+        for start in range(0, len(words), sentence_length)
+    ]
+    return '\n'.join(sentences)
+
+
+def _pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def pdf_bytes(text, lines_per_page=50):
+    """Render text as a minimal multi-page PDF using the built-in Helvetica font."""
+    lines = text.splitlines() or ['']
+    pages = [lines[start:start + lines_per_page] for start in range(0, len(lines), lines_per_page)]
+
+    # Object 1: catalog, 2: page tree, 3: font, then a page and a content stream per page
+    objects = {1: b'<< /Type /Catalog /Pages 2 0 R >>', 3: b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>'}
+    page_ids = []
+    for number, page_lines in enumerate(pages):
+        page_id, content_id = 4 + number * 2, 5 + number * 2
+        page_ids.append(page_id)
+        body = '\n'.join(f'({_pdf_escape(line)}) Tj T*' for line in page_lines)
+        stream = f'BT /F1 10 Tf 12 TL 50 780 Td\n{body}\nET'.encode('latin-1', 'replace')
+        objects[content_id] = b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream'
+        objects[page_id] = (
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] '
+            b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % content_id
+        )
+    kids = ' '.join(f'{page_id} 0 R' for page_id in page_ids).encode()
+    objects[2] = b'<< /Type /Pages /Kids [' + kids + b'] /Count %d >>' % len(page_ids)
+
+    out = io.BytesIO()
+    out.write(b'%PDF-1.4\n')
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = out.tell()
+        out.write(b'%d 0 obj\n' % object_id + objects[object_id] + b'\nendobj\n')
+    xref_at = out.tell()
+    out.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    for object_id in sorted(objects):
+        out.write(b'%010d 00000 n \n' % offsets[object_id])
+    out.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref_at))
+    return out.getvalue()
+
+
+def docx_bytes(text):
+    """Render text as a DOCX with one paragraph per line."""
+    from docx import Document as DocxDocument
+
+    document = DocxDocument()
+    for line in text.splitlines():
+        document.add_paragraph(line)
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+
+def fixture_bytes(text, fmt):
+    """Encode text as an upload in the given format ('txt', 'pdf' or 'docx')."""
+    if fmt == 'txt':
+        return text.encode('utf-8')
+    if fmt == 'pdf':
+        return pdf_bytes(text)
+    if fmt == 'docx':
+        return docx_bytes(text)
+    raise ValueError(f'Unsupported fixture format: {fmt}')
+
+
+def upload_file(text, fmt, name='fixture'):
+    """Wrap a fixture as the FileStorage object DocumentParser.parse_file expects."""
+    from werkzeug.datastructures import FileStorage
+
+    return FileStorage(stream=io.BytesIO(fixture_bytes(text, fmt)), filename=f'{name}.{fmt}')
+
+
+def write_fixtures(corpus, directory, formats=FORMATS):
+    """
+    Write every corpus document in each format to directory.
+
+    Returns:
+        list: Paths written
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for index, text in enumerate(corpus.texts):
+        for fmt in formats:
+            path = os.path.join(directory, f'doc{index:06d}.{fmt}')
+            with open(path, 'wb') as handle:
+                handle.write(fixture_bytes(text, fmt))
+            paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic benchmark corpus')
+    parser.add_argument('--docs', type=int, default=100, help='Number of documents')
+    parser.add_argument('--vocabulary', type=int, default=5000, help='Vocabulary size')
+    parser.add_argument('--near-duplicates', type=float, default=0.1, help='Fraction of near-duplicates')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--out', required=True, help='Directory to write fixtures to')
+    parser.add_argument('--formats', default='txt', help='Comma-separated subset of txt,pdf,docx')
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.docs, args.vocabulary, near_duplicate_fraction=args.near_duplicates, seed=args.seed)
+    paths = write_fixtures(corpus, args.out, [fmt for fmt in args.formats.split(',') if fmt])
+    print(f'Wrote {len(paths)} files ({len(corpus.duplicate_of)} near-duplicates) to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Daily credit reset benchmark.
+
+Populates a temporary database with N users (half of them due for a reset)
+and times:
+
+- legacy: the old hourly job, which loads every User into the ORM and
+  compares timestamps in Python
+- sweep: CreditService.reset_due_credits, a single conditional UPDATE
+- lazy: CreditService.apply_daily_reset per loaded user, for due and
+  not-due users
+
+Usage:
+    python -m benchmarks.credit_reset --users 1000000
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app import create_app
+from database.models import db, User
+from backend.services.credit_service import CreditService
+
+
+def _populate(db_path, users):
+    """Insert users directly with sqlite3; every other user is due for a reset."""
+    now = datetime.now()
+    due = (now - timedelta(days=2)).isoformat(sep=' ')
+    fresh = (now - timedelta(hours=1)).isoformat(sep=' ')
+
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO users (username, email, password_hash, role, is_active, credits, "
+        "total_credits_granted, last_credit_reset, created_at, last_login) "
+        "VALUES (?, ?, 'x', 'user', 1, 3, 20, ?, ?, ?)",
+        (
+            (f'user{i}', f'user{i}@example.com', due if i % 2 else fresh, fresh, fresh)
+            for i in range(users)
+        )
+    )
+    conn.commit()
+    conn.close()
+
+
+def _mark_due(db_path):
+    """Put the even-id users back into the due state between passes."""
+    due = (datetime.now() - timedelta(days=2)).isoformat(sep=' ')
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE users SET credits = 3, last_credit_reset = ? WHERE id % 2 = 0", (due,))
+    conn.commit()
+    conn.close()
+
+
+def _legacy_reset():
+    """The previous reset job, kept here for comparison."""
+    users = User.query.all()
+    now = datetime.now()
+    for user in users:
+        if user.last_credit_reset and (now - user.last_credit_reset).days >= 1:
+            user.credits = 20
+            user.last_credit_reset = now
+    db.session.commit()
+
+
+def _timed(func):
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def run(users, skip_legacy=False, lazy_samples=1000):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+            'SCHEDULER_ENABLED': False
+        })
+        results = {'users': users}
+
+        with app.app_context():
+            db.create_all()
+            _populate(db_path, users)
+
+            if not skip_legacy:
+                results['legacy_seconds'] = round(_timed(_legacy_reset), 3)
+                db.session.remove()
+                _mark_due(db_path)
+
+            results['sweep_seconds'] = round(_timed(CreditService.reset_due_credits), 3)
+            _mark_due(db_path)
+
+            # Lazy reset cost per loaded user (ids are 1-based; even ids are due)
+            for label, parity in (('lazy_due_ms', 0), ('lazy_not_due_ms', 1)):
+                ids = [i for i in range(1, min(users, lazy_samples * 2) + 1) if i % 2 == parity]
+                loaded = [db.session.get(User, user_id) for user_id in ids]
+                elapsed = _timed(lambda: [CreditService.apply_daily_reset(user) for user in loaded])
+                results[label] = round(elapsed / max(len(loaded), 1) * 1000, 4)
+                db.session.remove()
+
+            for engine in db.engines.values():
+                engine.dispose()
+
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Daily credit reset benchmark')
+    parser.add_argument('--users', type=int, default=1_000_000, help='Number of users to create')
+    parser.add_argument('--skip-legacy', action='store_true',
+                        help='Skip the ORM loop (slow and memory hungry at 1M users)')
+    parser.add_argument('--lazy-samples', type=int, default=1000,
+                        help='Users to time the lazy reset on')
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.users, args.skip_legacy, args.lazy_samples), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,334 @@
+"""
+Local stand-in for the OpenRouter and Mistral chat completion and embeddings APIs.
+
+Serves POST .../chat/completions and .../embeddings in the OpenAI-compatible
+shape both providers use, so the app can be load-tested without calling (or
+paying for) the real APIs. Point it at the server with:
+
+    MISTRAL_BASE_URL=http://127.0.0.1:8099/v1
+    OPENROUTER_BASE_URL=http://127.0.0.1:8099/v1
+
+Scores are deterministic: the texts are pulled out of the similarity
+prompt and scored by word-set Jaccard overlap, so the same pair always gets
+the same score. Batched prompts (one document, numbered candidates) are
+answered with a JSON list of scores, optionally leaving some out.
+Embeddings are signed hashed bags of words, so their cosines also follow
+word overlap. Latency is drawn from a configurable distribution, and a
+share of requests can fail with a 500, a 429 (with Retry-After) or a
+non-numeric answer. A sliding-window request quota can also be enforced,
+answering 429 with the time until the window frees up. GET /stats returns request counts by outcome.
+
+Latency specs (milliseconds):
+    fixed:50  uniform:20:200  lognormal:80:0.5 (median, sigma)  exponential:100 (mean)
+
+Usage:
+    python -m benchmarks.fake_llm --port 8099 --latency lognormal:80:0.5 --rate-limit-rate 0.05
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROMPT_TEXTS = re.compile(r'Text 1:\n(.*?)\n\nText 2:\n(.*?)\n\nSimilarity score:', re.DOTALL)
+BATCH_PROMPT = re.compile(r'New document:\n(.*?)\n\nCandidates:\n(.*?)\n\nJSON:', re.DOTALL)
+BATCH_ITEM = re.compile(r'^\[(\d+)\]\n', re.MULTILINE)
+
+EMBEDDING_DIMENSIONS = 512
+
+
+@dataclass
+class FakeLLMOptions:
+    latency: str = 'fixed:0'
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+    bad_response_rate: float = 0.0
+    batch_drop_rate: float = 0.0
+    quota: int = 0  # requests allowed per quota_window; 0 = unlimited
+    quota_window: float = 60.0
+    seed: int = 42
+
+
+def parse_latency(spec):
+    """Turn a latency spec into a function returning a delay in seconds from an RNG."""
+    kind, _, args = spec.partition(':')
+    values = [float(value) for value in args.split(':') if value]
+    if kind == 'fixed':
+        return lambda rng: values[0] / 1000
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == 'lognormal':
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1]) / 1000
+    if kind == 'exponential':
+        return lambda rng: rng.expovariate(1 / values[0]) / 1000
+    raise ValueError(f'Unknown latency distribution: {spec}')
+
+
+def _jaccard(text1, text2):
+    words1 = set(re.findall(r'\w+', text1.lower()))
+    words2 = set(re.findall(r'\w+', text2.lower()))
+    if not words1 and not words2:
+        return 1.0
+    return len(words1 & words2) / len(words1 | words2)
+
+
+def similarity_score(prompt):
+    """Deterministic score for a similarity prompt: Jaccard overlap of the two texts' words."""
+    found = PROMPT_TEXTS.search(prompt)
+    if not found:
+        # Not a similarity prompt; still answer the same way every time
+        return int(hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8], 16) / 0xFFFFFFFF
+    return _jaccard(found.group(1), found.group(2))
+
+
+def batch_scores(prompt):
+    """Scores for a batched prompt as [(candidate id, score)], or None if it is not one."""
+    found = BATCH_PROMPT.search(prompt)
+    if not found:
+        return None
+    document, listing = found.groups()
+    parts = BATCH_ITEM.split(listing)  # ['', id, text, id, text, ...]
+    return [(int(parts[i]), _jaccard(document, parts[i + 1])) for i in range(1, len(parts) - 1, 2)]
+
+
+def embedding_vector(text, dimensions=EMBEDDING_DIMENSIONS):
+    """Deterministic embedding: each distinct word adds +-1 to a hashed dimension."""
+    vector = [0.0] * dimensions
+    for word in set(re.findall(r'\w+', text.lower())):
+        digest = hashlib.md5(word.encode('utf-8')).digest()
+        vector[int.from_bytes(digest[:4], 'little') % dimensions] += 1.0 if digest[4] & 1 else -1.0
+    return vector
+
+
+def _embeddings(model, texts):
+    return {
+        'object': 'list',
+        'model': model,
+        'data': [
+            {'object': 'embedding', 'index': index, 'embedding': embedding_vector(text)}
+            for index, text in enumerate(texts)
+        ],
+        'usage': {'prompt_tokens': 0, 'total_tokens': 1}
+    }
+
+
+def _completion(model, content):
+    return {
+        'id': 'fake-' + hashlib.md5(content.encode('utf-8')).hexdigest()[:12],
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': content},
+            'finish_reason': 'stop'
+        }],
+        'usage': {'prompt_tokens': 0, 'completion_tokens': 1, 'total_tokens': 1}
+    }
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    server_version = 'FakeLLM/1.0'
+
+    def log_message(self, format, *args):
+        pass  # Keep load-test output readable
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            self._send_json(200, self.server.stats())
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json(400, {'error': {'message': 'invalid JSON'}})
+            return
+
+        endpoint = self.path.rstrip('/').rsplit('/', 1)[-1]
+        if endpoint not in ('completions', 'embeddings'):
+            self._send_json(404, {'error': {'message': f'unknown endpoint {self.path}'}})
+            return
+
+        retry_after = self.server.check_quota()
+        if retry_after is not None:
+            self.server.count('quota_exceeded')
+            self._send_json(429, {'error': {'message': 'quota exceeded'}}, {'Retry-After': f'{retry_after:.2f}'})
+            return
+
+        delay, outcome = self.server.draw()
+        time.sleep(delay)
+        self.server.count(outcome)
+
+        if outcome == 'rate_limited':
+            self._send_json(429, {'error': {'message': 'rate limit exceeded'}},
+                            {'Retry-After': f'{self.server.options.retry_after:g}'})
+        elif outcome == 'error':
+            self._send_json(500, {'error': {'message': 'injected failure'}})
+        elif endpoint == 'embeddings':
+            texts = body.get('input') or []
+            texts = [texts] if isinstance(texts, str) else texts
+            if outcome == 'bad_response':
+                texts = texts[:-1]  # One embedding short
+            self._send_json(200, _embeddings(body.get('model', 'fake'), texts))
+        else:
+            prompt = (body.get('messages') or [{}])[-1].get('content', '')
+            scores = batch_scores(prompt)
+            if outcome == 'bad_response':
+                content = 'I think these texts are fairly similar.'
+            elif scores is not None:
+                kept = [(i, score) for i, score in scores if not self.server.drop_batch_item()]
+                content = json.dumps({'scores': [{'id': i, 'score': round(score, 3)} for i, score in kept]})
+            else:
+                content = f"{similarity_score(prompt):.3f}"
+            self._send_json(200, _completion(body.get('model', 'fake'), content))
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, options=None):
+        super().__init__(address, FakeLLMHandler)
+        self.options = options or FakeLLMOptions()
+        self._latency = parse_latency(self.options.latency)
+        self._rng = random.Random(self.options.seed)
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._recent = deque()  # arrival times inside the quota window
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def draw(self):
+        """Pick this request's delay and outcome."""
+        options = self.options
+        with self._lock:
+            delay = max(0.0, self._latency(self._rng))
+            roll = self._rng.random()
+        if roll < options.rate_limit_rate:
+            return delay, 'rate_limited'
+        roll -= options.rate_limit_rate
+        if roll < options.error_rate:
+            return delay, 'error'
+        roll -= options.error_rate
+        if roll < options.bad_response_rate:
+            return delay, 'bad_response'
+        return delay, 'ok'
+
+    def check_quota(self):
+        """Admit a request under the sliding-window quota; returns Retry-After seconds if over it."""
+        if not self.options.quota:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] >= self.options.quota_window:
+                self._recent.popleft()
+            if len(self._recent) >= self.options.quota:
+                return self.options.quota_window - (now - self._recent[0])
+            self._recent.append(now)
+            return None
+
+    def drop_batch_item(self):
+        """Whether to leave one candidate out of a batched answer."""
+        with self._lock:
+            return self._rng.random() < self.options.batch_drop_rate
+
+    def count(self, outcome):
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        return {'requests': sum(counts.values()), 'outcomes': counts}
+
+
+def start_fake_llm(options=None, host='127.0.0.1', port=0):
+    """
+    Run a fake provider on a background thread.
+
+    Args:
+        options (FakeLLMOptions, optional): Latency and failure injection
+        host (str): Interface to bind
+        port (int): Port to bind; 0 picks a free one
+
+    Returns:
+        FakeLLMServer: Running server; call shutdown() to stop it
+    """
+    server = FakeLLMServer((host, port), options)
+    threading.Thread(target=server.serve_forever, name='fake-llm', daemon=True).start()
+    return server
+
+
+def add_fake_llm_arguments(parser):
+    """Add the fake provider's options to an argparse parser (shared with the load test)."""
+    parser.add_argument('--latency', default='fixed:0', help='Latency distribution, e.g. lognormal:80:0.5')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Share answered with 429')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After seconds sent with 429s')
+    parser.add_argument('--bad-response-rate', type=float, default=0.0,
+                        help='Share answered with non-numeric text (or one embedding short)')
+    parser.add_argument('--batch-drop-rate', type=float, default=0.0,
+                        help='Share of candidates left out of batched answers')
+    parser.add_argument('--quota', type=int, default=0,
+                        help='Requests allowed per --quota-window before answering 429 (0 = unlimited)')
+    parser.add_argument('--quota-window', type=float, default=60.0, help='Quota window in seconds')
+    parser.add_argument('--llm-seed', type=int, default=42, help='Seed for latency and failure draws')
+
+
+def options_from_args(args):
+    return FakeLLMOptions(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        bad_response_rate=args.bad_response_rate,
+        batch_drop_rate=args.batch_drop_rate,
+        quota=args.quota,
+        quota_window=args.quota_window,
+        seed=args.llm_seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake OpenRouter/Mistral chat completions and embeddings server')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to bind')
+    parser.add_argument('--port', type=int, default=8099, help='Port to bind')
+    add_fake_llm_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeLLMServer((args.host, args.port), options_from_args(args))
+    print(f'Fake LLM provider listening on {server.base_url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
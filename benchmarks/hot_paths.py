@@ -0,0 +1,235 @@
+"""
+Scan hot-path microbenchmarks.
+
+For each corpus size (1k/10k/100k documents by default) a deterministic
+synthetic corpus is generated (see benchmarks.corpus) and the following are
+timed:
+
+- hash: SHA-256 of each document's text, as the upload does
+- load_candidates: Document.query.all() against a database holding the corpus
+- tfidf_pairwise: get_traditional_similarity, one query against each document
+- scan_loop: find_matches for one upload, traditional scoring only (the AI
+  providers are switched off so network latency does not swamp the numbers);
+  it fits one TF-IDF model over the upload and the documents it is compared with
+- tfidf_batch: the alternative strategy of fitting one TF-IDF model on the
+  corpus and scoring a query with a single sparse product
+
+Pairwise scoring costs milliseconds per document, so tfidf_pairwise compares
+against at most --max-comparisons documents and projects the full-corpus
+time from that; scan_loop uses the same documents so runs stay comparable.
+Those rows carry "extrapolated": true.
+
+Text extraction (DocumentParser.parse_file) does not depend on corpus size
+and is timed once per fixture format.
+
+Results are printed as JSON (or written to --output) so runs can be diffed.
+
+Usage:
+    python -m benchmarks.hot_paths --sizes 1000,10000,100000 --output results.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from app import create_app
+from database.models import db, Document
+from backend.api import document as document_api
+from backend.utils.document_parser import DocumentParser
+
+from .corpus import FORMATS, generate_corpus, upload_file
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _row(name, n_docs, samples, **extra):
+    """Summarise per-call timings (seconds) as one result row in milliseconds."""
+    row = {
+        'name': name,
+        'n_docs': n_docs,
+        'calls': len(samples),
+        'mean_ms': round(statistics.fmean(samples) * 1000, 4),
+        'p50_ms': round(_percentile(samples, 0.5) * 1000, 4),
+        'p95_ms': round(_percentile(samples, 0.95) * 1000, 4),
+        'total_s': round(sum(samples), 4)
+    }
+    row.update(extra)
+    return row
+
+
+def _time_each(func, items):
+    samples = []
+    for item in items:
+        started = time.perf_counter()
+        func(item)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+@contextmanager
+def _traditional_only():
+    """Disable the AI providers so find_matches scores with TF-IDF alone."""
+    saved = document_api.score_with_ai
+    document_api.score_with_ai = lambda content, documents, embedding=None: {}
+    try:
+        yield
+    finally:
+        document_api.score_with_ai = saved
+
+
+def _populate(db_path, texts):
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "INSERT INTO users (username, email, password_hash, role, is_active, credits, total_credits_granted) "
+        "VALUES ('bench', 'bench@example.com', 'x', 'user', 1, 20, 20)"
+    )
+    now = datetime.now().isoformat(sep=' ')
+    conn.executemany(
+        "INSERT INTO documents (title, content, content_hash, file_type, file_size, user_id, created_at, updated_at) "
+        "VALUES (?, ?, ?, 'txt', ?, 1, ?, ?)",
+        (
+            (f'doc{i}.txt', text, hashlib.sha256(text.encode('utf-8')).hexdigest(), len(text), now, now)
+            for i, text in enumerate(texts)
+        )
+    )
+    conn.commit()
+    conn.close()
+
+
+def _tfidf_batch(texts, queries):
+    """Fit one model on the corpus, then score each query against every document at once."""
+    # Same vectorizer as get_traditional_similarity and the candidate prefilter
+    vectorizer = document_api._tfidf_vectorizer()
+    started = time.perf_counter()
+    matrix = vectorizer.fit_transform(texts)
+    fit_seconds = time.perf_counter() - started
+
+    def score(query):
+        # TF-IDF rows are L2-normalised, so the dot product is the cosine similarity
+        return (matrix @ vectorizer.transform([query]).T).toarray().ravel()
+
+    return fit_seconds, _time_each(score, queries)
+
+
+def bench_size(n_docs, queries, max_comparisons, seed):
+    """Time every size-dependent hot path against a corpus of n_docs documents."""
+    corpus = generate_corpus(n_docs, seed=seed)
+    texts = corpus.texts
+    # Queries come from another seed: same vocabulary, unrelated text
+    query_texts = generate_corpus(queries, near_duplicate_fraction=0.0, seed=seed + 1).texts
+    results = []
+
+    samples = _time_each(lambda text: hashlib.sha256(text.encode('utf-8')).hexdigest(), texts)
+    results.append(_row('hash', n_docs, samples))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}', 'SCHEDULER_ENABLED': False})
+        with app.app_context():
+            db.create_all()
+            _populate(db_path, texts)
+
+            samples = []
+            for _ in range(3):
+                db.session.remove()
+                started = time.perf_counter()
+                documents = Document.query.all()
+                samples.append(time.perf_counter() - started)
+            results.append(_row('load_candidates', n_docs, samples))
+
+            compared = documents[:max_comparisons]
+            extrapolated = len(compared) < n_docs
+            query = query_texts[0]
+
+            samples = _time_each(lambda doc: document_api.get_traditional_similarity(query, doc.content), compared)
+            results.append(_row(
+                'tfidf_pairwise', n_docs, samples, extrapolated=extrapolated,
+                projected_scan_s=round(statistics.fmean(samples) * n_docs, 3)
+            ))
+
+            query_hash = hashlib.sha256(query.encode('utf-8')).hexdigest()
+            with _traditional_only():
+                samples = _time_each(
+                    lambda _: document_api.find_matches(query, query_hash, compared), range(1)
+                )
+            results.append(_row(
+                'scan_loop', n_docs, samples, compared=len(compared), extrapolated=extrapolated,
+                projected_scan_s=round(samples[0] / len(compared) * n_docs, 3)
+            ))
+
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+
+    fit_seconds, samples = _tfidf_batch(texts, query_texts)
+    results.append(_row('tfidf_batch', n_docs, samples, fit_s=round(fit_seconds, 3)))
+    return results
+
+
+def bench_parsing(samples, seed):
+    """Time DocumentParser.parse_file on each fixture format."""
+    texts = generate_corpus(samples, seed=seed).texts
+    results = []
+    for fmt in FORMATS:
+        uploads = [upload_file(text, fmt, f'doc{i}') for i, text in enumerate(texts)]
+        timings = _time_each(DocumentParser.parse_file, uploads)
+        results.append(_row(f'parse_{fmt}', None, timings))
+    return results
+
+
+def run(sizes, queries=5, max_comparisons=500, parse_samples=50, seed=42):
+    results = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': seed,
+            'max_comparisons': max_comparisons,
+            'started_at': datetime.now().isoformat()
+        },
+        'results': []
+    }
+    # Warm up sklearn so its import is not charged to the first size
+    document_api.get_traditional_similarity('warm up text', 'warm up text')
+
+    results['results'].extend(bench_parsing(parse_samples, seed))
+    for size in sizes:
+        results['results'].extend(bench_size(size, queries, max_comparisons, seed))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scan hot-path microbenchmarks')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='Comma-separated corpus sizes')
+    parser.add_argument('--queries', type=int, default=5, help='Queries scored by tfidf_batch')
+    parser.add_argument('--max-comparisons', type=int, default=500,
+                        help='Documents scored pairwise per size before extrapolating')
+    parser.add_argument('--parse-samples', type=int, default=50, help='Fixtures parsed per format')
+    parser.add_argument('--seed', type=int, default=42, help='Corpus seed')
+    parser.add_argument('--output', help='Write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    results = run(sizes, args.queries, args.max_comparisons, args.parse_samples, args.seed)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
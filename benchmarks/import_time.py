@@ -0,0 +1,172 @@
+"""
+Startup benchmark: import time per module and create_app() time, with budgets.
+
+Each module is imported in a fresh interpreter under `python -X importtime`,
+--repeat times, and the median cumulative time is compared with its budget.
+The heaviest imports each module pulled in are listed, so a regression points
+at its cause. Startup must also not load the dependencies that are deferred
+until first use (DEFERRED): scikit-learn, numpy, the PDF/DOCX parsers,
+requests, APScheduler and Alembic.
+
+create_app() is timed the same way, including the import of app, with the
+periodic job scheduler off and a temporary database.
+
+Exits with status 1 when a budget is exceeded or a deferred dependency is
+loaded, so it can run as a CI check. Budgets are milliseconds on a typical
+development machine; scale them for slower runners with --scale.
+
+Usage:
+    python -m benchmarks.import_time --repeat 5
+    python -m benchmarks.import_time --scale 2 --budget app=500
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Median cumulative import time allowed per module, in milliseconds
+BUDGETS = {
+    'app': 800,
+    'backend.api.document': 700,
+    'backend.api.admin': 700,
+    'backend.utils.document_parser': 50,
+    'database.models': 650,
+    'db_management': 800,
+    'create_admin': 800,
+    'create_app()': 1000
+}
+
+# Top-level packages that importing any of the modules above must not load
+DEFERRED = ('sklearn', 'numpy', 'scipy', 'pandas', 'PyPDF2', 'docx', 'requests', 'apscheduler', 'alembic')
+
+CREATE_APP_SCRIPT = """
+import os, sys, time
+started = time.perf_counter()
+from app import create_app
+create_app({{'SQLALCHEMY_DATABASE_URI': 'sqlite:///{db}', 'SCHEDULER_ENABLED': False}})
+print((time.perf_counter() - started) * 1000)
+print(' '.join(sorted({{name.split('.')[0] for name in sys.modules}})))
+"""
+
+IMPORT_SCRIPT = """
+import sys
+import {module}
+print(' '.join(sorted({{name.split('.')[0] for name in sys.modules}})))
+"""
+
+
+def _run(args):
+    env = dict(os.environ)
+    env.pop('FLASK_RUN_FROM_CLI', None)  # Measure a worker, not the flask command
+    result = subprocess.run([sys.executable] + args, cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(f"{' '.join(args[-1:])} failed:\n{result.stderr[-2000:]}")
+    return result
+
+
+def parse_importtime(stderr):
+    """Return [(depth, module, self ms, cumulative ms)] from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        rows.append((depth, name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return rows
+
+
+def measure_module(module):
+    """One fresh import: (cumulative ms, heaviest direct imports, top-level packages loaded)."""
+    result = _run(['-X', 'importtime', '-c', IMPORT_SCRIPT.format(module=module)])
+    rows = parse_importtime(result.stderr)
+    index = max(i for i, (depth, name, _, _) in enumerate(rows) if depth == 0 and name == module)
+    # A module's imports are listed just before it, one level deeper
+    children, start = [], index - 1
+    while start >= 0 and rows[start][0] > 0:
+        if rows[start][0] == 1:
+            children.append((rows[start][1], rows[start][3]))
+        start -= 1
+    return rows[index][3], children, set(result.stdout.split())
+
+
+def measure_create_app(db_path):
+    result = _run(['-c', CREATE_APP_SCRIPT.format(db=db_path)])
+    elapsed, packages = result.stdout.strip().split('\n', 1)
+    return float(elapsed), [], set(packages.split())
+
+
+def check(name, measure, repeat, budget, top):
+    timings, heaviest, loaded = [], [], set()
+    for _ in range(repeat):
+        elapsed, children, packages = measure()
+        timings.append(elapsed)
+        heaviest, loaded = children, loaded | packages
+    median = statistics.median(timings)
+    deferred_loaded = sorted(package for package in DEFERRED if package in loaded)
+    return {
+        'name': name,
+        'median_ms': round(median, 1),
+        'min_ms': round(min(timings), 1),
+        'budget_ms': budget,
+        'deferred_loaded': deferred_loaded,
+        'heaviest_imports': [
+            {'module': module, 'ms': round(ms, 1)}
+            for module, ms in sorted(heaviest, key=lambda item: -item[1])[:top]
+        ],
+        'ok': median <= budget and not deferred_loaded
+    }
+
+
+def run(args):
+    budgets = {name: budget * args.scale for name, budget in BUDGETS.items()}
+    for override in args.budget:
+        name, _, value = override.partition('=')
+        budgets[name] = float(value)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, budget in budgets.items():
+            if args.only and name not in args.only:
+                continue
+            if name == 'create_app()':
+                measure = lambda: measure_create_app(os.path.join(tmp, 'startup.db'))
+            else:
+                measure = lambda name=name: measure_module(name)
+            results.append(check(name, measure, args.repeat, budget, args.top))
+    return {'repeat': args.repeat, 'ok': all(result['ok'] for result in results), 'checks': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import-time benchmark with per-module budgets')
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters per module')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiply every default budget')
+    parser.add_argument('--budget', action='append', default=[], help='Override a budget: MODULE=MS')
+    parser.add_argument('--only', nargs='*', help='Measure only these modules (or create_app())')
+    parser.add_argument('--top', type=int, default=5, help='Heaviest imports listed per module')
+    parser.add_argument('--output', help='Write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    report = run(args)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + '\n')
+    else:
+        print(output)
+    for result in report['checks']:
+        if not result['ok']:
+            reason = f"loads {', '.join(result['deferred_loaded'])}" if result['deferred_loaded'] else 'over budget'
+            print(f"FAIL {result['name']}: {result['median_ms']} ms (budget {result['budget_ms']:g} ms), {reason}",
+                  file=sys.stderr)
+    sys.exit(0 if report['ok'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""
+HTTP load test for logins, uploads and match views.
+
+Each virtual user runs on its own thread with its own cookie session:
+log in (reading the CSRF token from the form like a browser), then
+repeatedly open the upload form, upload a document and open its matches
+page. Documents come from the synthetic corpus generator, with a share of
+near-duplicates so scans find matches. Every request is timed and the
+report gives throughput, error counts and p50/p95/p99 latency per
+operation as JSON.
+
+By default the app and a fake AI provider (benchmarks.fake_llm) are started
+in this process on a temporary database, so no real provider is called.
+Python threads share one interpreter there, so for production-like numbers
+run the app under its real server with MISTRAL_BASE_URL/OPENROUTER_BASE_URL
+pointing at `python -m benchmarks.fake_llm` and pass --base-url. Users are
+registered first either way (--skip-register if they already exist).
+
+Usage:
+    python -m benchmarks.load_test --users 20 --uploads 10 --latency lognormal:80:0.5
+    python -m benchmarks.load_test --base-url http://127.0.0.1:5001 --users 50
+"""
+
+import argparse
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .corpus import generate_corpus
+from .fake_llm import add_fake_llm_arguments, options_from_args, start_fake_llm
+
+CSRF_INPUT = re.compile(r'name="csrf_token" value="([^"]+)"')
+VIEW_LOCATION = re.compile(r'/document/view/(\d+)')
+
+PASSWORD = 'load-test-password'
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Recorder:
+    """Thread-safe store of (operation, status, seconds) samples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def request(self, session, operation, method, url, **kwargs):
+        kwargs.setdefault('allow_redirects', False)
+        kwargs.setdefault('timeout', 600)
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, **kwargs)
+            status = response.status_code
+        except requests.RequestException as e:
+            response, status = None, type(e).__name__
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.samples[operation].append(elapsed)
+            self.statuses[operation][status] += 1
+        return response
+
+    def report(self, elapsed):
+        operations = {}
+        for operation, samples in self.samples.items():
+            statuses = self.statuses[operation]
+            errors = sum(n for status, n in statuses.items() if not isinstance(status, int) or status >= 400)
+            operations[operation] = {
+                'requests': len(samples),
+                'errors': errors,
+                'statuses': {str(status): n for status, n in statuses.items()},
+                'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else None,
+                'p50_ms': round(_percentile(samples, 0.50) * 1000, 1),
+                'p95_ms': round(_percentile(samples, 0.95) * 1000, 1),
+                'p99_ms': round(_percentile(samples, 0.99) * 1000, 1),
+                'max_ms': round(max(samples) * 1000, 1)
+            }
+        total = sum(len(samples) for samples in self.samples.values())
+        return {
+            'elapsed_s': round(elapsed, 2),
+            'requests': total,
+            'throughput_rps': round(total / elapsed, 2) if elapsed else None,
+            'operations': operations
+        }
+
+
+def _csrf_token(response):
+    found = CSRF_INPUT.search(response.text) if response is not None else None
+    return found.group(1) if found else None
+
+
+def register_user(base_url, username):
+    session = requests.Session()
+    token = _csrf_token(session.get(f'{base_url}/auth/register', timeout=60))
+    session.post(f'{base_url}/auth/register', timeout=60, allow_redirects=False, data={
+        'csrf_token': token, 'username': username, 'email': f'{username}@example.com', 'password': PASSWORD
+    })
+
+
+def virtual_user(base_url, username, texts, recorder):
+    """Log in, then upload each text and view its matches."""
+    session = requests.Session()
+    page = recorder.request(session, 'login_form', 'GET', f'{base_url}/auth/login')
+    recorder.request(session, 'login', 'POST', f'{base_url}/auth/login', data={
+        'csrf_token': _csrf_token(page), 'username': username, 'password': PASSWORD
+    })
+
+    for index, text in enumerate(texts):
+        form = recorder.request(session, 'upload_form', 'GET', f'{base_url}/document/upload')
+        response = recorder.request(
+            session, 'upload', 'POST', f'{base_url}/document/upload',
+            data={'csrf_token': _csrf_token(form)},
+            files={'file': (f'{username}-{index}.txt', text.encode('utf-8'), 'text/plain')}
+        )
+        found = VIEW_LOCATION.search(response.headers.get('Location', '')) if response is not None else None
+        if found:
+            recorder.request(session, 'view_matches', 'GET', f'{base_url}/document/matches/{found.group(1)}')
+
+
+def run_load(base_url, users, uploads, seed, prefix='load', register=True):
+    """
+    Drive users concurrent virtual users against base_url.
+
+    Returns:
+        dict: Throughput and latency report
+    """
+    usernames = [f'{prefix}{i}' for i in range(users)]
+    if register:
+        with ThreadPoolExecutor(max_workers=min(users, 16)) as pool:
+            list(pool.map(lambda name: register_user(base_url, name), usernames))
+
+    corpus = generate_corpus(users * uploads, words_per_doc=(150, 400), near_duplicate_fraction=0.3, seed=seed)
+    recorder = Recorder()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        futures = [
+            pool.submit(virtual_user, base_url, name, corpus.texts[i * uploads:(i + 1) * uploads], recorder)
+            for i, name in enumerate(usernames)
+        ]
+        for future in futures:
+            future.result()
+    return recorder.report(time.perf_counter() - started)
+
+
+def _serve_app(app):
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='load-test-app', daemon=True).start()
+    return server
+
+
+def run_in_process(args):
+    """Start the app and the fake provider here, then run the load test against them."""
+    from app import create_app
+    from database.models import db, User
+    from backend.services.credit_service import CreditService
+
+    fake_llm = start_fake_llm(options_from_args(args))
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'load.db')}",
+            'SCHEDULER_ENABLED': False,
+            'MISTRAL_API_KEY': 'fake',
+            'OPENROUTER_API_KEY': 'fake',
+            'MISTRAL_BASE_URL': fake_llm.base_url,
+            'OPENROUTER_BASE_URL': fake_llm.base_url,
+            'PROFILE_DIR': os.path.join(tmp, 'profiles'),
+            'AI_RATE_LIMIT_STATE_PATH': os.path.join(tmp, 'rate_limits.sqlite')
+        })
+        with app.app_context():
+            db.create_all()
+
+        server = _serve_app(app)
+        base_url = f'http://127.0.0.1:{server.server_port}'
+        try:
+            usernames = [f'{args.prefix}{i}' for i in range(args.users)]
+            with ThreadPoolExecutor(max_workers=min(args.users, 16)) as pool:
+                list(pool.map(lambda name: register_user(base_url, name), usernames))
+            # Enough credits for every upload regardless of the daily allowance
+            with app.app_context():
+                for user in User.query.filter(User.username.in_(usernames)):
+                    CreditService.grant(user.id, args.uploads, reason='adjust')
+                db.session.commit()
+
+            report = run_load(base_url, args.users, args.uploads, args.seed, args.prefix, register=False)
+        finally:
+            server.shutdown()
+            fake_llm.shutdown()
+            with app.app_context():
+                for engine in db.engines.values():
+                    engine.dispose()
+
+    report['ai_provider'] = fake_llm.stats()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP load test for logins, uploads and match views')
+    parser.add_argument('--base-url', help='Test an already running app instead of starting one here')
+    parser.add_argument('--users', type=int, default=10, help='Concurrent virtual users')
+    parser.add_argument('--uploads', type=int, default=5, help='Uploads per virtual user')
+    parser.add_argument('--prefix', default='load', help='Username prefix for the virtual users')
+    parser.add_argument('--skip-register', action='store_true', help='With --base-url: users already exist')
+    parser.add_argument('--seed', type=int, default=42, help='Corpus seed')
+    parser.add_argument('--output', help='Write JSON here instead of stdout')
+    add_fake_llm_arguments(parser)
+    args = parser.parse_args()
+
+    if args.base_url:
+        report = run_load(args.base_url.rstrip('/'), args.users, args.uploads, args.seed,
+                          args.prefix, register=not args.skip_register)
+    else:
+        report = run_in_process(args)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+"""
+Recall-versus-cost benchmark for scan strategies.
+
+Builds a labelled corpus from sample_documents/ (long documents are split
+into sections) and optionally some synthetic sources, then derives from each
+source an excerpt and paraphrases (sentences reordered, words dropped or
+swapped for synonyms). Unrelated synthetic documents are added as
+distractors. Every derived document is uploaded as a query against all the
+others; its source and sibling derivatives are the labelled relevant set.
+
+Each strategy runs find_matches with the AI providers pointed at the fake
+provider (benchmarks.fake_llm), and is compared with the exhaustive pairwise
+baseline on:
+
+- recall@k: share of the baseline's top-k matches the strategy also returns
+- precision: share of the strategy's matches the baseline also returns
+- label recall/precision: the same against the known derivations
+- wall time and number of AI calls
+
+Strategies are 'exhaustive' and 'tfidf_prefilter' at each --top-k, i.e. the
+values SCAN_STRATEGY / SCAN_PREFILTER_TOP_K can take. --batch-size sets
+AI_BATCH_SIZE for every strategy (1 for one AI call per pair). --embeddings
+adds an exhaustive run with AI_SIMILARITY_MODE=embeddings; the corpus is
+embedded in bulk first and the calls that takes are reported separately.
+
+Usage:
+    python -m benchmarks.recall --distractors 200 --top-k 5,10,20,50
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import statistics
+import tempfile
+import time
+from types import SimpleNamespace
+
+from .corpus import generate_corpus
+from .fake_llm import add_fake_llm_arguments, options_from_args, start_fake_llm
+
+SAMPLE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sample_documents')
+
+# Small synonym table for paraphrases of the English sample documents
+SYNONYMS = {
+    'important': 'significant', 'change': 'shift', 'changing': 'shifting', 'global': 'worldwide',
+    'challenge': 'problem', 'requires': 'needs', 'immediate': 'urgent', 'technologies': 'tools',
+    'transforming': 'reshaping', 'sophisticated': 'advanced', 'impact': 'effect', 'daily': 'everyday',
+    'becoming': 'growing', 'algorithms': 'methods', 'rising': 'increasing', 'extreme': 'severe',
+    'document': 'paper', 'discusses': 'covers', 'work': 'labour', 'live': 'exist'
+}
+
+
+def _sentences(text):
+    return [part.strip() for part in re.split(r'(?<=[.!?])\s+', text) if part.strip()]
+
+
+def _sections(text, words_per_section):
+    words = text.split()
+    return [' '.join(words[start:start + words_per_section]) for start in range(0, len(words), words_per_section)]
+
+
+def load_sources(words_per_section=150, min_words=15, synthetic=20, seed=42):
+    """Return [(name, text)] from sample_documents/ plus synthetic sources."""
+    from werkzeug.datastructures import FileStorage
+    from backend.utils.document_parser import DocumentParser
+
+    sources = []
+    for filename in sorted(os.listdir(SAMPLE_DIR)):
+        with open(os.path.join(SAMPLE_DIR, filename), 'rb') as handle:
+            text = DocumentParser.parse_file(FileStorage(stream=handle, filename=filename))
+        for index, section in enumerate(_sections(' '.join(text.split()), words_per_section)):
+            if len(section.split()) >= min_words:
+                sources.append((f'{filename}#{index}', section))
+
+    generated = generate_corpus(synthetic, near_duplicate_fraction=0.0, seed=seed + 7)
+    sources.extend((f'synthetic{index}', text) for index, text in enumerate(generated.texts))
+    return sources
+
+
+def excerpt(text, rng, share=(0.4, 0.6)):
+    """A contiguous run of the source's words."""
+    words = text.split()
+    length = max(5, int(len(words) * rng.uniform(*share)))
+    start = rng.randrange(max(1, len(words) - length + 1))
+    return ' '.join(words[start:start + length])
+
+
+def paraphrase(text, rng, drop_rate=0.1):
+    """Reorder sentences, drop some words and swap known words for synonyms."""
+    sentences = _sentences(text) or [text]
+    rng.shuffle(sentences)
+    words = []
+    for word in ' '.join(sentences).split():
+        if rng.random() < drop_rate:
+            continue
+        bare = word.strip('.,;:!?').lower()
+        words.append(word.replace(bare, SYNONYMS[bare]) if bare in SYNONYMS else word)
+    return ' '.join(words)
+
+
+def build_corpus(sources, paraphrases=2, distractors=200, seed=42):
+    """
+    Derive labelled queries and assemble the searchable corpus.
+
+    Returns:
+        tuple: (documents, queries, relevant) where relevant maps a query's
+        document id to the ids of its source and sibling derivatives
+    """
+    rng = random.Random(seed)
+    documents, groups = [], []
+
+    def add(title, text):
+        doc = SimpleNamespace(
+            id=len(documents) + 1, title=title, content=text,
+            content_hash=hashlib.sha256(text.encode('utf-8')).hexdigest()
+        )
+        documents.append(doc)
+        return doc
+
+    for name, text in sources:
+        group = [add(name, text), add(f'{name} (excerpt)', excerpt(text, rng))]
+        group += [add(f'{name} (paraphrase {n + 1})', paraphrase(text, rng)) for n in range(paraphrases)]
+        groups.append(group)
+
+    for index, text in enumerate(generate_corpus(distractors, near_duplicate_fraction=0.0, seed=seed + 13).texts):
+        add(f'distractor{index}', text)
+
+    queries, relevant = [], {}
+    for group in groups:
+        ids = {doc.id for doc in group}
+        for doc in group[1:]:
+            queries.append(doc)
+            relevant[doc.id] = ids - {doc.id}
+    return documents, queries, relevant
+
+
+def _ranked(matches):
+    return [match['document'].id for match in sorted(matches, key=lambda m: (-m['similarity'], m['document'].id))]
+
+
+def embed_corpus(app, documents):
+    """Attach embeddings to every document, as the bulk backfill would store them."""
+    from backend.api.document import embed_texts
+
+    with app.app_context():
+        vectors = embed_texts([doc.content for doc in documents])
+        model = app.config['EMBEDDING_MODEL']
+    for doc, vector in zip(documents, vectors):
+        doc.embedding, doc.embedding_model = vector, model
+
+
+def run_strategy(app, fake_llm, strategy, top_k, documents, queries, embeddings=False):
+    """Scan every query with one strategy; returns per-query ranked ids, time and AI calls."""
+    from backend.api.document import embed_texts, find_matches
+
+    app.config.update(SCAN_STRATEGY=strategy, SCAN_PREFILTER_TOP_K=top_k)
+    calls_before = fake_llm.stats()['requests']
+    results, timings = {}, []
+    with app.app_context():
+        for query in queries:
+            others = [doc for doc in documents if doc.id != query.id]
+            started = time.perf_counter()
+            # An upload is embedded once, as in the upload view
+            embedding = embed_texts([query.content])[0] if embeddings else None
+            matches = find_matches(query.content, query.content_hash, others, embedding=embedding)
+            timings.append(time.perf_counter() - started)
+            results[query.id] = _ranked(matches)
+    return results, timings, fake_llm.stats()['requests'] - calls_before
+
+
+def _mean(values):
+    return round(statistics.fmean(values), 4) if values else None
+
+
+def score(results, baseline, relevant, k):
+    recall_at_k, precision, label_recall, label_precision = [], [], [], []
+    for query_id, ranked in results.items():
+        expected = baseline[query_id]
+        if expected:
+            top = set(expected[:k])
+            recall_at_k.append(len(top & set(ranked[:k])) / len(top))
+        if ranked:
+            precision.append(len(set(ranked) & set(expected)) / len(ranked))
+            label_precision.append(len(set(ranked) & relevant[query_id]) / len(ranked))
+        label_recall.append(len(set(ranked) & relevant[query_id]) / len(relevant[query_id]))
+    return {
+        f'recall_at_{k}': _mean(recall_at_k),
+        'precision': _mean(precision),
+        'label_recall': _mean(label_recall),
+        'label_precision': _mean(label_precision)
+    }
+
+
+def run(args):
+    from app import create_app
+
+    sources = load_sources(args.section_words, synthetic=args.synthetic_sources, seed=args.seed)
+    documents, queries, relevant = build_corpus(sources, args.paraphrases, args.distractors, args.seed)
+
+    fake_llm = start_fake_llm(options_from_args(args))
+    report = {
+        'corpus': {'sources': len(sources), 'documents': len(documents), 'queries': len(queries)},
+        'k': args.k,
+        'strategies': []
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'recall.db')}",
+            'SCHEDULER_ENABLED': False,
+            'MISTRAL_API_KEY': 'fake',
+            'OPENROUTER_API_KEY': 'fake',
+            'MISTRAL_BASE_URL': fake_llm.base_url,
+            'OPENROUTER_BASE_URL': fake_llm.base_url,
+            'AI_BATCH_SIZE': args.batch_size,
+            'EMBEDDING_SIMILARITY_FLOOR': args.embedding_floor,
+            'AI_RATE_LIMIT_STATE_PATH': os.path.join(tmp, 'rate_limits.sqlite')
+        })
+        strategies = [('exhaustive', 0, False)] + [('tfidf_prefilter', k, False) for k in args.top_k]
+        if args.embeddings:
+            calls_before = fake_llm.stats()['requests']
+            embed_corpus(app, documents)
+            report['embedding_backfill_calls'] = fake_llm.stats()['requests'] - calls_before
+            strategies.append(('exhaustive', 0, True))
+        baseline = None
+        for strategy, top_k, embeddings in strategies:
+            results, timings, ai_calls = run_strategy(app, fake_llm, strategy, top_k, documents, queries, embeddings)
+            if baseline is None:
+                baseline = results
+            name = strategy if strategy == 'exhaustive' else f'{strategy}@{top_k}'
+            row = {
+                'strategy': f'{name}+embeddings' if embeddings else name,
+                'wall_s': round(sum(timings), 3),
+                'p50_query_ms': round(statistics.median(timings) * 1000, 1),
+                'ai_calls': ai_calls,
+                'ai_calls_per_query': round(ai_calls / len(queries), 1)
+            }
+            row.update(score(results, baseline, relevant, args.k))
+            report['strategies'].append(row)
+    fake_llm.shutdown()
+    report['ai_provider'] = fake_llm.stats()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recall-versus-cost benchmark for scan strategies')
+    parser.add_argument('--top-k', default='5,10,20,50', help='Comma-separated SCAN_PREFILTER_TOP_K values')
+    parser.add_argument('--k', type=int, default=5, help='Cut-off for recall@k')
+    parser.add_argument('--distractors', type=int, default=200, help='Unrelated synthetic documents')
+    parser.add_argument('--synthetic-sources', type=int, default=20, help='Synthetic sources besides the samples')
+    parser.add_argument('--paraphrases', type=int, default=2, help='Paraphrases derived from each source')
+    parser.add_argument('--section-words', type=int, default=150, help='Words per section of long samples')
+    parser.add_argument('--batch-size', type=int, default=20, help='AI_BATCH_SIZE (1 scores pairs separately)')
+    parser.add_argument('--embeddings', action='store_true', help='Also run AI_SIMILARITY_MODE=embeddings')
+    parser.add_argument('--embedding-floor', type=float, default=0.0, help='EMBEDDING_SIMILARITY_FLOOR')
+    parser.add_argument('--seed', type=int, default=42, help='Corpus seed')
+    parser.add_argument('--output', help='Write JSON here instead of stdout')
+    add_fake_llm_arguments(parser)
+    args = parser.parse_args()
+    args.top_k = [int(k) for k in args.top_k.split(',') if k]
+
+    output = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""
+SQLite concurrency benchmark.
+
+Runs writer processes that mimic upload transactions (insert a document, a
+scan log and a handful of matches, then commit) alongside reader processes
+that run the admin aggregate queries. The same workload is run once with
+SQLite's default connection settings and once with the pragmas the
+application applies (see database/engine.py), and the results are printed
+side by side.
+
+Usage:
+    python -m benchmarks.sqlite_concurrency --writers 4 --readers 4 --seconds 10
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from config import Config
+from database.engine import sqlite_pragma_statements
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scan_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    document_id INTEGER NOT NULL,
+    similarity_score REAL,
+    created_at TIMESTAMP NOT NULL
+);
+CREATE TABLE IF NOT EXISTS document_matches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scan_id INTEGER NOT NULL,
+    source_document_id INTEGER NOT NULL,
+    matched_document_id INTEGER NOT NULL,
+    similarity_score REAL NOT NULL,
+    created_at TIMESTAMP NOT NULL
+);
+"""
+
+READER_QUERIES = [
+    "SELECT COUNT(*) FROM scan_logs",
+    "SELECT date(created_at), COUNT(*) FROM scan_logs GROUP BY date(created_at)",
+    "SELECT COUNT(*), AVG(similarity_score) FROM document_matches",
+]
+
+
+def _connect(db_path, tuned):
+    """Open a connection the way the application would (tuned) or with defaults."""
+    if tuned:
+        conn = sqlite3.connect(db_path, timeout=Config.SQLITE_BUSY_TIMEOUT_MS / 1000)
+        settings = {key: getattr(Config, key) for key in dir(Config) if key.startswith('SQLITE_')}
+        for statement in sqlite_pragma_statements(settings):
+            conn.execute(statement)
+    else:
+        # Python's default busy timeout is 5s; the journal mode is left as DELETE
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA journal_mode = DELETE")
+    return conn
+
+
+def _writer(db_path, tuned, deadline, result_queue):
+    conn = _connect(db_path, tuned)
+    latencies, errors = [], 0
+    payload = 'lorem ipsum ' * 200
+
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            now = time.strftime('%Y-%m-%d %H:%M:%S')
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO documents (user_id, title, content, created_at) VALUES (?, ?, ?, ?)",
+                (1, 'bench.txt', payload, now)
+            )
+            document_id = cursor.lastrowid
+            cursor.execute(
+                "INSERT INTO scan_logs (user_id, document_id, similarity_score, created_at) VALUES (?, ?, ?, ?)",
+                (1, document_id, 0.8, now)
+            )
+            scan_id = cursor.lastrowid
+            cursor.executemany(
+                "INSERT INTO document_matches (scan_id, source_document_id, matched_document_id, similarity_score, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(scan_id, document_id, max(document_id - i, 1), 0.6, now) for i in range(1, 6)]
+            )
+            conn.commit()
+            latencies.append(time.perf_counter() - started)
+        except sqlite3.OperationalError:
+            conn.rollback()
+            errors += 1
+
+    conn.close()
+    result_queue.put(('write', latencies, errors))
+
+
+def _reader(db_path, tuned, deadline, result_queue):
+    conn = _connect(db_path, tuned)
+    latencies, errors = [], 0
+
+    while time.time() < deadline:
+        for query in READER_QUERIES:
+            started = time.perf_counter()
+            try:
+                conn.execute(query).fetchall()
+                latencies.append(time.perf_counter() - started)
+            except sqlite3.OperationalError:
+                errors += 1
+
+    conn.close()
+    result_queue.put(('read', latencies, errors))
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_workload(tuned, writers, readers, seconds):
+    """
+    Run one benchmark pass against a fresh database.
+
+    Returns:
+        dict: Throughput, latency percentiles and lock errors per operation type
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        conn = _connect(db_path, tuned)
+        conn.executescript(SCHEMA)
+        conn.commit()
+        conn.close()
+
+        queue = multiprocessing.Queue()
+        deadline = time.time() + seconds
+        processes = [
+            multiprocessing.Process(target=_writer, args=(db_path, tuned, deadline, queue))
+            for _ in range(writers)
+        ] + [
+            multiprocessing.Process(target=_reader, args=(db_path, tuned, deadline, queue))
+            for _ in range(readers)
+        ]
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    summary = {}
+    for kind in ('write', 'read'):
+        latencies = [lat for k, lats, _ in results if k == kind for lat in lats]
+        errors = sum(err for k, _, err in results if k == kind)
+        summary[kind] = {
+            'ops': len(latencies),
+            'ops_per_sec': round(len(latencies) / seconds, 1),
+            'p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(_percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(_percentile(latencies, 99) * 1000, 2),
+            'lock_errors': errors
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite concurrency benchmark')
+    parser.add_argument('--writers', type=int, default=4, help='Concurrent writer processes')
+    parser.add_argument('--readers', type=int, default=4, help='Concurrent reader processes')
+    parser.add_argument('--seconds', type=float, default=10, help='Duration of each pass')
+    parser.add_argument('--json', action='store_true', help='Print machine-readable results')
+    args = parser.parse_args()
+
+    results = {
+        'default': run_workload(False, args.writers, args.readers, args.seconds),
+        'tuned': run_workload(True, args.writers, args.readers, args.seconds)
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'mode':<8} {'op':<6} {'ops/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'locked':>7}")
+    for mode, summary in results.items():
+        for kind, row in summary.items():
+            print(f"{mode:<8} {kind:<6} {row['ops_per_sec']:>8} {row['p50_ms']:>8} "
+                  f"{row['p95_ms']:>8} {row['p99_ms']:>8} {row['lock_errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -13,10 +13,118 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-here')  # Change this in production
     
+    # Connection pool settings for file and server databases (shared by the primary
+    # and reporting engines; in-memory SQLite uses a single static connection)
+    DB_POOL_OPTIONS = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800))
+    }
+    
+    # SQLite tuning, applied to every new connection (see database/engine.py)
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 65536))
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 268435456))  # 256MB
+    SQLITE_TEMP_STORE = os.getenv('SQLITE_TEMP_STORE', 'MEMORY')
+    
+    # Route admin reporting queries through a separate read-only connection
+    SQLITE_READONLY_REPORTING = os.getenv('SQLITE_READONLY_REPORTING', 'true').lower() == 'true'
+    
     # API Keys
     OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
     OPENROUTER_MODEL = os.getenv('OPENROUTER_MODEL', 'deepseek/deepseek-r1-distill-llama-70b:free')
     MISTRAL_API_KEY = os.getenv('MISTRAL_API_KEY')
     
+    # Provider endpoints (point both at benchmarks/fake_llm.py for load tests)
+    OPENROUTER_BASE_URL = os.getenv('OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1')
+    MISTRAL_BASE_URL = os.getenv('MISTRAL_BASE_URL', 'https://api.mistral.ai/v1')
+    
+    # Credit system
+    DAILY_FREE_CREDITS = int(os.getenv('DAILY_FREE_CREDITS', 20))
+    CREDIT_RESET_SWEEP_HOURS = float(os.getenv('CREDIT_RESET_SWEEP_HOURS', 1))  # 0 disables the sweep
+    
+    # Periodic jobs run in one process, elected through a lease in SCHEDULER_LEASE_PATH;
+    # a dead leader is replaced within SCHEDULER_LEASE_SECONDS (keep it over twice the renew interval)
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'true').lower() == 'true'
+    SCHEDULER_LEASE_SECONDS = float(os.getenv('SCHEDULER_LEASE_SECONDS', 30))
+    SCHEDULER_RENEW_SECONDS = float(os.getenv('SCHEDULER_RENEW_SECONDS', 10))
+    SCHEDULER_LEASE_PATH = os.getenv('SCHEDULER_LEASE_PATH', '')  # default: instance/scheduler.sqlite
+    
+    # AI provider routing: order of preference, circuit breaker and hedging
+    AI_PROVIDERS = os.getenv('AI_PROVIDERS', 'mistral,openrouter')
+    AI_LATENCY_ROUTING = os.getenv('AI_LATENCY_ROUTING', 'true').lower() == 'true'  # fastest healthy provider first
+    AI_PROVIDER_WINDOW = int(os.getenv('AI_PROVIDER_WINDOW', 20))  # recent calls kept per provider
+    AI_CIRCUIT_FAILURE_RATE = float(os.getenv('AI_CIRCUIT_FAILURE_RATE', 0.5))
+    AI_CIRCUIT_MIN_CALLS = int(os.getenv('AI_CIRCUIT_MIN_CALLS', 5))
+    AI_CIRCUIT_COOLDOWN = float(os.getenv('AI_CIRCUIT_COOLDOWN', 30))  # seconds before a trial call
+    AI_HEDGE_ENABLED = os.getenv('AI_HEDGE_ENABLED', 'true').lower() == 'true'
+    AI_HEDGE_MIN_DELAY_MS = int(os.getenv('AI_HEDGE_MIN_DELAY_MS', 250))  # floor for the p95 hedge delay
+    AI_HEDGE_DEFAULT_DELAY_MS = int(os.getenv('AI_HEDGE_DEFAULT_DELAY_MS', 2000))  # until p95 is known
+    
+    # Provider quotas shared by all workers (0 = no limit); 429 Retry-After pauses always apply
+    MISTRAL_REQUESTS_PER_MINUTE = int(os.getenv('MISTRAL_REQUESTS_PER_MINUTE', 0))
+    MISTRAL_TOKENS_PER_MINUTE = int(os.getenv('MISTRAL_TOKENS_PER_MINUTE', 0))
+    OPENROUTER_REQUESTS_PER_MINUTE = int(os.getenv('OPENROUTER_REQUESTS_PER_MINUTE', 0))
+    OPENROUTER_TOKENS_PER_MINUTE = int(os.getenv('OPENROUTER_TOKENS_PER_MINUTE', 0))
+    AI_RATE_LIMIT_HEADROOM = float(os.getenv('AI_RATE_LIMIT_HEADROOM', 0.9))  # share of each quota to use
+    AI_RATE_LIMIT_BURST_SECONDS = float(os.getenv('AI_RATE_LIMIT_BURST_SECONDS', 10))
+    AI_RATE_LIMIT_MAX_WAIT = float(os.getenv('AI_RATE_LIMIT_MAX_WAIT', 30))  # seconds a call may queue
+    AI_RETRY_AFTER_DEFAULT = float(os.getenv('AI_RETRY_AFTER_DEFAULT', 5))  # pause after a 429 without Retry-After
+    AI_RATE_LIMIT_STATE_PATH = os.getenv('AI_RATE_LIMIT_STATE_PATH', '')  # default: instance/rate_limits.sqlite
+    
+    # Documents scored per AI call (1 scores each pair separately)
+    AI_BATCH_SIZE = int(os.getenv('AI_BATCH_SIZE', 20))
+    AI_BATCH_EXCERPT_CHARS = int(os.getenv('AI_BATCH_EXCERPT_CHARS', 1000))  # per candidate in a batch prompt
+    
+    # 'chat' asks a chat model to score pairs; 'embeddings' embeds each upload once and
+    # scores it by cosine against stored document embeddings (backfill: db_management.py embed)
+    AI_SIMILARITY_MODE = os.getenv('AI_SIMILARITY_MODE', 'chat')
+    EMBEDDING_PROVIDER = os.getenv('EMBEDDING_PROVIDER', 'mistral')
+    EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'mistral-embed')
+    EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 32))  # texts per embeddings call
+    EMBEDDING_MAX_CHARS = int(os.getenv('EMBEDDING_MAX_CHARS', 8000))  # longer texts are truncated
+    EMBEDDING_SIMILARITY_FLOOR = float(os.getenv('EMBEDDING_SIMILARITY_FLOOR', 0.0))  # cosine that maps to 0
+    
+    # Import scikit-learn and the file parsers at startup instead of on the first
+    # upload; enable it for the workers that serve scans
+    SCAN_PREWARM = os.getenv('SCAN_PREWARM', 'false').lower() == 'true'
+    
+    # Which documents an upload is scored against: 'exhaustive' (all) or
+    # 'tfidf_prefilter' (the SCAN_PREFILTER_TOP_K closest by TF-IDF; see benchmarks/recall.py)
+    SCAN_STRATEGY = os.getenv('SCAN_STRATEGY', 'exhaustive')
+    SCAN_PREFILTER_TOP_K = int(os.getenv('SCAN_PREFILTER_TOP_K', 20))
+    
+    # Admin view cache (entries also expire when their data is written)
+    VIEW_CACHE_TTL = int(os.getenv('VIEW_CACHE_TTL', 30))  # seconds, 0 disables
+    VIEW_CACHE_MAX_ENTRIES = int(os.getenv('VIEW_CACHE_MAX_ENTRIES', 128))
+    
+    # Authenticated user snapshots (also dropped when the user is written)
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 5))  # seconds, 0 disables
+    USER_CACHE_MAX_ENTRIES = int(os.getenv('USER_CACHE_MAX_ENTRIES', 1024))
+    
+    # Bearer token for scraping /metrics (empty: only signed-in admins can read it)
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    
+    # Rows fetched per batch when streaming admin exports
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+    
     # Upload folder
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+    
+    # On-demand request profiler (enabled from the admin panel)
+    PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles'))
+    PROFILER_INTERVAL_MS = float(os.getenv('PROFILER_INTERVAL_MS', 5))  # stack sampling period
+    PROFILER_MAX_FILES = int(os.getenv('PROFILER_MAX_FILES', 50))  # oldest profiles are deleted
+    
+    # SQL profiler (per-request query counts, slow-query and N+1 warnings)
+    SQL_PROFILER_ENABLED = os.getenv('SQL_PROFILER_ENABLED', 'true').lower() == 'true'
+    SQL_SLOW_QUERY_MS = float(os.getenv('SQL_SLOW_QUERY_MS', 100))
+    SQL_NPLUS1_THRESHOLD = int(os.getenv('SQL_NPLUS1_THRESHOLD', 10))  # repeats of one statement
+    
+    # Memory diagnostics (tracemalloc is only started from the admin panel)
+    MEMORY_TRACE_FRAMES = int(os.getenv('MEMORY_TRACE_FRAMES', 10))
+    MEMORY_TOP_N = int(os.getenv('MEMORY_TOP_N', 20))  # allocation sites per report
+    MEMORY_HISTORY = int(os.getenv('MEMORY_HISTORY', 50))  # request records kept per worker
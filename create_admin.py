@@ -2,7 +2,7 @@ from app import create_app
 from database.models import db, User
 
 def create_admin_user():
-    app = create_app()
+    app = create_app({'SCHEDULER_ENABLED': False})
     with app.app_context():
         admin = User.query.filter_by(username='admin').first()
         if not admin:
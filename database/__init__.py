@@ -1,3 +1,3 @@
-from .models import db, User, Document, CreditRequest, ScanLog, DocumentMatch
+from .models import db, User, Document, CreditRequest, ScanLog, DocumentMatch, DailyStat, GlobalCounter, CreditLedger
 
-__all__ = ['db', 'User', 'Document', 'CreditRequest', 'ScanLog', 'DocumentMatch']
+__all__ = ['db', 'User', 'Document', 'CreditRequest', 'ScanLog', 'DocumentMatch', 'DailyStat', 'GlobalCounter', 'CreditLedger']
@@ -0,0 +1,143 @@
+"""
+Database Engine Configuration for Document Scanner Application
+
+This module tunes the SQLAlchemy engines used by the application:
+
+- Applies SQLite pragmas (WAL journal, synchronous level, busy timeout, page
+  cache, mmap and temp store) to every new connection
+- Registers a read-only 'reporting' bind so admin analytics and exports do not
+  compete with uploads for the write lock
+- Provides a session factory for reporting queries
+"""
+
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .models import db
+
+REPORTING_BIND = 'reporting'
+
+
+def is_sqlite_uri(uri):
+    """Return True if the database URI points at a SQLite database."""
+    return uri.startswith('sqlite:')
+
+
+def is_memory_uri(uri):
+    """Return True if the URI is an in-memory SQLite database (no connection pool)."""
+    return uri in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in uri
+
+
+def sqlite_readonly_uri(uri):
+    """
+    Build a read-only URI for the same SQLite file.
+
+    Args:
+        uri (str): Primary SQLite URI (sqlite:///path/to/file.db)
+
+    Returns:
+        str: URI opening the file with mode=ro, or None for in-memory databases
+    """
+    if is_memory_uri(uri):
+        return None
+    path = uri.replace('sqlite:///', '', 1)
+    return f'sqlite:///file:{path}?mode=ro&uri=true'
+
+
+def sqlite_pragma_statements(config, read_only=False):
+    """
+    Build the PRAGMA statements to run on each new SQLite connection.
+
+    Args:
+        config (Mapping): Application config (Flask config or Config attributes)
+        read_only (bool): Skip pragmas that need write access
+
+    Returns:
+        list: PRAGMA statements in execution order
+    """
+    statements = [f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}"]
+
+    if read_only:
+        statements.append("PRAGMA query_only = ON")
+    else:
+        # journal_mode is persistent in the file, but setting it is cheap and
+        # makes a fresh database pick up WAL on first connect
+        statements.append(f"PRAGMA journal_mode = {config['SQLITE_JOURNAL_MODE']}")
+
+    statements.extend([
+        f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}",
+        # Negative cache_size is in KiB rather than pages
+        f"PRAGMA cache_size = -{int(config['SQLITE_CACHE_SIZE_KB'])}",
+        f"PRAGMA mmap_size = {int(config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA temp_store = {config['SQLITE_TEMP_STORE']}"
+    ])
+    return statements
+
+
+def configure_engines(app):
+    """
+    Prepare engine configuration before db.init_app is called.
+
+    Applies DB_POOL_OPTIONS to file and server databases (an in-memory SQLite
+    engine uses StaticPool, which rejects them), without overriding options
+    set in SQLALCHEMY_ENGINE_OPTIONS. Adds the read-only reporting bind, with
+    the same pool options, for SQLite databases unless one is already
+    configured or SQLITE_READONLY_REPORTING is disabled.
+    """
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    pool_options = {}
+    if not is_memory_uri(uri):
+        pool_options = dict(app.config.get('DB_POOL_OPTIONS') or {})
+        options = dict(pool_options)
+        options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+    if not is_sqlite_uri(uri) or not app.config.get('SQLITE_READONLY_REPORTING', True):
+        return
+
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    readonly_uri = sqlite_readonly_uri(uri)
+    if readonly_uri and REPORTING_BIND not in binds:
+        # Binds given as a plain URI do not get SQLALCHEMY_ENGINE_OPTIONS
+        binds[REPORTING_BIND] = dict(pool_options, url=readonly_uri)
+        app.config['SQLALCHEMY_BINDS'] = binds
+
+
+def register_sqlite_pragmas(app):
+    """Install connect listeners that apply the SQLite pragmas on every engine."""
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            if engine.dialect.name != 'sqlite':
+                continue
+
+            statements = sqlite_pragma_statements(
+                app.config, read_only=bind_key == REPORTING_BIND
+            )
+
+            def apply_pragmas(dbapi_connection, connection_record, statements=statements):
+                cursor = dbapi_connection.cursor()
+                try:
+                    for statement in statements:
+                        cursor.execute(statement)
+                finally:
+                    cursor.close()
+
+            event.listen(engine, 'connect', apply_pragmas)
+
+
+@contextmanager
+def reporting_session():
+    """
+    Yield a session for read-only reporting queries.
+
+    Uses the read-only SQLite connection when it is configured, otherwise the
+    primary engine. Only use it for scalar and row queries; ORM objects loaded
+    here are detached once the block exits.
+    """
+    engine = db.engines.get(REPORTING_BIND, db.engine)
+    session = Session(bind=engine)
+    try:
+        yield session
+    finally:
+        session.close()
@@ -5,11 +5,11 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  
 
 from app import create_app
-from database.models import db, User, Document, CreditRequest, ScanLog, DocumentMatch
+from database.models import db, User, Document, CreditRequest, ScanLog, DocumentMatch, DailyStat, GlobalCounter
 from werkzeug.security import generate_password_hash
 
 def init_db():
-    app = create_app()
+    app = create_app({'SCHEDULER_ENABLED': False})
     with app.app_context():
         # Create all tables
         db.create_all()
@@ -34,6 +34,8 @@ def init_db():
                 password_hash=generate_password_hash('test123')
             )
             db.session.add(test_user)
+            DailyStat.record(registrations=1)
+            GlobalCounter.increment(users=1)
             
             db.session.commit()
             print("Database initialized with admin and test users.")
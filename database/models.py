@@ -9,6 +9,9 @@ Document Scanner application. The models include:
 - CreditRequest: Handles credit request workflow
 - ScanLog: Tracks document scanning activity
 - DocumentMatch: Records similarity matches between documents
+- DailyStat: Per-day activity rollup for the admin dashboard
+- GlobalCounter: Running totals for the admin dashboard
+- CreditLedger: Append-only record of every credit balance change
 
 Each model includes relationships, utility methods, and serialization support.
 
@@ -23,6 +26,14 @@ import json
 
 db = SQLAlchemy()
 
+def _upsert_insert(table):
+    """Return a dialect-specific INSERT that supports ON CONFLICT DO UPDATE."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
 class User(db.Model):
     """
     User model for authentication and credit management.
@@ -39,7 +50,7 @@ class User(db.Model):
     password_hash = db.Column(db.String(128), nullable=False)
     
     # User role and status
-    role = db.Column(db.String(20), default='user')  # 'user' or 'admin'
+    role = db.Column(db.String(20), default='user', index=True)  # 'user' or 'admin'
     is_active = db.Column(db.Boolean, default=True)
     
     # Credit management
@@ -106,8 +117,10 @@ class Document(db.Model):
     content = db.Column(db.Text, nullable=False)
     
     # Document metadata
-    content_hash = db.Column(db.String(64))  # SHA-256 hash for duplicate detection
+    content_hash = db.Column(db.String(64), index=True)  # SHA-256 hash for duplicate detection
     content_vector = db.Column(db.Text)      # TF-IDF vector for similarity
+    embedding = db.Column(db.LargeBinary)    # Normalised float32 embedding (AI_SIMILARITY_MODE=embeddings)
+    embedding_model = db.Column(db.String(100))  # Model that produced the embedding
     file_type = db.Column(db.String(10), default='txt')
     file_size = db.Column(db.Integer, default=0)
     word_count = db.Column(db.Integer)
@@ -115,9 +128,14 @@ class Document(db.Model):
     
     # Ownership and timestamps
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.now)
+    created_at = db.Column(db.DateTime, default=datetime.now, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
     
+    # Per-user listings filter on user_id and sort by created_at
+    __table_args__ = (
+        db.Index('ix_documents_user_id_created_at', 'user_id', 'created_at'),
+    )
+    
     # Relationships for document matching
     matches_as_source = db.relationship('DocumentMatch', 
                                       foreign_keys='DocumentMatch.source_document_id',
@@ -200,7 +218,7 @@ class CreditRequest(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     amount = db.Column(db.Integer, nullable=False)
     reason = db.Column(db.Text)
-    status = db.Column(db.String(20), default='pending')  # pending/approved/denied
+    status = db.Column(db.String(20), default='pending', index=True)  # pending/approved/denied
     
     # Admin approval
     admin_id = db.Column(db.Integer, db.ForeignKey('users.id'))
@@ -209,6 +227,11 @@ class CreditRequest(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
     
+    # Per-user listings filter on user_id and sort by created_at
+    __table_args__ = (
+        db.Index('ix_credit_requests_user_id_created_at', 'user_id', 'created_at'),
+    )
+    
     # Relationship to admin user
     admin = db.relationship('User', foreign_keys=[admin_id], backref='approved_requests')
     
@@ -245,7 +268,13 @@ class ScanLog(db.Model):
     scan_metadata = db.Column(db.Text)  # JSON with scan settings
     matched_documents = db.Column(db.Text)  # JSON list of matches
     similarity_score = db.Column(db.Float)
-    created_at = db.Column(db.DateTime, default=datetime.now)
+    match_count = db.Column(db.Integer, nullable=False, default=0)  # Set when the scan is written
+    created_at = db.Column(db.DateTime, default=datetime.now, index=True)
+    
+    # Per-user history filters on user_id and sorts by created_at
+    __table_args__ = (
+        db.Index('ix_scan_logs_user_id_created_at', 'user_id', 'created_at'),
+    )
     
     # Relationships
     document = db.relationship('Document', backref='scans')
@@ -263,7 +292,7 @@ class ScanLog(db.Model):
             'scan_metadata': json.loads(self.scan_metadata) if self.scan_metadata else None,
             'matched_documents': json.loads(self.matched_documents) if self.matched_documents else [],
             'similarity_score': self.similarity_score,
-            'matches_count': self.matches.count(),
+            'matches_count': self.match_count,
             'created_at': self.created_at.isoformat()
         }
 
@@ -279,9 +308,9 @@ class DocumentMatch(db.Model):
     
     # Match identification
     id = db.Column(db.Integer, primary_key=True)
-    scan_id = db.Column(db.Integer, db.ForeignKey('scan_logs.id'), nullable=False)
+    scan_id = db.Column(db.Integer, db.ForeignKey('scan_logs.id'), nullable=False, index=True)
     source_document_id = db.Column(db.Integer, db.ForeignKey('documents.id'), nullable=False)
-    matched_document_id = db.Column(db.Integer, db.ForeignKey('documents.id'), nullable=False)
+    matched_document_id = db.Column(db.Integer, db.ForeignKey('documents.id'), nullable=False, index=True)
     
     # Similarity scores
     similarity_score = db.Column(db.Float, nullable=False)  # Overall score
@@ -293,10 +322,11 @@ class DocumentMatch(db.Model):
     match_details = db.Column(db.Text)  # JSON with match details
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.now)
+    created_at = db.Column(db.DateTime, default=datetime.now, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
     
-    # Prevent duplicate matches
+    # Prevent duplicate matches (the constraint's index also serves
+    # lookups by source_document_id)
     __table_args__ = (
         db.UniqueConstraint('source_document_id', 'matched_document_id',
                            name='unique_document_match'),
@@ -341,7 +371,7 @@ class DocumentMatch(db.Model):
                     ai_similarity_score=ai_score,
                     traditional_similarity_score=traditional_score,
                     match_details=json.dumps(details) if details else None,
-                    match_type='exact' if similarity_score >= 0.95 else 'high' if similarity_score >= 0.7 else 'medium' if similarity_score >= 0.5 else 'low'
+                    match_type=cls.match_type_for(similarity_score)
                 )
             
             return match
@@ -350,6 +380,67 @@ class DocumentMatch(db.Model):
             current_app.logger.error(f"Error creating/updating document match: {str(e)}")
             raise
     
+    @staticmethod
+    def match_type_for(similarity_score):
+        """Classify a similarity score as exact/high/medium/low."""
+        if similarity_score >= 0.95:
+            return 'exact'
+        if similarity_score >= 0.7:
+            return 'high'
+        if similarity_score >= 0.5:
+            return 'medium'
+        return 'low'
+    
+    @classmethod
+    def bulk_upsert(cls, scan_id, source_id, matches, chunk_size=500):
+        """
+        Insert or update many matches with INSERT ... ON CONFLICT DO UPDATE.
+        
+        The statements run on the current session without committing, so the
+        caller can write the matches in the same transaction as the scan log.
+        
+        Args:
+            scan_id (int): ID of the scan that produced the matches
+            source_id (int): ID of the source document
+            matches (list): Dicts with 'document_id', 'similarity', 'ai_score',
+                'trad_score' and 'details' keys
+            chunk_size (int): Rows per statement, keeps SQLite under its
+                bound-parameter limit
+            
+        Returns:
+            int: Number of rows written
+        """
+        if not matches:
+            return 0
+        
+        now = datetime.now()
+        rows = [{
+            'scan_id': scan_id,
+            'source_document_id': source_id,
+            'matched_document_id': match['document_id'],
+            'similarity_score': match['similarity'],
+            'ai_similarity_score': match.get('ai_score'),
+            'traditional_similarity_score': match.get('trad_score'),
+            'match_type': cls.match_type_for(match['similarity']),
+            'match_details': json.dumps(match['details']) if match.get('details') else None,
+            'created_at': now,
+            'updated_at': now
+        } for match in matches]
+        
+        updated_columns = (
+            'scan_id', 'similarity_score', 'ai_similarity_score',
+            'traditional_similarity_score', 'match_type', 'match_details', 'updated_at'
+        )
+        for start in range(0, len(rows), chunk_size):
+            stmt = _upsert_insert(cls.__table__).values(rows[start:start + chunk_size])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['source_document_id', 'matched_document_id'],
+                set_={column: stmt.excluded[column] for column in updated_columns}
+            )
+            db.session.execute(stmt)
+        
+        return len(rows)
+    
     def to_dict(self):
         """Convert match to dictionary for API responses."""
         return {
@@ -365,3 +456,221 @@ class DocumentMatch(db.Model):
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
+
+
+class CreditLedger(db.Model):
+    """
+    Append-only ledger of credit balance changes.
+    
+    Every debit, refund, grant, adjustment and daily reset writes one row in
+    the same transaction as the balance update (see CreditService). Rows are
+    never updated or deleted.
+    """
+    __tablename__ = 'credit_ledger'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    delta = db.Column(db.Integer, nullable=False)  # Positive for credits added
+    reason = db.Column(db.String(30), nullable=False)  # scan/scan_refund/grant/adjust/daily_reset
+    reference_id = db.Column(db.Integer)  # Document or credit request ID, if any
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    
+    # Per-user history filters on user_id and sorts by created_at
+    __table_args__ = (
+        db.Index('ix_credit_ledger_user_id_created_at', 'user_id', 'created_at'),
+    )
+    
+    def to_dict(self):
+        """Convert ledger entry to dictionary for API responses."""
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'delta': self.delta,
+            'reason': self.reason,
+            'reference_id': self.reference_id,
+            'created_at': self.created_at.isoformat()
+        }
+
+
+class DailyStat(db.Model):
+    """
+    Daily activity rollup for the admin dashboard.
+    
+    Each row summarizes one day. Rows are updated by DailyStat.record in the
+    same transaction as the write being counted, so the dashboard reads a
+    handful of rows instead of scanning the activity tables.
+    """
+    __tablename__ = 'daily_stats'
+    
+    day = db.Column(db.Date, primary_key=True)
+    
+    # Activity counts
+    scans = db.Column(db.Integer, nullable=False, default=0)
+    uploads = db.Column(db.Integer, nullable=False, default=0)
+    matches = db.Column(db.Integer, nullable=False, default=0)
+    registrations = db.Column(db.Integer, nullable=False, default=0)
+    credit_requests = db.Column(db.Integer, nullable=False, default=0)
+    credits_used = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Sum and count of AI similarity scores, for the daily average
+    similarity_sum = db.Column(db.Float, nullable=False, default=0)
+    similarity_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    COUNTERS = (
+        'scans', 'uploads', 'matches', 'registrations', 'credit_requests',
+        'credits_used', 'similarity_sum', 'similarity_count'
+    )
+    
+    @property
+    def avg_similarity(self):
+        """Average AI similarity of the day's matches."""
+        return self.similarity_sum / self.similarity_count if self.similarity_count else 0.0
+    
+    @classmethod
+    def record(cls, day=None, **deltas):
+        """
+        Add deltas to a day's counters without committing.
+        
+        Args:
+            day (date, optional): Day to update, defaults to today
+            **deltas: Counter name to amount, e.g. scans=1, matches=3
+        """
+        deltas = {name: value for name, value in deltas.items() if value}
+        if not deltas:
+            return
+        unknown = set(deltas) - set(cls.COUNTERS)
+        if unknown:
+            raise ValueError(f"Unknown daily stat counters: {', '.join(sorted(unknown))}")
+        
+        row = {name: 0 for name in cls.COUNTERS}
+        row.update(deltas)
+        row['day'] = day or datetime.now().date()
+        
+        table = cls.__table__
+        stmt = _upsert_insert(table).values(row)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['day'],
+            set_={name: table.c[name] + stmt.excluded[name] for name in deltas}
+        )
+        db.session.execute(stmt)
+    
+    @classmethod
+    def rebuild(cls):
+        """
+        Recompute every row from the activity tables, repairing any drift.
+        
+        Runs on the current session without committing.
+        """
+        from sqlalchemy import func
+        
+        rows = {}
+        
+        def add(model, counter, value=None, *filters):
+            day = func.date(model.created_at)
+            value = func.count(model.id) if value is None else value
+            query = db.session.query(day, value).filter(model.created_at.isnot(None), *filters)
+            for row_day, amount in query.group_by(day).all():
+                if row_day is None or not amount:
+                    continue
+                key = datetime.strptime(str(row_day), '%Y-%m-%d').date()
+                rows.setdefault(key, {name: 0 for name in cls.COUNTERS})[counter] += amount
+        
+        add(ScanLog, 'scans')
+        add(Document, 'uploads')
+        add(Document, 'credits_used')  # Each stored upload nets one credit; failed scans are refunded
+        add(DocumentMatch, 'matches')
+        add(DocumentMatch, 'similarity_sum', func.sum(DocumentMatch.ai_similarity_score))
+        add(DocumentMatch, 'similarity_count', func.count(DocumentMatch.ai_similarity_score))
+        add(User, 'registrations', None, User.role == 'user')
+        add(CreditRequest, 'credit_requests')
+        
+        db.session.query(cls).delete()
+        if rows:
+            db.session.execute(cls.__table__.insert(), [
+                {'day': day, **counters} for day, counters in rows.items()
+            ])
+        return len(rows)
+    
+    def to_dict(self):
+        """Convert the day's rollup to a dictionary for API responses."""
+        return {
+            'date': self.day.isoformat(),
+            'scans': self.scans,
+            'uploads': self.uploads,
+            'matches': self.matches,
+            'registrations': self.registrations,
+            'credit_requests': self.credit_requests,
+            'credits_used': self.credits_used,
+            'avg_similarity': self.avg_similarity
+        }
+
+
+class GlobalCounter(db.Model):
+    """
+    Named running totals (users, documents, scans, matches, pending requests).
+    
+    Updated in the same transaction as the writes they count, so the dashboard
+    does not need COUNT(*) over whole tables.
+    """
+    __tablename__ = 'global_counters'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    
+    NAMES = ('users', 'documents', 'scans', 'matches', 'pending_requests')
+    
+    @classmethod
+    def increment(cls, **deltas):
+        """
+        Add deltas to named counters without committing.
+        
+        Args:
+            **deltas: Counter name to amount, e.g. documents=1, pending_requests=-1
+        """
+        deltas = {name: value for name, value in deltas.items() if value}
+        if not deltas:
+            return
+        
+        table = cls.__table__
+        stmt = _upsert_insert(table).values([
+            {'name': name, 'value': value} for name, value in deltas.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['name'],
+            set_={'value': table.c.value + stmt.excluded.value}
+        )
+        db.session.execute(stmt)
+    
+    @classmethod
+    def get_all(cls):
+        """Return every counter as a dict, with missing counters as 0."""
+        values = {name: 0 for name in cls.NAMES}
+        values.update(dict(db.session.query(cls.name, cls.value).filter(cls.name.in_(cls.NAMES)).all()))
+        return values
+    
+    @classmethod
+    def rebuild(cls):
+        """
+        Recompute the counters from the base tables, repairing any drift.
+        
+        Only the NAMES rows are replaced; the cache version rows kept in the
+        same table (see backend/utils/cache.py) must never go back down.
+        Runs on the current session without committing.
+        """
+        from sqlalchemy import func
+        
+        values = {
+            'users': db.session.query(func.count(User.id)).filter(User.role == 'user').scalar(),
+            'documents': db.session.query(func.count(Document.id)).scalar(),
+            'scans': db.session.query(func.count(ScanLog.id)).scalar(),
+            'matches': db.session.query(func.count(DocumentMatch.id)).scalar(),
+            'pending_requests': db.session.query(func.count(CreditRequest.id)).filter(
+                CreditRequest.status == 'pending'
+            ).scalar()
+        }
+        
+        db.session.query(cls).filter(cls.name.in_(cls.NAMES)).delete(synchronize_session=False)
+        db.session.execute(cls.__table__.insert(), [
+            {'name': name, 'value': value or 0} for name, value in values.items()
+        ])
+        return values
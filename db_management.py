@@ -5,7 +5,7 @@ from app import create_app, db
 
 def get_db_path():
     """Get the database path from the app config."""
-    app = create_app()
+    app = create_app({'SCHEDULER_ENABLED': False})
     db_path = app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '')
     return db_path
 
@@ -23,6 +23,8 @@ def migrate_database():
         'documents': {
             'content_hash': 'TEXT',
             'content_vector': 'TEXT',
+            'embedding': 'BLOB',
+            'embedding_model': 'TEXT',
             'file_type': 'TEXT',
             'file_size': 'INTEGER',
             'word_count': 'INTEGER',
@@ -41,7 +43,8 @@ def migrate_database():
             'similarity_score': 'REAL',
             'scan_type': 'TEXT DEFAULT "standard"',
             'scan_metadata': 'TEXT',
-            'matched_documents': 'TEXT'
+            'matched_documents': 'TEXT',
+            'match_count': 'INTEGER NOT NULL DEFAULT 0'
         },
         'credit_requests': {
             'status': 'TEXT DEFAULT "pending"',
@@ -81,6 +84,7 @@ def migrate_database():
     }
     
     # Check each table and add missing columns
+    added_columns = set()
     for table, columns in tables_columns.items():
         # Check if table exists
         cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table}'")
@@ -118,6 +122,7 @@ def migrate_database():
             if column not in existing_columns:
                 print(f"Adding {column} column to {table} table")
                 cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {data_type}")
+                added_columns.add((table, column))
         
         # Add foreign key columns if they don't exist
         if table in foreign_keys:
@@ -126,6 +131,20 @@ def migrate_database():
                     print(f"Adding foreign key column {fk_column} to {table} table")
                     cursor.execute(f"ALTER TABLE {table} ADD COLUMN {fk_column} INTEGER")
     
+    # Backfill the precomputed match count on existing scan logs
+    if ('scan_logs', 'match_count') in added_columns:
+        print("Backfilling scan_logs.match_count")
+        cursor.execute(
+            "UPDATE scan_logs SET match_count = "
+            "(SELECT COUNT(*) FROM document_matches WHERE document_matches.scan_id = scan_logs.id)"
+        )
+    
+    # Create model tables the database does not have yet (e.g. rollups)
+    created_tables = create_missing_tables(cursor)
+    
+    # Create secondary indexes declared on the models
+    create_missing_indexes(cursor)
+    
     # Enable foreign key support
     cursor.execute("PRAGMA foreign_keys = ON")
     
@@ -133,8 +152,127 @@ def migrate_database():
     conn.commit()
     conn.close()
     
+    # Populate newly created rollup tables from existing data
+    if {'daily_stats', 'global_counters'} & set(created_tables):
+        rebuild_stats()
+    
     print("Database migration completed successfully!")
 
+def create_missing_tables(cursor):
+    """
+    Create any model table that does not exist in the database.
+    
+    Returns:
+        list: Names of the tables that were created
+    """
+    from sqlalchemy.dialects import sqlite
+    from sqlalchemy.schema import CreateTable
+    
+    created = []
+    for table in db.metadata.sorted_tables:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table.name,))
+        if cursor.fetchone():
+            continue
+        
+        print(f"Creating table {table.name}")
+        create_sql = CreateTable(table, if_not_exists=True).compile(dialect=sqlite.dialect())
+        cursor.execute(str(create_sql))
+        created.append(table.name)
+    
+    return created
+
+def create_missing_indexes(cursor):
+    """
+    Create any index declared on the models that the database is missing.
+    
+    Uses CREATE INDEX IF NOT EXISTS, so existing tables are indexed in place
+    without being rebuilt.
+    """
+    from sqlalchemy.dialects import sqlite
+    from sqlalchemy.schema import CreateIndex
+    
+    for table in db.metadata.sorted_tables:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table.name,))
+        if not cursor.fetchone():
+            continue
+        
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND name=?", (index.name,))
+            if cursor.fetchone():
+                continue
+            
+            print(f"Creating index {index.name} on {table.name}")
+            create_sql = CreateIndex(index, if_not_exists=True).compile(dialect=sqlite.dialect())
+            cursor.execute(str(create_sql))
+
+# Representative queries from the API handlers, used by the explain action
+EXPLAIN_QUERIES = {
+    'duplicate lookup by content hash':
+        "SELECT id FROM documents WHERE content_hash = 'x'",
+    'user documents, newest first':
+        "SELECT * FROM documents WHERE user_id = 1 ORDER BY created_at DESC LIMIT 10",
+    'user scan history, newest first':
+        "SELECT * FROM scan_logs WHERE user_id = 1 ORDER BY created_at DESC LIMIT 10",
+    'user credit requests, newest first':
+        "SELECT * FROM credit_requests WHERE user_id = 1 ORDER BY created_at DESC LIMIT 10",
+    'scans in a date range':
+        "SELECT COUNT(id) FROM scan_logs WHERE created_at BETWEEN '2025-03-01' AND '2025-03-31'",
+    'documents in a date range':
+        "SELECT COUNT(id) FROM documents WHERE created_at BETWEEN '2025-03-01' AND '2025-03-31'",
+    'matches for a document':
+        "SELECT * FROM document_matches WHERE source_document_id = 1 OR matched_document_id = 1 "
+        "ORDER BY similarity_score DESC",
+    'matches for a scan':
+        "SELECT * FROM document_matches WHERE scan_id = 1",
+    'matches in a date range':
+        "SELECT COUNT(id) FROM document_matches WHERE created_at BETWEEN '2025-03-01' AND '2025-03-31'",
+    'pending credit requests':
+        "SELECT COUNT(id) FROM credit_requests WHERE status = 'pending'",
+    'regular user count':
+        "SELECT COUNT(id) FROM users WHERE role = 'user'"
+}
+
+def explain_queries():
+    """Print EXPLAIN QUERY PLAN output for the main application queries."""
+    db_path = get_db_path()
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    for name, query in EXPLAIN_QUERIES.items():
+        print(f"-- {name}")
+        print(query)
+        for row in cursor.execute(f"EXPLAIN QUERY PLAN {query}").fetchall():
+            print(f"    {row[-1]}")
+        print()
+    
+    conn.close()
+
+def rebuild_stats():
+    """Recompute the dashboard rollup table and global counters from scratch."""
+    from database.models import DailyStat, GlobalCounter
+    
+    app = create_app({'SCHEDULER_ENABLED': False})
+    with app.app_context():
+        days = DailyStat.rebuild()
+        counters = GlobalCounter.rebuild()
+        db.session.commit()
+    
+    print(f"Rebuilt {days} daily rollup rows.")
+    print("Counters: " + ", ".join(f"{name}={value}" for name, value in counters.items()))
+
+def embed_documents(limit=None):
+    """Store embeddings for documents that have none from the configured model."""
+    from backend.api.document import backfill_embeddings
+    
+    app = create_app({'SCHEDULER_ENABLED': False})
+    with app.app_context():
+        print(f"Embedding documents with {app.config['EMBEDDING_PROVIDER']} / {app.config['EMBEDDING_MODEL']}")
+        embedded, failed = backfill_embeddings(limit)
+    
+    print(f"Embedded {embedded} documents.")
+    if failed:
+        print(f"{failed} documents could not be embedded; run embed again to retry them.")
+
 def backup_database():
     """Create a backup of the database."""
     import datetime
@@ -158,7 +296,7 @@ def backup_database():
 
 def reset_database():
     """Reset the database by dropping all tables and recreating them."""
-    app = create_app()
+    app = create_app({'SCHEDULER_ENABLED': False})
     
     with app.app_context():
         # Drop all tables
@@ -189,8 +327,9 @@ def reset_database():
 
 def main():
     parser = argparse.ArgumentParser(description='Database management utilities')
-    parser.add_argument('action', choices=['migrate', 'backup', 'reset'],
+    parser.add_argument('action', choices=['migrate', 'backup', 'reset', 'explain', 'rebuild-stats', 'embed'],
                         help='Action to perform on the database')
+    parser.add_argument('--limit', type=int, help='embed: at most this many documents')
     
     args = parser.parse_args()
     
@@ -201,6 +340,12 @@ def main():
     elif args.action == 'reset':
         backup_database()  # Always backup before reset
         reset_database()
+    elif args.action == 'explain':
+        explain_queries()
+    elif args.action == 'rebuild-stats':
+        rebuild_stats()
+    elif args.action == 'embed':
+        embed_documents(args.limit)
 
 if __name__ == "__main__":
     main()
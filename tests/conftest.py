@@ -0,0 +1,60 @@
+"""Shared fixtures: an app on a temporary SQLite database with AI scoring off."""
+
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from database.models import db, User
+
+PASSWORD = 'test-password'
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'PROFILE_DIR': str(tmp_path / 'profiles'),
+        'AI_RATE_LIMIT_STATE_PATH': str(tmp_path / 'rate_limits.sqlite'),
+        'SCHEDULER_ENABLED': False
+    })
+    with app.app_context():
+        db.create_all()
+        for username, role in [('admin', 'admin'), ('alice', 'user')]:
+            user = User(username=username, email=f'{username}@example.com', role=role)
+            user.set_password(PASSWORD)
+            db.session.add(user)
+        db.session.commit()
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def no_ai(monkeypatch):
+    """Score uploads with TF-IDF only, so tests never call an AI provider."""
+    import backend.api.document as document_api
+    monkeypatch.setattr(document_api, 'score_with_ai', lambda content, documents, embedding=None: {})
+
+
+def login(client, username):
+    response = client.post('/auth/login', data={'username': username, 'password': PASSWORD})
+    assert response.status_code == 302, response.status_code
+
+
+def upload(client, text, filename):
+    """Upload a text file; returns the new document's id."""
+    response = client.post(
+        '/document/upload', data={'file': (io.BytesIO(text.encode('utf-8')), filename)},
+        content_type='multipart/form-data'
+    )
+    assert response.status_code == 302, response.status_code
+    return int(response.headers['Location'].rstrip('/').rsplit('/', 1)[-1])
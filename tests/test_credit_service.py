@@ -0,0 +1,80 @@
+"""CreditService: balance changes, their ledger rows, and what else they write."""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from backend.services.credit_service import CreditService
+from backend.utils.cache import current_versions
+from database.models import db, CreditLedger, CreditRequest, DailyStat, User
+
+
+def user_id(username):
+    return db.session.query(User.id).filter_by(username=username).scalar()
+
+
+def test_debit_and_refund_touch_no_shared_rows(app):
+    with app.app_context():
+        alice = user_id('alice')
+        versions = current_versions(('users',))
+        
+        assert CreditService.debit(alice)
+        CreditService.refund(alice)
+        db.session.commit()
+        
+        assert current_versions(('users',)) == versions
+        assert DailyStat.query.count() == 0
+        assert [entry.delta for entry in CreditLedger.query.filter_by(user_id=alice)] == [-1, 1]
+
+
+def test_admin_changes_bump_user_version(app):
+    with app.app_context():
+        alice = user_id('alice')
+        (before,) = current_versions(('users',))
+        
+        CreditService.grant(alice, 5)
+        db.session.commit()
+        (after_grant,) = current_versions(('users',))
+        CreditService.set_balance(alice, 3)
+        db.session.commit()
+        (after_set,) = current_versions(('users',))
+        
+        assert before < after_grant < after_set
+        assert db.session.get(User, alice).credits == 3
+
+
+def test_lost_reset_race_keeps_pending_request_state(app):
+    with app.app_context():
+        alice = db.session.get(User, user_id('alice'))
+        stale = datetime.now() - timedelta(days=2)
+        db.session.execute(update(User).where(User.id == alice.id).values(last_credit_reset=stale))
+        db.session.commit()
+        db.session.refresh(alice)
+        
+        # Another worker resets alice after this request loaded her
+        with db.engine.begin() as conn:
+            conn.execute(update(User).where(User.id == alice.id).values(last_credit_reset=datetime.now(), credits=7))
+        
+        pending = CreditRequest(user_id=alice.id, amount=5, reason='pending in this request')
+        db.session.add(pending)
+        
+        assert not CreditService.apply_daily_reset(alice)
+        assert pending in db.session
+        assert alice.credits == 7
+        db.session.commit()
+        assert CreditRequest.query.count() == 1
+        assert CreditLedger.query.filter_by(reason='daily_reset').count() == 0
+
+
+def test_due_reset_restores_daily_credits(app):
+    with app.app_context():
+        alice = db.session.get(User, user_id('alice'))
+        stale = datetime.now() - timedelta(days=2)
+        db.session.execute(update(User).where(User.id == alice.id).values(last_credit_reset=stale, credits=3))
+        db.session.commit()
+        db.session.refresh(alice)
+        
+        assert CreditService.apply_daily_reset(alice)
+        assert alice.credits == CreditService.daily_free_credits()
+        assert [entry.delta for entry in CreditLedger.query.filter_by(reason='daily_reset')] == [alice.credits - 3]
+        assert not CreditService.apply_daily_reset(alice)
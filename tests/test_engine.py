@@ -0,0 +1,22 @@
+"""Engine setup: pool options apply to file databases, and in-memory SQLite still works."""
+
+from app import create_app
+from database.engine import REPORTING_BIND
+from database.models import db, User
+
+
+def test_app_on_in_memory_sqlite():
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SCHEDULER_ENABLED': False})
+    with app.app_context():
+        db.create_all(bind_key=None)  # Other apps in this process registered the reporting bind
+        db.session.add(User(username='memory', email='memory@example.com', password_hash='x'))
+        db.session.commit()
+        assert User.query.filter_by(username='memory').count() == 1
+        assert REPORTING_BIND not in db.engines
+        assert 'pool_size' not in app.config['SQLALCHEMY_ENGINE_OPTIONS']
+
+
+def test_pool_options_on_file_database(app):
+    with app.app_context():
+        assert db.engine.pool.size() == app.config['DB_POOL_OPTIONS']['pool_size']
+        assert db.engines[REPORTING_BIND].pool.size() == app.config['DB_POOL_OPTIONS']['pool_size']
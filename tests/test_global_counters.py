@@ -0,0 +1,20 @@
+"""Dashboard counters: rebuild() repairs totals without touching cache versions."""
+
+from backend.utils.cache import bump_versions, current_versions
+from database.models import db, GlobalCounter
+
+
+def test_rebuild_keeps_cache_versions(app):
+    with app.app_context():
+        bump_versions('users', 'scans')
+        db.session.commit()
+        before = current_versions(('users', 'scans'))
+        
+        GlobalCounter.increment(documents=5)
+        GlobalCounter.rebuild()
+        db.session.commit()
+        
+        assert current_versions(('users', 'scans')) == before
+        assert GlobalCounter.get_all() == {
+            'users': 1, 'documents': 0, 'scans': 0, 'matches': 0, 'pending_requests': 0
+        }
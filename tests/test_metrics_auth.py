@@ -0,0 +1,32 @@
+"""/metrics access: admins, or scrapers with METRICS_TOKEN; nobody else."""
+
+from conftest import login
+
+TOKEN = 'scrape-token'
+
+
+def test_anonymous_rejected_without_token(app):
+    assert app.test_client().get('/metrics').status_code == 401
+
+
+def test_regular_user_rejected(app):
+    client = app.test_client()
+    login(client, 'alice')
+    assert client.get('/metrics').status_code == 401
+
+
+def test_admin_allowed_without_token(app):
+    client = app.test_client()
+    login(client, 'admin')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+
+
+def test_scraper_needs_matching_token(app):
+    app.config['METRICS_TOKEN'] = TOKEN
+    client = app.test_client()
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': TOKEN}).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': f'Bearer {TOKEN}'}).status_code == 200
@@ -0,0 +1,42 @@
+"""Provider routing: rate-limit skips must not count as provider failures."""
+
+from backend.services.provider_router import CLOSED, HALF_OPEN, OPEN, ProviderRouter, mark_rate_limited
+
+
+def throttled(text1, text2):
+    mark_rate_limited()
+    return None
+
+
+def failing(text1, text2):
+    return None
+
+
+def test_rate_limited_calls_keep_circuit_closed(app):
+    router = ProviderRouter(['mistral'], min_calls=2, hedge=False)
+    with app.app_context():
+        for _ in range(5):
+            assert router.call({'mistral': throttled}, 'a', 'b') == (None, None)
+    snapshot = router.snapshot()['mistral']
+    assert snapshot['state'] == CLOSED
+    assert snapshot['calls'] == 0
+    assert snapshot['rate_limited'] == 5
+
+
+def test_failed_calls_open_circuit(app):
+    router = ProviderRouter(['mistral'], min_calls=2, hedge=False)
+    with app.app_context():
+        for _ in range(2):
+            router.call({'mistral': failing}, 'a', 'b')
+    assert router.snapshot()['mistral']['state'] == OPEN
+
+
+def test_rate_limited_trial_stays_half_open(app):
+    router = ProviderRouter(['mistral'], min_calls=2, cooldown=0, hedge=False)
+    with app.app_context():
+        for _ in range(2):
+            router.call({'mistral': failing}, 'a', 'b')
+        router.call({'mistral': throttled}, 'a', 'b')
+        assert router.snapshot()['mistral']['state'] == HALF_OPEN
+        assert router.call({'mistral': lambda text1, text2: 0.5}, 'a', 'b') == (0.5, 'mistral')
+    assert router.snapshot()['mistral']['state'] == CLOSED
@@ -0,0 +1,86 @@
+"""Query budgets for the main pages: an extra query per row (N+1) fails here."""
+
+import pytest
+
+from app import create_app
+from backend.utils.sql_profiler import query_budget
+from conftest import login, upload
+from database.models import db, User
+
+BASE_TEXT = (
+    "Climate change is one of the most important challenges of our time. Rising temperatures "
+    "and extreme weather events require immediate global action and cooperation between nations."
+)
+
+# Statements per page load. None of them may grow with the number of matches or documents.
+QUERY_BUDGETS = {
+    'view': 4,
+    'matches': 4,
+    'profile': 6,
+    'dashboard': 9
+}
+
+
+@pytest.fixture
+def scanned(app, no_ai):
+    """alice uploads related documents, so the last one matches all the others."""
+    client = app.test_client()
+    login(client, 'alice')
+    ids = [upload(client, f"{BASE_TEXT} Part {n} adds a little more detail.", f'doc{n}.txt') for n in range(8)]
+    return client, ids
+
+
+def test_document_view_budget(scanned):
+    client, ids = scanned
+    with query_budget(QUERY_BUDGETS['view']):
+        response = client.get(f'/document/view/{ids[-1]}')
+    assert response.status_code == 200
+
+
+def test_document_view_json_budget(scanned):
+    client, ids = scanned
+    with query_budget(QUERY_BUDGETS['view']):
+        response = client.get(f'/document/view/{ids[-1]}', content_type='application/json')
+    assert response.status_code == 200
+    assert len(response.get_json()['matches']) == len(ids) - 1
+
+
+def test_document_matches_budget(scanned):
+    client, ids = scanned
+    with query_budget(QUERY_BUDGETS['matches']):
+        response = client.get(f'/document/matches/{ids[-1]}')
+    assert response.status_code == 200
+
+
+def test_profile_budget(scanned):
+    client, _ = scanned
+    with query_budget(QUERY_BUDGETS['profile']):
+        response = client.get('/user/profile')
+    assert response.status_code == 200
+
+
+def test_admin_dashboard_budget(app, scanned):
+    client = app.test_client()
+    login(client, 'admin')
+    with query_budget(QUERY_BUDGETS['dashboard']):
+        response = client.get('/admin/dashboard')
+    assert response.status_code == 200
+
+
+def test_budget_counts_with_profiler_disabled(tmp_path):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'off.db'}",
+        'SQL_PROFILER_ENABLED': False,
+        'SCHEDULER_ENABLED': False
+    })
+    with app.app_context():
+        db.create_all()
+        with pytest.raises(AssertionError):
+            with query_budget(0):
+                User.query.all()
+                User.query.all()
+        with query_budget(2) as stats:
+            User.query.all()
+        assert stats.count == 1
+        for engine in db.engines.values():
+            engine.dispose()
@@ -0,0 +1,60 @@
+"""EXPLAIN QUERY PLAN checks: every representative query must be served by its index."""
+
+import re
+import sqlite3
+
+import pytest
+
+from db_management import EXPLAIN_QUERIES
+from database.models import db
+
+# Index each query in db_management.EXPLAIN_QUERIES is expected to use
+EXPECTED_INDEXES = {
+    'duplicate lookup by content hash': ['ix_documents_content_hash'],
+    'user documents, newest first': ['ix_documents_user_id_created_at'],
+    'user scan history, newest first': ['ix_scan_logs_user_id_created_at'],
+    'user credit requests, newest first': ['ix_credit_requests_user_id_created_at'],
+    'scans in a date range': ['ix_scan_logs_created_at'],
+    'documents in a date range': ['ix_documents_created_at'],
+    'matches for a document': ['sqlite_autoindex_document_matches_1', 'ix_document_matches_matched_document_id'],
+    'matches for a scan': ['ix_document_matches_scan_id'],
+    'matches in a date range': ['ix_document_matches_created_at'],
+    'pending credit requests': ['ix_credit_requests_status'],
+    'regular user count': ['ix_users_role']
+}
+
+# Queries whose ORDER BY is expected to be served by the index, not a temporary sort
+SORTED_BY_INDEX = {
+    'user documents, newest first',
+    'user scan history, newest first',
+    'user credit requests, newest first'
+}
+
+
+@pytest.fixture
+def plans(app):
+    with app.app_context():
+        path = db.engine.url.database
+    conn = sqlite3.connect(path)
+    try:
+        yield {
+            name: [row[-1] for row in conn.execute(f'EXPLAIN QUERY PLAN {query}')]
+            for name, query in EXPLAIN_QUERIES.items()
+        }
+    finally:
+        conn.close()
+
+
+def test_every_query_has_an_expected_index():
+    assert set(EXPLAIN_QUERIES) == set(EXPECTED_INDEXES)
+
+
+@pytest.mark.parametrize('name', sorted(EXPECTED_INDEXES))
+def test_query_uses_index(plans, name):
+    plan = plans[name]
+    detail = '\n'.join(plan)
+    assert not any(re.match(r'SCAN \w+', step) for step in plan), f'{name} scans a table:\n{detail}'
+    for index in EXPECTED_INDEXES[name]:
+        assert re.search(rf'USING (COVERING )?INDEX {index}\b', detail), f'{name} does not use {index}:\n{detail}'
+    if name in SORTED_BY_INDEX:
+        assert 'USE TEMP B-TREE' not in detail, f'{name} sorts without the index:\n{detail}'
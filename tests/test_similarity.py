@@ -0,0 +1,30 @@
+"""Traditional scoring: one shared TF-IDF fit per scan, not one per candidate."""
+
+from types import SimpleNamespace
+
+import backend.api.document as document_api
+
+CLIMATE = "Rising temperatures and extreme weather events require global action on climate change."
+COOKING = "Knead the dough, let it rise overnight and bake the bread in a very hot oven."
+
+
+def doc(doc_id, content):
+    return SimpleNamespace(id=doc_id, content=content, content_hash=str(doc_id), embedding=None)
+
+
+def test_shared_fit_scores_each_document(app):
+    with app.app_context():
+        scores = document_api.get_traditional_similarities(CLIMATE, [doc(1, CLIMATE), doc(2, COOKING)])
+    assert scores[1] > 0.99
+    assert scores[2] < 0.1
+
+
+def test_find_matches_fits_once(app, no_ai, monkeypatch):
+    def per_pair(text1, text2):
+        raise AssertionError('find_matches fitted a TF-IDF model per pair')
+    monkeypatch.setattr(document_api, 'get_traditional_similarity', per_pair)
+    
+    with app.app_context():
+        matches = document_api.find_matches(CLIMATE, 'upload', [doc(1, CLIMATE + ' Now.'), doc(2, COOKING)])
+    assert [match['document'].id for match in matches] == [1]
+    assert matches[0]['details']['match_method'] == 'traditional'
@@ -0,0 +1,56 @@
+"""Scan credits: an upload is charged once and refunded only when the scan is not saved."""
+
+import io
+
+import pytest
+
+import backend.api.document as document_api
+from conftest import login, upload
+from database.models import db, Document, User
+
+TEXT = "A short document about renewable energy and the transition away from fossil fuels."
+
+
+def credits(app, username):
+    with app.app_context():
+        return db.session.query(User.credits).filter_by(username=username).scalar()
+
+
+def test_upload_charges_one_credit(app, no_ai):
+    client = app.test_client()
+    login(client, 'alice')
+    before = credits(app, 'alice')
+    upload(client, TEXT, 'energy.txt')
+    assert credits(app, 'alice') == before - 1
+
+
+def test_failure_before_commit_refunds(app, no_ai, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError('matching failed')
+    monkeypatch.setattr(document_api, 'find_matches', fail)
+
+    client = app.test_client()
+    login(client, 'alice')
+    before = credits(app, 'alice')
+    response = client.post('/document/upload', data={'file': (io.BytesIO(TEXT.encode('utf-8')), 'energy.txt')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert credits(app, 'alice') == before
+    with app.app_context():
+        assert Document.query.count() == 0
+
+
+def test_failure_after_commit_keeps_charge(app, no_ai, monkeypatch):
+    def fail(histogram, started, label, **labels):
+        if label == 'total':
+            raise RuntimeError('metrics failed')
+    monkeypatch.setattr(document_api, 'observe_since', fail)
+
+    client = app.test_client()
+    login(client, 'alice')
+    before = credits(app, 'alice')
+    with pytest.raises(RuntimeError):
+        upload(client, TEXT, 'energy.txt')
+    assert credits(app, 'alice') == before - 1
+    with app.app_context():
+        assert Document.query.count() == 1